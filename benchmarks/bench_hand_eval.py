@@ -0,0 +1,48 @@
+"""
+Compares BatchEvaluator.evaluate_batch with one treys Evaluator.evaluate call per hand.
+
+    python -m benchmarks.bench_hand_eval [hands]
+"""
+import sys
+import time
+
+from treys import Deck, Evaluator
+import numpy as np
+
+from hand_eval import BatchEvaluator
+
+
+def random_deals(count: int, board_size: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    deck = np.array(Deck.GetFullDeck(), dtype=np.int64)
+    order = rng.random((count, len(deck))).argsort(axis=1)[:, :board_size + 2]
+    cards = deck[order]
+    return cards[:, 2:], cards[:, :2]
+
+
+def main(count: int):
+    treys_evaluator = Evaluator()
+    batch_evaluator = BatchEvaluator()
+    for board_size in (3, 4, 5):
+        boards, hands = random_deals(count, board_size)
+        board_lists, hand_lists = boards.tolist(), hands.tolist()
+
+        start = time.perf_counter()
+        expected = [treys_evaluator.evaluate(b, h) for b, h in zip(board_lists, hand_lists)]
+        treys_sec = time.perf_counter() - start
+
+        # The first call at a given hand size builds its lookup table, keep that out of the timing
+        batch_evaluator.evaluate_batch(boards[:1], hands[:1])
+        start = time.perf_counter()
+        ranks = batch_evaluator.evaluate_batch(boards, hands)
+        batch_sec = time.perf_counter() - start
+
+        assert ranks.tolist() == expected, "BatchEvaluator disagrees with treys"
+        print(
+            f"{board_size + 2} cards x {count}: treys {count / treys_sec:,.0f} hands/s, "
+            f"batch {count / batch_sec:,.0f} hands/s ({treys_sec / batch_sec:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
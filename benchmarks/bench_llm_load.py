@@ -0,0 +1,147 @@
+"""
+Load test of LLM players against local mock model servers (see mock_server.py), so the concurrency, retry,
+fallback and batching behavior can be measured without a GPU.
+Every scenario plays seeded poker2 games of LLM players, one game per table with the tables sharing the
+process' llm_client loop like simulate.py -t does, and reports the hands and decisions per second, the
+decision latency and what the players and servers counted:
+    tables       the same server with more and more tables at once
+    streaming    streamed answers closed as soon as the action is known versus waiting for the whole answer
+    failover     a flaky server (errors and hangs) alone without retries, then pooled with a healthy one
+    batching     a server batching continuously versus one that only batches requests starting together, then
+                 that server given the tables' prompts as multi-prompt requests (players' batchSize)
+
+    python -m benchmarks.bench_llm_load [--hands 10] [--scenario tables]
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from treys import Deck
+
+from hand_eval import BatchEvaluator
+from metrics import Histogram, Metrics
+from mock_server import Latency, MockServer
+from player_factory import player_factory
+from poker2 import Poker
+
+_PLAYERS = 6
+
+
+def _players_config(**llm: object) -> List[dict]:
+    return [dict({"type": "llm", "name": f"Llm_{i}", "model": "mock", "system": "You play poker."}, **llm) for i in range(_PLAYERS)]
+
+
+def run_tables(players: List[dict], tables: int, hands: int, seed: int = 0) -> dict:
+    """
+    Plays `tables` games of at most `hands` hands at once, returns the elapsed time, hands and merged metrics.
+    """
+    evaluator = BatchEvaluator()
+    metrics = Metrics()
+    with tempfile.TemporaryDirectory() as log_directory:
+        players_file = os.path.join(log_directory, "players.json")
+        with open(players_file, "w") as f:
+            json.dump(players, f)
+
+        def play_table(table: int) -> int:
+            table_log_directory = os.path.join(log_directory, f"Table{table}")
+            os.makedirs(table_log_directory)
+            game = Poker(player_factory(players_file, table_log_directory), evaluator, Deck(), verbose=False, seed=seed + table, metrics=metrics, max_hands=hands)
+            return game.play_game()["hands"]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=tables) as pool:
+            played = sum(pool.map(play_table, range(tables)))
+        elapsed = time.perf_counter() - start
+    return {"elapsed_sec": elapsed, "hands": played, "metrics": metrics.to_dict()}
+
+
+def _report(name: str, run: dict, servers: Dict[str, MockServer]):
+    decisions = Histogram()
+    for entry in run["metrics"]["decisions"]:
+        decisions.merge(entry)
+    counters: Dict[str, float] = {}
+    for entry in run["metrics"]["counters"]:
+        if entry["name"] in ("llm_requests", "llm_tokens", "llm_seconds"):
+            continue
+        key = f"{entry['name']}[{entry['label']}]" if entry["label"] else entry["name"]
+        counters[key] = counters.get(key, 0) + entry["value"]
+    elapsed = run["elapsed_sec"]
+    print(
+        f"  {name:<28} {run['hands'] / elapsed:6.2f} hands/s {decisions.count / elapsed:7.1f} decisions/s   "
+        f"decision p50 {decisions.quantile(0.5) * 1000:6.0f} ms  p95 {decisions.quantile(0.95) * 1000:6.0f} ms"
+    )
+    if counters:
+        print(f"    players: {', '.join(f'{k}={v:g}' for k, v in sorted(counters.items()))}")
+    for server_name, server in servers.items():
+        stats = server.stats()
+        print(
+            f"    {server_name}: {stats['requests']} requests, {stats['completed']} completed, {stats['cancelled']} cancelled, "
+            f"{stats['prompts']} prompts, {stats['errors']} errors, {stats['hung']} hung, {stats['batches']} batches, max {stats['max_active']} at once, "
+            f"{stats['queue_sec'] / max(1, stats['requests']) * 1000:.0f} ms queued per request"
+        )
+
+
+def _run(name: str, servers: Dict[str, MockServer], players: List[dict], tables: int, hands: int):
+    try:
+        _report(name, run_tables(players, tables, hands), servers)
+    finally:
+        for server in servers.values():
+            server.stop()
+
+
+def scenario_tables(hands: int):
+    print("tables: one server generating up to 4 requests at once")
+    for tables in (1, 2, 4, 8):
+        server = MockServer(Latency.from_str("lognormal:0.02,0.5"), tokens_per_sec=2000, slots=4, seed=tables)
+        _run(f"{tables} tables", {"server": server}, _players_config(baseUrl=server.start()), tables, hands)
+
+
+def scenario_streaming(hands: int):
+    print("streaming: answers going on for 60 tokens after the action")
+    for stream in (False, True):
+        server = MockServer(Latency.from_str("fixed:0.01"), tokens_per_sec=1000, trailing_tokens=60, seed=0)
+        _run("streamed" if stream else "whole answers", {"server": server}, _players_config(baseUrl=server.start(), stream=stream), 4, hands)
+
+
+def scenario_failover(hands: int):
+    print("failover: a server failing 20% of the requests and hanging on 5%, 0.5s request timeout")
+
+    def flaky() -> MockServer:
+        return MockServer(Latency.from_str("fixed:0.01"), tokens_per_sec=2000, error_rate=0.2, error_statuses=(500, 429), hang_rate=0.05, hang_sec=5.0, seed=0)
+
+    server = flaky()
+    _run("flaky alone, no pool retries", {"flaky": server}, _players_config(baseUrl=server.start(), requestTimeoutSec=0.5, retries=0), 4, hands)
+    server = flaky()
+    healthy = MockServer(Latency.from_str("fixed:0.01"), tokens_per_sec=2000, seed=1)
+    players = _players_config(endpoints=[server.start(), healthy.start()], requestTimeoutSec=0.5, retries=2)
+    _run("flaky + healthy, 2 retries", {"flaky": server, "healthy": healthy}, players, 4, hands)
+
+
+def scenario_batching(hands: int):
+    print("batching: a server generating up to 8 requests at once, starting them as they come or in batches")
+    for static_batching in (False, True):
+        server = MockServer(Latency.from_str("lognormal:0.05,0.6"), tokens_per_sec=2000, slots=8, static_batching=static_batching, seed=0)
+        _run("static batches" if static_batching else "continuous batching", {"server": server}, _players_config(baseUrl=server.start()), 8, hands)
+    server = MockServer(Latency.from_str("lognormal:0.05,0.6"), tokens_per_sec=2000, slots=8, static_batching=True, seed=0)
+    _run("static, batchSize 8", {"server": server}, _players_config(baseUrl=server.start(), batchSize=8), 8, hands)
+
+
+SCENARIOS = {
+    "tables": scenario_tables,
+    "streaming": scenario_streaming,
+    "failover": scenario_failover,
+    "batching": scenario_batching,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test LLM players against mock model servers")
+    parser.add_argument("--hands", type=int, default=10, help="Hands played at every table")
+    parser.add_argument("--scenario", choices=list(SCENARIOS), action="append", help="Scenario to run, all of them by default")
+    args = parser.parse_args()
+    for scenario in args.scenario or list(SCENARIOS):
+        SCENARIOS[scenario](args.hands)
@@ -0,0 +1,72 @@
+"""
+Measures the engine's own cost per action: seeded games between players whose decision is a single
+random choice, so nearly all of the time is spent in Round.
+Besides the overall rate it reports the time spent in the betting loop outside of the players'
+decisions, i.e. the per-action overhead of the table state (dealing and showdowns excluded).
+
+    python -m benchmarks.bench_round [games]
+"""
+from typing import List
+import os
+import sys
+import time
+
+from treys import Deck
+
+from action import Action
+from hand_eval import BatchEvaluator
+from player import Player
+from poker2 import Poker
+from round import Round
+
+
+class CountingPlayer(Player):
+    def __init__(self, name: str):
+        super().__init__(log_file_path=os.devnull, name=name)
+        self.actions = 0
+        self.seconds = 0.0
+
+    def take_action(self, state: dict, valid_actions: List[Action], history: str) -> Action:
+        start = time.perf_counter()
+        self.actions += 1
+        action = self._random.choice(valid_actions)
+        self.seconds += time.perf_counter() - start
+        return action
+
+
+_betting_sec = 0.0
+_betting_round = Round._betting_round
+
+
+def _timed_betting_round(self, *args):
+    global _betting_sec
+    start = time.perf_counter()
+    _betting_round(self, *args)
+    _betting_sec += time.perf_counter() - start
+
+
+def main(games: int):
+    evaluator = BatchEvaluator()
+    # Build the 7 card table outside of the timing
+    evaluator.evaluate_hands(Deck(0).draw(5), [Deck(1).draw(2)])
+    players = [CountingPlayer(f"Player_{i}") for i in range(6)]
+
+    hands = 0
+    Round._betting_round = _timed_betting_round
+    start = time.perf_counter()
+    for seed in range(games):
+        hands += Poker(players, evaluator, Deck(), verbose=False, seed=seed).play_game()["hands"]
+    elapsed = time.perf_counter() - start
+    Round._betting_round = _betting_round
+
+    actions = sum(p.actions for p in players)
+    decision_sec = sum(p.seconds for p in players)
+    print(
+        f"{games} games, {hands} hands, {actions} actions in {elapsed:.2f}s: "
+        f"{hands / elapsed:,.0f} hands/s, {elapsed / actions * 1e6:.2f} us/action overall, "
+        f"{(_betting_sec - decision_sec) / actions * 1e6:.2f} us/action in the betting loop"
+    )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
@@ -0,0 +1,80 @@
+"""
+Measures how long a fresh process takes to reach its first hand: interpreter start, imports, building the
+players from a config and the Poker object, for a config of random players and one with LLM players
+(no request is sent, the clients are only built on the first request).
+Also lists the slowest imports of the process as reported by python -X importtime.
+
+    python -m benchmarks.bench_startup [runs]
+"""
+from typing import List, Tuple
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Run in the child process, stops right before the first hand would be dealt
+_FIRST_HAND = """
+import sys
+from treys import Deck
+from hand_eval import BatchEvaluator
+from player_factory import player_factory
+from poker2 import Poker
+players = player_factory(sys.argv[1], sys.argv[2])
+Poker(players, BatchEvaluator(), Deck(), verbose=False, seed=0)
+"""
+
+_CONFIGS = {
+    "random": [{"type": "random", "name": f"Random_{i}"} for i in range(6)],
+    "llm": [{"type": "llm", "name": f"Llm_{i}", "model": "model", "system": "You play poker."} for i in range(4)]
+           + [{"type": "random", "name": f"Random_{i}"} for i in range(2)],
+}
+
+
+def time_to_first_hand(players_file: str, log_directory: str, runs: int) -> List[float]:
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", _FIRST_HAND, players_file, log_directory], cwd=repo, check=True)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def slowest_imports(players_file: str, log_directory: str, count: int = 10) -> List[Tuple[int, str]]:
+    """
+    Returns the cumulative import time in microseconds of the `count` slowest top level imports.
+    """
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _FIRST_HAND, players_file, log_directory],
+        cwd=repo, check=True, capture_output=True, text=True
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package", nested imports are indented
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit() and not name[1:].startswith(" "):
+            imports.append((int(cumulative), name.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main(runs: int):
+    with tempfile.TemporaryDirectory() as log_directory:
+        for config_name, config in _CONFIGS.items():
+            players_file = os.path.join(log_directory, f"{config_name}.json")
+            with open(players_file, "w") as f:
+                json.dump(config, f)
+
+            times = time_to_first_hand(players_file, log_directory, runs)
+            print(f"{config_name} players: {statistics.median(times) * 1000:.0f} ms to the first hand (median of {runs}, min {min(times) * 1000:.0f} ms)")
+            for cumulative, name in slowest_imports(players_file, log_directory):
+                print(f"    {cumulative / 1000:8.1f} ms  import {name}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
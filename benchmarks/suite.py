@@ -0,0 +1,415 @@
+"""
+Benchmarks of the engine's hot paths with fixed seeds and scripted players, so two runs play the exact
+same hands and their numbers can be compared across commits:
+    game              whole seeded games (Poker.play_game): hands/s, us per action overall, in the betting loop
+                      (Round._betting_round minus the players' decisions) and per showdown (Round._showdown)
+    game_with_sinks   the same games writing a hand log and a results partition
+    showdown          Round._showdown of 6 players on the river, with BatchEvaluator and treys' Evaluator
+    table_state       a TableState built and read through its TableView the way a player's prompt reads it
+    state_str         Player._state_str, the game state part of every prompt
+    llm_prompt        LlmPlayer._build_messages for a decision on the river, history included
+    player_factory    building the players from a players.json of random and of LLM players
+Timings are the best of several repeats, taken per game and over short runs of the micro benchmarks so
+that a busy moment of the machine only spoils the runs it overlaps (the minimum is what the code costs,
+anything above it is noise). Memory is measured in a separate pass under tracemalloc: the peak
+it traced during one run (peak_kib) and the blocks still allocated afterwards (retained_blocks, a leak
+shows up there). Metrics ending in _per_sec are better higher, the ones ending in _us, _kib or _blocks
+lower, any other metric (hands, actions) has to be equal for the runs to be comparable.
+Timings only compare on the same machine, and a shared or virtual one can run tens of percent slower for
+seconds at a time: save the baseline and compare on a quiet machine, with more --repeat when in doubt.
+
+    python -m benchmarks.suite                          run everything and print the results
+    python -m benchmarks.suite --save                   also store them as the baseline (benchmarks/baseline.json)
+    python -m benchmarks.suite --compare                compare with the baseline, exit status 1 on a regression
+    python -m benchmarks.suite --only game --only showdown --tolerance 0.05
+"""
+from typing import Callable, Dict, List, Optional
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from treys import Deck, Evaluator
+
+from action import Action
+from hand_eval import BatchEvaluator
+from player import Player
+from player_factory import player_factory
+from poker2 import Poker
+from round import Round
+from table_state import TableState, TableView
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+_PLAYERS = 6
+_GAMES = 10
+_MAX_HANDS = 200
+
+
+class CyclingScriptPlayer(Player):
+    """
+    Plays the actions of a fixed script in turn (the first valid one of check, call and fold when the
+    scripted one isn't valid), and keeps the time spent deciding and the longest history it was given.
+    """
+    def __init__(self, name: str, script: List[Action], uses_history: bool = False):
+        super().__init__(log_file_path=os.devnull, name=name)
+        self._script = script
+        self._position = 0
+        self._uses_history = uses_history
+        self.actions = 0
+        self.seconds = 0.0
+        self.history = ""
+
+    def take_action(self, state: dict, valid_actions: List[Action], history: str) -> Action:
+        start = time.perf_counter()
+        action = self._script[self._position % len(self._script)]
+        self._position += 1
+        if action not in valid_actions:
+            action = next(a for a in (Action.CHECK, Action.CALL, Action.FOLD) if a in valid_actions)
+        if len(history) > len(self.history):
+            self.history = history
+        self.actions += 1
+        self.seconds += time.perf_counter() - start
+        return action
+
+
+def scripted_players(seed: int = 0, uses_history: bool = False) -> List[CyclingScriptPlayer]:
+    rng = random.Random(seed)
+    # Mostly checks and calls, like a table of loose players, so plenty of hands reach the showdown
+    actions = (Action.FOLD, Action.CHECK, Action.CALL, Action.RAISE)
+    return [CyclingScriptPlayer(f"Player_{i}", rng.choices(actions, weights=(2, 4, 4, 1), k=101), uses_history) for i in range(_PLAYERS)]
+
+
+def _best(fn: Callable[[], object], number: int, repeat: int) -> float:
+    """
+    Seconds per call of `fn`, the best of `repeat` runs of `number` calls.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def _memory(fn: Callable[[], object]) -> Dict[str, float]:
+    tracemalloc.start()
+    try:
+        # Whatever the first runs cache (lookup tables, interned strings, ...) isn't what a run costs,
+        # it takes a few runs to settle
+        for _ in range(3):
+            fn()
+        tracemalloc.clear_traces()
+        before = sum(s.count for s in tracemalloc.take_snapshot().statistics("filename"))
+        tracemalloc.reset_peak()
+        start_size = tracemalloc.get_traced_memory()[0]
+        fn()
+        peak = tracemalloc.get_traced_memory()[1] - start_size
+        after = sum(s.count for s in tracemalloc.take_snapshot().statistics("filename"))
+    finally:
+        tracemalloc.stop()
+    return {"peak_kib": peak / 1024, "retained_blocks": after - before}
+
+
+def _play_game(seed: int, evaluator: Evaluator, log_directory: Optional[str] = None) -> dict:
+    players = scripted_players()
+    hand_log_path = os.path.join(log_directory, f"Game{seed}.jsonl") if log_directory is not None else None
+    results_path = os.path.join(log_directory, f"Game{seed}") if log_directory is not None else None
+    game = Poker(players, evaluator, Deck(), verbose=False, seed=seed, max_hands=_MAX_HANDS, hand_log_path=hand_log_path, results_path=results_path)
+    start = time.perf_counter()
+    hands = game.play_game()["hands"]
+    return {
+        "elapsed": time.perf_counter() - start,
+        "hands": hands,
+        "actions": sum(p.actions for p in players),
+        "decision_sec": sum(p.seconds for p in players),
+    }
+
+
+def _run_directory(log_directory: Optional[str], seed: int, run: int) -> Optional[str]:
+    # Every run writes a new hand log and results partition, rather than appending to the previous run's
+    if log_directory is None:
+        return None
+    run_directory = os.path.join(log_directory, f"Run{seed}-{run}")
+    os.makedirs(run_directory)
+    return run_directory
+
+
+def _play_games(evaluator: Evaluator, repeat: int, log_directory: Optional[str] = None) -> dict:
+    """
+    Plays every seeded game `repeat` times, returns the totals with the best time of each game.
+    """
+    totals = {"elapsed": 0.0, "hands": 0, "actions": 0, "decision_sec": 0.0}
+    for seed in range(_GAMES):
+        runs = [_play_game(seed, evaluator, _run_directory(log_directory, seed, run)) for run in range(repeat)]
+        best = min(runs, key=lambda r: r["elapsed"])
+        for key in totals:
+            totals[key] += best[key]
+    return totals
+
+
+def bench_game(repeat: int) -> Dict[str, float]:
+    evaluator = BatchEvaluator()
+    # Also builds the 7 card lookup table outside of the timing
+    memory = _memory(lambda: _play_games(evaluator, 1))
+    played = _play_games(evaluator, repeat)
+
+    # The loop and showdown shares come from other runs with timers around them, so they don't slow the games above
+    timers = {"betting": 0.0, "showdown": 0.0, "showdowns": 0}
+    betting_round, showdown = Round._betting_round, Round._showdown
+
+    def timed_betting_round(self, *args):
+        start = time.perf_counter()
+        betting_round(self, *args)
+        timers["betting"] += time.perf_counter() - start
+
+    def timed_showdown(self):
+        start = time.perf_counter()
+        showdown(self)
+        timers["showdown"] += time.perf_counter() - start
+        timers["showdowns"] += 1
+
+    betting_sec, showdown_sec, showdowns = 0.0, 0.0, 0
+    Round._betting_round, Round._showdown = timed_betting_round, timed_showdown
+    try:
+        for seed in range(_GAMES):
+            best_betting, best_showdown = float("inf"), float("inf")
+            for _ in range(repeat):
+                timers.update(betting=0.0, showdown=0.0, showdowns=0)
+                timed = _play_game(seed, evaluator)
+                best_betting = min(best_betting, timers["betting"] - timed["decision_sec"])
+                best_showdown = min(best_showdown, timers["showdown"])
+            betting_sec += best_betting
+            showdown_sec += best_showdown
+            showdowns += timers["showdowns"]
+    finally:
+        Round._betting_round, Round._showdown = betting_round, showdown
+    return dict({
+        "hands": played["hands"],
+        "actions": played["actions"],
+        "hands_per_sec": played["hands"] / played["elapsed"],
+        "action_us": played["elapsed"] / played["actions"] * 1e6,
+        "betting_loop_action_us": betting_sec / played["actions"] * 1e6,
+        "showdown_us": showdown_sec / max(1, showdowns) * 1e6,
+    }, **memory)
+
+
+def bench_game_with_sinks(repeat: int) -> Dict[str, float]:
+    evaluator = BatchEvaluator()
+    _play_game(0, evaluator)
+    with tempfile.TemporaryDirectory() as log_directory:
+        played = _play_games(evaluator, repeat, log_directory)
+    return {
+        "hands": played["hands"],
+        "actions": played["actions"],
+        "hands_per_sec": played["hands"] / played["elapsed"],
+        "action_us": played["elapsed"] / played["actions"] * 1e6,
+    }
+
+
+def _river_round(evaluator: Evaluator) -> Round:
+    """
+    A round of 6 seated players on the river, everyone still in with their cards dealt.
+    """
+    players = scripted_players()
+    for p in players:
+        p.stack = 2500
+    deck = Deck(0)
+    round = Round(players, 0, deck, evaluator, 50, 25, verbose=False)
+    round._state = TableState(players, 50)
+    for p in players:
+        p.hand = deck.draw(2)
+    round._state.community_cards = deck.draw(5)
+    round._state.round = "River"
+    round._state.pot = 600
+    return round
+
+
+def bench_showdown(repeat: int) -> Dict[str, float]:
+    batch_round = _river_round(BatchEvaluator())
+    treys_round = _river_round(Evaluator())
+    # Builds the 7 card lookup table outside of the timing
+    batch_round._showdown()
+    return dict({
+        "batch_showdown_us": _best(batch_round._showdown, 200, repeat * 10) * 1e6,
+        "treys_showdown_us": _best(treys_round._showdown, 200, repeat * 10) * 1e6,
+    }, **_memory(lambda: [batch_round._showdown() for _ in range(100)]))
+
+
+def _state_reads(state: TableView):
+    # What _state_str reads
+    return state["round"], state["community_cards"], state["pot"], state["active_bet"], state["min_bet"], state["remaining_players"], "equity" in state
+
+
+def bench_table_state(repeat: int) -> Dict[str, float]:
+    players = scripted_players()
+    for p in players:
+        p.stack = 2500
+
+    def build_and_read():
+        state = TableState(players, 50)
+        state.bet(1, 25)
+        state.bet(2, 50)
+        state.fold(3)
+        _state_reads(TableView(state))
+
+    view = TableView(TableState(players, 50))
+    return dict({
+        "build_us": _best(lambda: TableState(players, 50), 2000, repeat * 10) * 1e6,
+        "read_us": _best(lambda: _state_reads(view), 2000, repeat * 10) * 1e6,
+        "hand_setup_us": _best(build_and_read, 2000, repeat * 10) * 1e6,
+    }, **_memory(lambda: [build_and_read() for _ in range(1000)]))
+
+
+def bench_state_str(repeat: int) -> Dict[str, float]:
+    round = _river_round(BatchEvaluator())
+    player = round._active_players[0]
+    state = TableView(round._state)
+    return dict({
+        "state_str_us": _best(lambda: player._state_str(state), 2000, repeat * 10) * 1e6,
+    }, **_memory(lambda: [player._state_str(state) for _ in range(1000)]))
+
+
+def _river_history() -> str:
+    # The longest history a seat read in a seeded game, i.e. a hand that went to the river
+    players = scripted_players(uses_history=True)
+    Poker(players, BatchEvaluator(), Deck(), verbose=False, seed=0, max_hands=20).play_game()
+    return max((p.history for p in players), key=len)
+
+
+def bench_llm_prompt(repeat: int) -> Dict[str, float]:
+    from llm_player import LlmPlayer
+
+    round = _river_round(BatchEvaluator())
+    state = TableView(round._state)
+    history = _river_history()
+    with tempfile.TemporaryDirectory() as log_directory:
+        player = LlmPlayer.from_dict({"name": "Player_0", "model": "model", "system": "You play poker."}, log_directory)
+        player.hand = round._active_players[0].hand
+        valid_actions = [Action.FOLD, Action.CALL, Action.RAISE]
+        build = lambda: player._build_messages(state, valid_actions, history)
+        return dict({
+            "history_chars": len(history),
+            "build_messages_us": _best(build, 500, repeat * 10) * 1e6,
+        }, **_memory(lambda: [build() for _ in range(1000)]))
+
+
+def bench_player_factory(repeat: int) -> Dict[str, float]:
+    configs = {
+        "random": [{"type": "random", "name": f"Random_{i}"} for i in range(_PLAYERS)],
+        "llm": [{"type": "llm", "name": f"Llm_{i}", "model": "model", "system": "You play poker."} for i in range(_PLAYERS)],
+    }
+    result = {}
+    with tempfile.TemporaryDirectory() as log_directory:
+        for name, config in configs.items():
+            players_file = os.path.join(log_directory, f"{name}.json")
+            with open(players_file, "w") as f:
+                json.dump(config, f)
+            # The first call imports the player modules, bench_startup measures that
+            player_factory(players_file, log_directory)
+            result[f"{name}_us"] = _best(lambda: player_factory(players_file, log_directory), 20, repeat * 10) * 1e6
+    return result
+
+
+BENCHMARKS: Dict[str, Callable[[int], Dict[str, float]]] = {
+    "game": bench_game,
+    "game_with_sinks": bench_game_with_sinks,
+    "showdown": bench_showdown,
+    "table_state": bench_table_state,
+    "state_str": bench_state_str,
+    "llm_prompt": bench_llm_prompt,
+    "player_factory": bench_player_factory,
+}
+
+
+def run(names: List[str], repeat: int) -> dict:
+    results = {}
+    for name in names:
+        results[name] = BENCHMARKS[name](repeat)
+    return {
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()} {platform.processor()}".strip(),
+        "repeat": repeat,
+        "benchmarks": results,
+    }
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], cwd=os.path.dirname(BASELINE), capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _change(metric: str, value: float, baseline: float) -> Optional[float]:
+    """
+    How much worse `value` is than `baseline` (negative when better), None for metrics that have to be equal.
+    """
+    if metric.endswith("_per_sec"):
+        return baseline / value - 1.0 if value > 0 else float("inf")
+    if metric.endswith(("_us", "_kib", "_blocks")):
+        return value / baseline - 1.0 if baseline > 0 else (0.0 if value <= 0 else float("inf"))
+    return None
+
+
+def report(results: dict, baseline: Optional[dict] = None, tolerance: float = 0.1) -> List[str]:
+    """
+    Prints every metric (next to the baseline's when given) and returns the regressions: metrics worse
+    than the baseline by more than `tolerance`, or counts that differ.
+    """
+    regressions = []
+    if baseline is not None:
+        print(f"Baseline: commit {baseline['commit']}, Python {baseline['python']}, {baseline['machine']}")
+    for name, metrics in results["benchmarks"].items():
+        print(name)
+        baseline_metrics = baseline["benchmarks"].get(name, {}) if baseline is not None else {}
+        for metric, value in metrics.items():
+            line = f"  {metric:<24} {value:>14,.2f}"
+            if metric in baseline_metrics:
+                expected = baseline_metrics[metric]
+                change = _change(metric, value, expected)
+                if change is None:
+                    flag = "" if value == expected else "  DIFFERENT, the runs aren't comparable"
+                    line += f"   baseline {expected:>14,.2f}{flag}"
+                else:
+                    flag = "  REGRESSION" if change > tolerance else ""
+                    line += f"   baseline {expected:>14,.2f}   {-change if metric.endswith('_per_sec') else change:+7.1%}{flag}"
+                if flag:
+                    regressions.append(f"{name}.{metric}")
+            print(line)
+    return regressions
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the engine's hot paths")
+    parser.add_argument("--only", action="append", choices=list(BENCHMARKS), help="Benchmark to run, all of them by default")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs of every benchmark, the best one is kept")
+    parser.add_argument("--save", nargs="?", const=BASELINE, metavar="PATH", help="Store the results (as the baseline by default)")
+    parser.add_argument("--compare", nargs="?", const=BASELINE, metavar="PATH", help="Compare with stored results (the baseline by default)")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Share a metric may be worse than the baseline before it counts as a regression")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+    results = run(args.only or list(BENCHMARKS), args.repeat)
+    regressions = report(results, baseline, args.tolerance)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=4)
+            f.write("\n")
+        print(f"Saved to {args.save}")
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
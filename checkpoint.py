@@ -0,0 +1,43 @@
+from array import array
+from typing import Optional
+import base64
+import json
+import os
+import random
+
+CHECKPOINT_VERSION = 1
+CHECKPOINT_FILE = "checkpoint.json"
+
+
+def random_state(rng: random.Random) -> dict:
+    """
+    The state of a Mersenne Twister RNG as JSON, its 625 words packed in base64 (about 3.4KB instead of 7KB).
+    """
+    version, words, gauss_next = rng.getstate()
+    return {"version": version, "words": base64.b64encode(array("I", words).tobytes()).decode(), "gauss_next": gauss_next}
+
+
+def set_random_state(rng: random.Random, state: dict):
+    words = array("I")
+    words.frombytes(base64.b64decode(state["words"]))
+    rng.setstate((state["version"], tuple(words), state["gauss_next"]))
+
+
+def save_checkpoint(path: str, checkpoint: dict):
+    """
+    Writes to a temporary file first, so a crash while saving leaves the previous checkpoint intact.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(dict(checkpoint, version=CHECKPOINT_VERSION), f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path: str) -> Optional[dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("version") != CHECKPOINT_VERSION:
+        raise RuntimeError(f"{path} was written by an incompatible version (version {checkpoint.get('version')})")
+    return checkpoint
@@ -0,0 +1,203 @@
+from collections import OrderedDict
+from itertools import permutations
+from typing import Dict, List, Optional, Sequence, Tuple
+import atexit
+import json
+import os
+import random
+import threading
+import time
+
+from treys import Card
+
+try:
+    import fcntl
+except ImportError:
+    # Without it (Windows) processes saving to the same file at once may drop each other's newest entries
+    fcntl = None
+
+from action import Action
+
+# treys suit ints: 1 = spades, 2 = hearts, 4 = diamonds, 8 = clubs
+_SUITS = (1, 2, 4, 8)
+_SUIT_PERMUTATIONS = [dict(zip(_SUITS, p)) for p in permutations(_SUITS)]
+
+
+def canonical_cards(hand: Sequence[int], board: Sequence[int]) -> str:
+    """
+    Encodes the hole cards and the board so every suit-isomorphic deal gets the same string,
+    e.g. [Ah, Kh] and [As, Ks] both become 'AaKa'.
+    Tries every relabelling of the suits and keeps the smallest encoding.
+    """
+    cards = [(Card.get_rank_int(c), Card.get_suit_int(c)) for c in (*hand, *board)]
+    best = None
+    for suit_map in _SUIT_PERMUTATIONS:
+        relabeled = [(r, suit_map[s]) for r, s in cards]
+        candidate = (sorted(relabeled[:len(hand)], reverse=True), sorted(relabeled[len(hand):], reverse=True))
+        if best is None or candidate < best:
+            best = candidate
+    hand_str = "".join(f"{Card.STR_RANKS[r]}{'abcd'[_SUITS.index(s)]}" for r, s in best[0])
+    board_str = "".join(f"{Card.STR_RANKS[r]}{'abcd'[_SUITS.index(s)]}" for r, s in best[1])
+    return f"{hand_str}/{board_str}"
+
+
+class DecisionCache(object):
+    """
+    LRU/TTL cache of the actions a model chose in a given situation.
+    Every entry holds up to `samples` actions, while it isn't full the model keeps being asked so
+    a model sampled with a temperature keeps its spread of answers instead of freezing on the first one.
+    """
+    def __init__(self, max_entries: int = 100000, ttl_sec: Optional[float] = None, samples: int = 1, path: Optional[str] = None):
+        assert max_entries > 0
+        assert samples > 0
+
+        self._max_entries = max_entries
+        self._ttl_sec = ttl_sec
+        self._samples = samples
+        self._path = path
+        self._lock = threading.Lock()
+        # Tables of one process finishing their games together save one at a time
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        # key -> (time of the first sample, actions sampled so far)
+        self._entries: OrderedDict[str, Tuple[float, List[str]]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    @staticmethod
+    def key(namespace: str, state: dict, hand: List[int], stack: int, current_bet: int, valid_actions: List[Action]) -> str:
+        """
+        `namespace` identifies who is deciding (model, system prompt, ...), the rest of the key is the
+        situation as the player sees it with the suits canonicalized. The stack only counts in whole big
+        blinds so that a few chips more or less still hit.
+        """
+        return "|".join([
+            namespace,
+            state["round"],
+            canonical_cards(hand, state["community_cards"]),
+            str(state["position"]),
+            str(stack // state["big_blind"]),
+            str(state["pot"]),
+            str(state["active_bet"]),
+            str(state["min_bet"]),
+            str(current_bet),
+            str(len(state["remaining_players"]) - 1),
+            ",".join(valid_actions),
+        ])
+
+    def get(self, key: str, rng: random.Random) -> Optional[Action]:
+        """
+        Returns one of the sampled actions, picked with the caller's `rng` so seeded games stay
+        reproducible, or None if the model should be asked.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._ttl_sec is not None and time.time() - entry[0] > self._ttl_sec:
+                del self._entries[key]
+                entry = None
+            if entry is None or len(entry[1]) < self._samples:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return Action(rng.choice(entry[1]))
+
+    def __contains__(self, key: str) -> bool:
+        """
+        Whether get() would return an action, without counting a hit or a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (self._ttl_sec is not None and time.time() - entry[0] > self._ttl_sec):
+                return False
+            return len(entry[1]) >= self._samples
+
+    def put(self, key: str, action: Action):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = (time.time(), [])
+                self._entries[key] = entry
+            if len(entry[1]) < self._samples:
+                entry[1].append(str(action))
+                self._dirty = True
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def load(self):
+        with self._lock:
+            for key, (created, actions) in _read_entries(self._path).items():
+                self._entries[key] = (created, actions)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def save(self):
+        """
+        Merges the entries into the file, so processes sharing the path (simulate.py -w) add to it
+        rather than overwrite each other. Does nothing when nothing was added since the last save.
+        """
+        if self._path is None:
+            return
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                entries = dict(self._entries)
+                self._dirty = False
+            lock_file = open(f"{self._path}.lock", "w") if fcntl is not None else None
+            try:
+                if lock_file is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                merged = _read_entries(self._path) if os.path.exists(self._path) else {}
+                for key, (created, actions) in entries.items():
+                    # Keep whichever process sampled the situation more, it's the same model
+                    saved = merged.pop(key, None)
+                    if saved is not None and len(saved[1]) > len(actions):
+                        created, actions = min(created, saved[0]), saved[1]
+                    merged[key] = (created, actions)
+                # Ours are the most recently used, the other processes' only ones are the first to go
+                for key in list(merged)[:max(0, len(merged) - self._max_entries)]:
+                    del merged[key]
+                # Write to a temporary file of this process first so a crash never leaves a truncated cache behind
+                tmp_path = f"{self._path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(merged, f)
+                os.replace(tmp_path, self._path)
+            finally:
+                if lock_file is not None:
+                    lock_file.close()
+
+
+def _read_entries(path: str) -> Dict[str, Tuple[float, List[str]]]:
+    with open(path, "r") as f:
+        return {key: (created, actions) for key, (created, actions) in json.load(f).items()}
+
+
+_caches: Dict[Optional[str], DecisionCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_decision_cache(d: dict) -> DecisionCache:
+    """
+    Returns the cache described by a "decisionCache" entry of players.json.
+    Players configured with the same path (or no path) share one cache, their keys are namespaced.
+    Caches with a path are saved by their players at the end of every game, and when the process exits.
+    """
+    path = d.get("path")
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = DecisionCache(
+                max_entries=d.get("maxEntries", 100000),
+                ttl_sec=d.get("ttlSec"),
+                samples=d.get("samples", 1),
+                path=path
+            )
+            _caches[path] = cache
+            if path is not None:
+                atexit.register(cache.save)
+        return cache
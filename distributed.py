@@ -0,0 +1,322 @@
+"""
+Runs a tournament's games on several machines.
+The coordinator holds the tournament (players config, game count, seeds) and hands games out over
+HTTP/JSON, workers lease games, play them with simulate's machinery and post the results back:
+
+    GET  /spec       -> {"players": [...], "metrics": bool}
+    POST /lease      {"worker", "max"} -> {"games": [{"id", "seed", "rotation"}], "lease_sec", "done"}
+    POST /heartbeat  {"worker", "ids"} keeps the worker's leases alive
+    POST /result     {"worker", "id", "result"} or {"worker", "id", "error"}
+
+Games whose worker reports an error or whose lease runs out without a heartbeat (the worker died) go
+back in the queue, up to --retries times. Results are merged in game order, so the
+summary is the same as simulate.py's for the same seeds.
+
+    python distributed.py coordinator players.json -n 100 --port 8765
+    python distributed.py worker http://coordinator:8765 --base-url http://localhost:1234/v1 -t 4
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os.path import join
+from typing import Callable, Dict, List, Optional
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import traceback
+import urllib.error
+import urllib.request
+
+from metrics import Metrics
+import simulate
+
+
+class Coordinator(object):
+    """
+    Queue of the tournament's games with their leases, attempts and results.
+    """
+    def __init__(self, players: List[dict], games: int, seed: int = 0, duplicate: bool = False, retries: int = 2,
+                 lease_sec: float = 60.0, metrics: bool = False):
+        assert games > 0
+        self.players = players
+        self.metrics = metrics
+        self._retries = retries
+        self._lease_sec = lease_sec
+        self._lock = threading.Lock()
+        rotations = len(players) if duplicate else 1
+        self._games = [
+            {"id": i, "seed": seed + g, "rotation": rotation}
+            for i, (g, rotation) in enumerate((g, r) for g in range(games) for r in range(rotations))
+        ]
+        self._pending = deque(range(len(self._games)))
+        # id -> (worker, lease deadline)
+        self._leases: Dict[int, tuple] = {}
+        self._attempts: Dict[int, int] = {}
+        self.results: Dict[int, dict] = {}
+        self.errors: Dict[int, List[str]] = {}
+        self.failed: List[int] = []
+        self.finished = threading.Event()
+
+    def _expire_leases(self):
+        # Called with the lock held, by every request and by the coordinator's progress loop
+        now = time.monotonic()
+        for game_id, (worker, deadline) in list(self._leases.items()):
+            if deadline < now:
+                del self._leases[game_id]
+                # A game that keeps killing its worker (out of memory, crash, hang) runs out of retries too
+                self._fail(game_id, worker, "lease expired without a heartbeat", requeue=self._pending.appendleft)
+
+    def _fail(self, game_id: int, worker: str, error: str, requeue: Callable[[int], None]):
+        self._attempts[game_id] = self._attempts.get(game_id, 0) + 1
+        self.errors.setdefault(game_id, []).append(f"{worker}: {error}")
+        if self._attempts[game_id] > self._retries:
+            print(f"Game {game_id} failed on {worker} ({error}), giving up after {self._attempts[game_id]} attempts")
+            self.failed.append(game_id)
+        else:
+            print(f"Game {game_id} failed on {worker} ({error}, attempt {self._attempts[game_id]}), queueing it again")
+            requeue(game_id)
+        self._check_finished()
+
+    def _check_finished(self):
+        if len(self.results) + len(self.failed) == len(self._games):
+            self.finished.set()
+
+    def lease(self, worker: str, max_games: int) -> dict:
+        with self._lock:
+            self._expire_leases()
+            games = []
+            while self._pending and len(games) < max_games:
+                game_id = self._pending.popleft()
+                self._leases[game_id] = (worker, time.monotonic() + self._lease_sec)
+                games.append(self._games[game_id])
+            return {"games": games, "lease_sec": self._lease_sec, "done": self.finished.is_set()}
+
+    def heartbeat(self, worker: str, ids: List[int]):
+        with self._lock:
+            for game_id in ids:
+                if self._leases.get(game_id, (None,))[0] == worker:
+                    self._leases[game_id] = (worker, time.monotonic() + self._lease_sec)
+            self._expire_leases()
+
+    def report(self, worker: str, game_id: int, result: Optional[dict], error: Optional[str]):
+        with self._lock:
+            if game_id in self.results or game_id in self.failed:
+                # A game that was queued again after its lease ran out may come back twice
+                return
+            self._leases.pop(game_id, None)
+            if error is None:
+                self.results[game_id] = result
+                if game_id in self._pending:
+                    # Its lease ran out but the worker got there in the end
+                    self._pending.remove(game_id)
+                self._check_finished()
+            else:
+                self._fail(game_id, worker, error, requeue=self._pending.append)
+
+    def progress(self) -> str:
+        with self._lock:
+            # Leases also run out while no worker is asking for games
+            self._expire_leases()
+            return f"{len(self.results)}/{len(self._games)} games done, {len(self._leases)} leased, {len(self.failed)} failed"
+
+    def ordered_results(self) -> List[dict]:
+        return [self.results[game_id] for game_id in sorted(self.results)]
+
+
+def _handler(coordinator: Coordinator):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, body: dict, status: int = 200):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/spec":
+                self._reply({"players": coordinator.players, "metrics": coordinator.metrics})
+            else:
+                self._reply({"error": f"Unknown path {self.path}"}, 404)
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            if self.path == "/lease":
+                self._reply(coordinator.lease(body["worker"], body.get("max", 1)))
+            elif self.path == "/heartbeat":
+                coordinator.heartbeat(body["worker"], body["ids"])
+                self._reply({})
+            elif self.path == "/result":
+                coordinator.report(body["worker"], body["id"], body.get("result"), body.get("error"))
+                self._reply({})
+            else:
+                self._reply({"error": f"Unknown path {self.path}"}, 404)
+
+    return Handler
+
+
+def run_coordinator(coordinator: Coordinator, host: str, port: int, local_workers: int = 0, linger_sec: float = 2.0) -> List[dict]:
+    """
+    Serves the games until every one of them has a result or ran out of retries, returns the results in game order.
+    `local_workers` worker processes are started on this machine too.
+    """
+    server = ThreadingHTTPServer((host, port), _handler(coordinator))
+    threading.Thread(target=server.serve_forever, name="coordinator", daemon=True).start()
+    url = f"http://{'127.0.0.1' if host in ('', '0.0.0.0') else host}:{server.server_address[1]}"
+    print(f"Coordinator listening on {url}")
+    workers = [subprocess.Popen([sys.executable, os.path.abspath(__file__), "worker", url]) for _ in range(local_workers)]
+
+    while not coordinator.finished.wait(10.0):
+        print(coordinator.progress())
+    print(coordinator.progress())
+    # Give the workers a moment to be told there is nothing left before going away
+    time.sleep(linger_sec)
+    server.shutdown()
+    for w in workers:
+        w.wait()
+    return coordinator.ordered_results()
+
+
+def _request(url: str, body: Optional[dict] = None, retries: int = 5) -> dict:
+    data = json.dumps(body).encode() if body is not None else None
+    for attempt in range(retries + 1):
+        try:
+            request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return json.loads(response.read())
+        except (urllib.error.URLError, ConnectionError, TimeoutError):
+            if attempt == retries:
+                raise
+            time.sleep(min(2 ** attempt, 30))
+
+
+def run_worker(coordinator_url: str, log_directory: str, tables: int = 1, base_url: Optional[str] = None, hand_logs: bool = False):
+    """
+    Leases games from the coordinator and plays them until there are none left, `tables` at a time.
+    `base_url` points this machine's LLM players at its own model server (instead of their baseUrl or endpoints).
+    """
+    worker = f"{socket.gethostname()}-{os.getpid()}"
+    spec = _request(f"{coordinator_url}/spec")
+    players = spec["players"]
+    if base_url is not None:
+        players = [
+            dict({k: v for k, v in p.items() if k != "endpoints"}, baseUrl=base_url) if p.get("type") == "llm" else p
+            for p in players
+        ]
+    os.makedirs(log_directory, exist_ok=True)
+    players_file = join(log_directory, "players.json")
+    with open(players_file, "w") as f:
+        json.dump(players, f, indent=4)
+    simulate._init_worker(players_file, log_directory, hand_logs, spec["metrics"])
+
+    playing: Dict[int, dict] = {}
+    playing_lock = threading.Lock()
+    stop = threading.Event()
+
+    def heartbeat(interval_sec: float):
+        while not stop.wait(interval_sec):
+            with playing_lock:
+                ids = list(playing)
+            if ids:
+                try:
+                    _request(f"{coordinator_url}/heartbeat", {"worker": worker, "ids": ids}, retries=1)
+                except (urllib.error.URLError, ConnectionError, TimeoutError):
+                    pass
+
+    def table_loop():
+        while True:
+            try:
+                lease = _request(f"{coordinator_url}/lease", {"worker": worker, "max": 1})
+            except (urllib.error.URLError, ConnectionError, TimeoutError):
+                # The coordinator went away, most likely because the tournament is over
+                return
+            if not lease["games"]:
+                if lease["done"]:
+                    return
+                # Everything left is leased to other workers, one of them might still fail
+                time.sleep(1.0)
+                continue
+            game = lease["games"][0]
+            with playing_lock:
+                playing[game["id"]] = game
+            try:
+                work = (game["seed"], game["rotation"])
+                # Concurrent tables can't share player objects
+                result = simulate._play_table(work) if tables > 1 else simulate._play_seeded_games([work])[0]
+                report = {"worker": worker, "id": game["id"], "result": result}
+            except Exception as _:
+                report = {"worker": worker, "id": game["id"], "error": traceback.format_exc()}
+            with playing_lock:
+                del playing[game["id"]]
+            try:
+                _request(f"{coordinator_url}/result", report)
+            except (urllib.error.URLError, ConnectionError, TimeoutError):
+                return
+
+    lease_sec = _request(f"{coordinator_url}/lease", {"worker": worker, "max": 0})["lease_sec"]
+    threading.Thread(target=heartbeat, args=(lease_sec / 3,), name="heartbeat", daemon=True).start()
+    with ThreadPoolExecutor(max_workers=tables) as pool:
+        for _ in range(tables):
+            pool.submit(table_loop)
+    stop.set()
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play a tournament's games on several machines")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    coordinator_parser = commands.add_parser("coordinator", help="Hand out the games and merge the results")
+    coordinator_parser.add_argument("players_file", nargs="?", default="players.json")
+    coordinator_parser.add_argument("-n", "--games", type=int, default=100, help="Number of games to play")
+    coordinator_parser.add_argument("-s", "--seed", type=int, default=0, help="Seed of the first game, game i uses seed + i")
+    coordinator_parser.add_argument("-d", "--duplicate", action="store_true", help="Play every seed once per seat rotation")
+    coordinator_parser.add_argument("--host", default="0.0.0.0")
+    coordinator_parser.add_argument("--port", type=int, default=8765)
+    coordinator_parser.add_argument("--retries", type=int, default=2, help="Times a game that failed or whose lease ran out is played again before giving up on it")
+    coordinator_parser.add_argument("--lease-sec", type=float, default=60.0, help="A game goes back in the queue when its worker is silent this long")
+    coordinator_parser.add_argument("--local-workers", type=int, default=0, help="Also start this many workers on this machine")
+    coordinator_parser.add_argument("--metrics", help="Merge the games' metrics into this .json, .csv or .prom file")
+    coordinator_parser.add_argument("-o", "--output", help="Write the summary to this JSON file instead of stdout")
+
+    worker_parser = commands.add_parser("worker", help="Play games leased from a coordinator")
+    worker_parser.add_argument("coordinator_url", help="e.g. http://192.168.1.10:8765")
+    worker_parser.add_argument("-t", "--tables", type=int, default=1, help="Number of games played concurrently")
+    worker_parser.add_argument("--base-url", help="Model server of this machine, replaces every LLM player's baseUrl and endpoints")
+    worker_parser.add_argument("--hand-logs", action="store_true", help="Write every game's hand events to a JSONL file")
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        run_worker(args.coordinator_url.rstrip("/"), f"Worker{str(datetime.now())}", args.tables, args.base_url, args.hand_logs)
+        sys.exit(0)
+
+    with open(args.players_file, "r") as f:
+        players = json.load(f)
+    coordinator = Coordinator(players, args.games, args.seed, args.duplicate, args.retries, args.lease_sec, args.metrics is not None)
+    start = time.perf_counter()
+    results = run_coordinator(coordinator, args.host, args.port, args.local_workers)
+    elapsed = time.perf_counter() - start
+
+    if args.metrics:
+        metrics = Metrics(args.metrics)
+        for r in results:
+            metrics.merge(r.pop("metrics"))
+        metrics.export()
+    summary = simulate.summarize(results)
+    summary["elapsed_sec"] = elapsed
+    summary["hands_per_sec"] = summary["hands"] / elapsed if elapsed > 0 else 0.0
+    summary["failed_games"] = {str(game_id): coordinator.errors[game_id] for game_id in coordinator.failed}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=4)
+    else:
+        print(json.dumps(summary, indent=4))
@@ -0,0 +1,101 @@
+from collections import OrderedDict
+from typing import List, Optional
+import math
+import threading
+
+from treys import Deck
+import numpy as np
+
+from decision_cache import canonical_cards
+from hand_eval import BatchEvaluator
+from preflop import MAX_OPPONENTS, PreflopTable
+
+_FULL_DECK = np.array(Deck.GetFullDeck(), dtype=np.int64)
+
+
+class EquityService(object):
+    """
+    Estimates the share of the pot a hand wins against random opponent hands by Monte Carlo rollouts
+    of the rest of the deck, all rollouts of a batch being ranked in one BatchEvaluator call.
+    Sampling stops early once the 95% confidence interval is narrower than +/- `tolerance`.
+    Results are memoized per suit-canonical (hole cards, board, opponent count).
+    Pre-flop queries are answered from `preflop_table` without any simulation when one is given.
+    """
+    def __init__(
+            self,
+            evaluator: BatchEvaluator,
+            batch_size: int = 500,
+            max_samples: int = 4000,
+            tolerance: float = 0.02,
+            cache_size: int = 100000,
+            seed: Optional[int] = None,
+            preflop_table: Optional[PreflopTable] = None
+    ):
+        assert batch_size > 0
+        assert max_samples >= batch_size
+
+        self._evaluator = evaluator
+        self._batch_size = batch_size
+        self._max_samples = max_samples
+        self._tolerance = tolerance
+        self._cache_size = cache_size
+        self._cache: OrderedDict[tuple, float] = OrderedDict()
+        self._lock = threading.Lock()
+        self._rng = np.random.default_rng(seed)
+        self._preflop_table = preflop_table
+
+    def equity(self, hand: List[int], board: List[int], opponents: int) -> float:
+        """
+        Returns the expected share of the pot (0.0 to 1.0) of `hand` on `board` against `opponents` players.
+        """
+        if opponents <= 0:
+            return 1.0
+        if len(board) == 0 and self._preflop_table is not None and opponents <= MAX_OPPONENTS:
+            return self._preflop_table.equity(hand, opponents)
+        key = (canonical_cards(hand, board), opponents)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        result = self._simulate(hand, board, opponents)
+
+        with self._lock:
+            self._cache[key] = result
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def _simulate(self, hand: List[int], board: List[int], opponents: int) -> float:
+        remaining = _FULL_DECK[~np.isin(_FULL_DECK, hand + board)]
+        board_missing = 5 - len(board)
+        needed = board_missing + 2 * opponents
+
+        total = 0.0
+        total_sq = 0.0
+        samples = 0
+        while samples < self._max_samples:
+            with self._lock:
+                uniforms = self._rng.random((self._batch_size, len(remaining)))
+            drawn = remaining[uniforms.argsort(axis=1)[:, :needed]]
+            boards = np.concatenate([np.broadcast_to(np.asarray(board, dtype=np.int64), (self._batch_size, len(board))), drawn[:, :board_missing]], axis=1)
+
+            # Rank the hero and every opponent on each rollout's board in a single call
+            hole_cards = np.concatenate([np.broadcast_to(np.asarray(hand, dtype=np.int64), (self._batch_size, 2)), drawn[:, board_missing:]], axis=1)
+            ranks = self._evaluator.evaluate_batch(
+                np.repeat(boards, opponents + 1, axis=0),
+                hole_cards.reshape(-1, 2)
+            ).reshape(self._batch_size, opponents + 1)
+
+            best = ranks.min(axis=1)
+            hero_is_best = ranks[:, 0] == best
+            share = np.where(hero_is_best, 1.0 / (ranks == best[:, None]).sum(axis=1), 0.0)
+
+            total += share.sum()
+            total_sq += (share * share).sum()
+            samples += self._batch_size
+            mean = total / samples
+            variance = max(total_sq / samples - mean * mean, 0.0)
+            if 1.96 * math.sqrt(variance / samples) <= self._tolerance:
+                break
+        return total / samples
@@ -0,0 +1,107 @@
+from itertools import combinations, combinations_with_replacement
+from typing import List
+
+from treys import Card, Evaluator
+from treys.lookup import LookupTable
+import numpy as np
+
+# Rows evaluated at once, bounds the size of the temporaries
+_CHUNK_SIZE = 1 << 15
+
+# Upper rank bound of each rank class, in the order of LookupTable.MAX_TO_RANK_CLASS
+_RANK_CLASS_MAXES = np.array(sorted(LookupTable.MAX_TO_RANK_CLASS), dtype=np.int32)
+
+# Where each treys suit (1, 2, 4, 8) puts its 13 rank bits when all four suits are packed in one int64
+_SUIT_SHIFTS = np.zeros(16, dtype=np.int64)
+_SUIT_SHIFTS[[1, 2, 4, 8]] = [0, 13, 26, 39]
+
+
+class BatchEvaluator(Evaluator):
+    """
+    treys Evaluator that can also rank many hands in one call.
+    The lookup tables of treys are extended to 6 and 7 cards and turned into numpy arrays, so a hand is
+    ranked from the prime product of its ranks (binary searched) and the rank bits of each suit (indexed
+    directly) instead of trying every 5 card subset in Python.
+    Ranks are the same as Evaluator.evaluate, lower is better.
+    """
+    def __init__(self):
+        super().__init__()
+
+        # Best straight flush/flush for every set of rank bits of one suit, suits with less than 5 cards
+        # get a rank worse than any real hand so they never win the minimum
+        five_card_flushes = {}
+        for bits in range(1 << 13):
+            if bits.bit_count() == 5:
+                five_card_flushes[bits] = self.table.flush_lookup[Card.prime_product_from_rankbits(bits)]
+        self._best_flush = np.full(1 << 13, LookupTable.MAX_HIGH_CARD + 1, dtype=np.int32)
+        for bits in range(1 << 13):
+            if bits.bit_count() >= 5:
+                single_bits = [1 << i for i in range(13) if bits & (1 << i)]
+                self._best_flush[bits] = min(five_card_flushes[sum(c)] for c in combinations(single_bits, 5))
+
+        # Best non flush rank of every multiset of 5 ranks, keyed by the product of the rank primes
+        products = np.array(sorted(self.table.unsuited_lookup), dtype=np.int64)
+        self._unsuited_products = {5: products}
+        self._unsuited_ranks = {5: np.array([self.table.unsuited_lookup[int(p)] for p in products], dtype=np.int32)}
+
+        self._combos = {n: np.array(list(combinations(range(n), 5)), dtype=np.intp) for n in (6, 7)}
+
+    def evaluate_batch(self, boards: np.ndarray, hands: np.ndarray) -> np.ndarray:
+        """
+        Ranks hands[i] on boards[i] for every row.
+        `boards` is (N, 3..5) and `hands` is (N, 2) of treys card ints, returns an (N,) int32 array of ranks.
+        """
+        cards = np.concatenate([np.asarray(hands, dtype=np.int64), np.asarray(boards, dtype=np.int64)], axis=1)
+        assert 5 <= cards.shape[1] <= 7, "Every row needs 5 to 7 cards"
+        ranks = np.empty(cards.shape[0], dtype=np.int32)
+        for start in range(0, cards.shape[0], _CHUNK_SIZE):
+            ranks[start:start + _CHUNK_SIZE] = self._rank_cards(cards[start:start + _CHUNK_SIZE])
+        return ranks
+
+    def evaluate_hands(self, board: List[int], hands: List[List[int]]) -> List[int]:
+        """
+        Ranks several players' hole cards on the same board, e.g. at showdown.
+        """
+        boards = np.broadcast_to(np.asarray(board, dtype=np.int64), (len(hands), len(board)))
+        return self.evaluate_batch(boards, np.asarray(hands, dtype=np.int64)).tolist()
+
+    def rank_classes(self, ranks: np.ndarray) -> np.ndarray:
+        """
+        Vectorized get_rank_class, e.g. 3 for a full house (see LookupTable.RANK_CLASS_TO_STRING).
+        """
+        return np.searchsorted(_RANK_CLASS_MAXES, ranks, side="left").astype(np.int32)
+
+    def _unsuited_table(self, card_count: int):
+        """
+        Builds the 6 and 7 card rank multiset tables the first time they are needed, by ranking every
+        5 card subset of one hand per multiset with suits spread so that none of them is a flush.
+        """
+        if card_count not in self._unsuited_products:
+            multisets = [m for m in combinations_with_replacement(range(13), card_count) if max(m.count(r) for r in m) <= 4]
+            cards = np.array(
+                [[Card.new(Card.STR_RANKS[r] + "shdc"[i % 4]) for i, r in enumerate(m)] for m in multisets],
+                dtype=np.int64
+            )
+            subsets = cards[:, self._combos[card_count]].reshape(-1, 5)
+            ranks = self._rank_cards(subsets).reshape(len(multisets), -1).min(axis=1)
+            products = np.prod(cards & 0xFF, axis=1)
+            order = np.argsort(products)
+            self._unsuited_products[card_count] = products[order]
+            self._unsuited_ranks[card_count] = ranks[order].astype(np.int32)
+        return self._unsuited_products[card_count], self._unsuited_ranks[card_count]
+
+    def _rank_cards(self, cards: np.ndarray) -> np.ndarray:
+        unsuited_products, unsuited_ranks = self._unsuited_table(cards.shape[1])
+        # Column by column is much faster than reducing over the short card axis
+        products = cards[:, 0] & 0xFF
+        suits_bits = ((cards[:, 0] >> 16) & 0x1FFF) << _SUIT_SHIFTS[(cards[:, 0] >> 12) & 0xF]
+        for i in range(1, cards.shape[1]):
+            products = products * (cards[:, i] & 0xFF)
+            # Cards are unique so adding them never carries into another suit's 13 bits
+            suits_bits += ((cards[:, i] >> 16) & 0x1FFF) << _SUIT_SHIFTS[(cards[:, i] >> 12) & 0xF]
+
+        idx = np.searchsorted(unsuited_products, products)
+        ranks = unsuited_ranks[np.minimum(idx, len(unsuited_products) - 1)]
+        for shift in (0, 13, 26, 39):
+            np.minimum(ranks, self._best_flush[(suits_bits >> shift) & 0x1FFF], out=ranks)
+        return ranks
@@ -0,0 +1,157 @@
+from enum import StrEnum
+from typing import IO, Iterator, List, NamedTuple, Optional, Tuple
+import json
+
+from treys import Card
+
+
+class EventType(StrEnum):
+    HAND_START = "HAND_START"
+    HOLE_CARDS = "HOLE_CARDS"
+    BLIND = "BLIND"
+    STREET = "STREET"
+    ACTION = "ACTION"
+    SHOWDOWN = "SHOWDOWN"
+    POT_WON = "POT_WON"
+
+
+class HandEvent(NamedTuple):
+    """
+    One thing that happened during a hand. Only the fields that make sense for the type are set:
+        HAND_START  seats, stacks, amount (dealer position), seed (of the deck, when the game is seeded)
+        HOLE_CARDS  player, cards
+        BLIND       player, action ("small"/"big"), amount
+        STREET      description (street name), cards (board)
+        ACTION      player, action, amount (chips put in), seconds
+        SHOWDOWN    player, cards (hand), amount (score), description (e.g. "Full House")
+        POT_WON     winners, amount (pot)
+    """
+    type: EventType
+    hand: int = 0
+    player: str = ""
+    action: str = ""
+    amount: int = 0
+    cards: Tuple[int, ...] = ()
+    seconds: float = 0.0
+    description: str = ""
+    seats: Tuple[str, ...] = ()
+    stacks: Tuple[int, ...] = ()
+    winners: Tuple[str, ...] = ()
+    seed: Optional[int] = None
+
+    def to_json(self) -> str:
+        # Leave the defaults out, most events only use two or three fields
+        return json.dumps({k: v for k, v in zip(self._fields, self) if k == "type" or v != _DEFAULTS[k]}, separators=(",", ":"))
+
+    @staticmethod
+    def from_json(line: str) -> "HandEvent":
+        d = json.loads(line)
+        for k in ("cards", "seats", "stacks", "winners"):
+            if k in d:
+                d[k] = tuple(d[k])
+        d["type"] = EventType(d["type"])
+        return HandEvent(**d)
+
+    def render(self) -> str:
+        """
+        The line(s) of the text history the players read, private information (hole cards) renders to nothing.
+        """
+        if self.type == EventType.BLIND:
+            return f">>> {self.player} posts {self.action} blind of {self.amount}\n"
+        if self.type == EventType.STREET:
+            if len(self.cards) == 0:
+                return f"---- {self.description} ----\n"
+            return f"---- {self.description} ----\n{Card.ints_to_pretty_str(list(self.cards))}\n"
+        if self.type == EventType.ACTION:
+            return f">>> {self.player} chooses to: {self.action} in {self.seconds:.3f}s\n"
+        if self.type == EventType.SHOWDOWN:
+            return f"{self.player} ({Card.ints_to_pretty_str(list(self.cards))}): {self.description} (Score: {self.amount})\n"
+        if self.type == EventType.POT_WON:
+            if len(self.winners) == 1:
+                return f"\n>>> {self.winners[0]} wins the pot of {self.amount}!\n"
+            return f"\n>>> Split Pot! ({len(self.winners)} ways)\n"
+        return ""
+
+
+_DEFAULTS = HandEvent._field_defaults
+
+
+class HandLogWriter(object):
+    """
+    Appends events to a JSONL file, keeping the file open and writing them in batches.
+    """
+    def __init__(self, path: str, batch_size: int = 512):
+        self._file: IO = open(path, "a", buffering=1 << 16)
+        self._batch_size = batch_size
+        self._pending: List[str] = []
+
+    def write(self, event: HandEvent):
+        self._pending.append(event.to_json())
+        if len(self._pending) >= self._batch_size:
+            self.flush()
+
+    def flush(self):
+        if len(self._pending) > 0:
+            self._file.write("\n".join(self._pending) + "\n")
+            self._pending = []
+        self._file.flush()
+
+    def tell(self) -> int:
+        """
+        Size of the log once every pending event is written.
+        """
+        self.flush()
+        return self._file.tell()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+
+class HandHistory(object):
+    """
+    Events of the hand being played. Every event is passed on to the sinks (e.g. a HandLogWriter) and
+    the text history is only rendered when a player asks for it, picking up where the last render stopped.
+    """
+    def __init__(self, hand: int = 0, sinks: Optional[List] = None):
+        self.hand = hand
+        self.events: List[HandEvent] = []
+        self._sinks = sinks if sinks is not None else []
+        self._text = ""
+        self._rendered = 0
+
+    def add(self, event_type: EventType, **fields):
+        event = HandEvent(event_type, self.hand, **fields)
+        self.events.append(event)
+        for sink in self._sinks:
+            sink.write(event)
+
+    def render(self) -> str:
+        if self._rendered < len(self.events):
+            self._text += "".join(e.render() for e in self.events[self._rendered:])
+            self._rendered = len(self.events)
+        return self._text
+
+
+def read_hand_log(path: str) -> Iterator[HandEvent]:
+    """
+    Streams the events of a log one line at a time.
+    """
+    with open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                yield HandEvent.from_json(line)
+
+
+def read_hands(path: str) -> Iterator[List[HandEvent]]:
+    """
+    Streams a log one hand (list of events) at a time.
+    """
+    hand: List[HandEvent] = []
+    for event in read_hand_log(path):
+        if event.type == EventType.HAND_START and len(hand) > 0:
+            yield hand
+            hand = []
+        hand.append(event)
+    if len(hand) > 0:
+        yield hand
@@ -29,20 +29,20 @@ class HumanPlayer(Player):
 </Decision>
 
 Reply ONLY with your chosen action from the list of valid actions."""
-        with open(self._log_file_path, "a") as f:
-            f.write(f"Game State:\n{prompt}\n")
-            print(prompt)
-            response_text = None
-            while True:
+        f = self._open_log()
+        f.write(f"Game State:\n{prompt}\n")
+        print(prompt)
+        response_text = None
+        while True:
+            response_text = ""
+            try:
+                response_text = input(f"{self._name}'s action: ").strip().lower()
+                if response_text in valid_actions:
+                    break
+            except Exception as _:
+                f.write(f"ERROR: Failed to prompt human {traceback.format_exc()}\n")
                 response_text = ""
-                try:
-                    response_text = input(f"{self._name}'s action: ").strip().lower()
-                    if response_text in valid_actions:
-                        break
-                except Exception as _:
-                    f.write(f"ERROR: Failed to prompt human {traceback.format_exc()}\n")
-                    response_text = ""
-                print(f"ERROR: '{response_text}' is not a valid choice, try again")
-            assert response_text in valid_actions
-            f.write(f"DEBUG: Used '{response_text}'\n")
-            return Action(response_text)
+            print(f"ERROR: '{response_text}' is not a valid choice, try again")
+        assert response_text in valid_actions
+        f.write(f"DEBUG: Used '{response_text}'\n")
+        return Action(response_text)
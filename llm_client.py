@@ -0,0 +1,329 @@
+"""
+Every LLM request in the process goes through one asyncio event loop running on a background
+thread, using one AsyncOpenAI client (and therefore one pooled set of HTTP connections) per server.
+Callers on any thread submit a coroutine with run() and block on the result, so tables running on
+different threads keep several requests in flight at once while each table stays sequential.
+Players send their requests through an EndpointPool, which spreads them over one or more servers and
+keeps as many requests in flight as their concurrency caps allow, for the servers to batch together.
+A BatchDispatcher in front of the pool goes further and sends the prompts for the same model from every
+table as one multi-prompt request.
+"""
+
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Coroutine, Dict, List, Optional, Tuple
+import asyncio
+import threading
+import time
+
+from openai import APIStatusError, AsyncOpenAI
+
+DEFAULT_BASE_URL = "http://localhost:1234/v1"
+DEFAULT_API_KEY = "lm-studio"
+
+_loop: asyncio.AbstractEventLoop = None
+_loop_lock = threading.Lock()
+_clients: Dict[Tuple[str, str, int], AsyncOpenAI] = {}
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-client-loop", daemon=True).start()
+        return _loop
+
+
+def submit(coro: Coroutine) -> Future:
+    """
+    Starts the coroutine on the shared event loop without waiting for it, cancelling the future cancels it.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def run(coro: Coroutine):
+    """
+    Runs the coroutine on the shared event loop and waits for its result from the calling thread.
+    """
+    return submit(coro).result()
+
+
+def get_client(base_url: str = DEFAULT_BASE_URL, api_key: str = DEFAULT_API_KEY, max_retries: int = 2) -> AsyncOpenAI:
+    """
+    Returns the client shared by every player talking to `base_url`.
+    `max_retries` are the SDK's own retries on the same server (2 is its default).
+    """
+    key = (base_url, api_key, max_retries)
+    with _loop_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = AsyncOpenAI(base_url=base_url, api_key=api_key, max_retries=max_retries)
+            _clients[key] = client
+        return client
+
+
+# Consecutive failures after which an endpoint is only used again once the cooldown has passed,
+# or when every endpoint of the pool is down
+UNHEALTHY_AFTER = 3
+UNHEALTHY_COOLDOWN_SEC = 30.0
+
+# Signalled whenever an endpoint frees a slot, every request runs on the shared loop so one is enough
+_capacity = asyncio.Condition()
+_endpoints: Dict[Tuple[str, str], "Endpoint"] = {}
+_pools: Dict[tuple, "EndpointPool"] = {}
+
+
+class Endpoint(object):
+    """
+    One model server with its in-flight request count and health, shared by every pool that lists it.
+    """
+    def __init__(self, base_url: str, api_key: str, max_concurrency: Optional[int]):
+        self.base_url = base_url
+        self._api_key = api_key
+        self._client: Optional[AsyncOpenAI] = None
+        self.max_concurrency = max_concurrency
+        self.outstanding = 0
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+        # Moving average of the request latency
+        self.latency_sec = 0.0
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        # Built on the first request, players that are never asked anything don't pay for it
+        if self._client is None:
+            # The pool does the retrying, on another endpoint and within its timeout
+            self._client = get_client(self.base_url, self._api_key, max_retries=0)
+        return self._client
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.unhealthy_until
+
+    def has_capacity(self) -> bool:
+        return self.max_concurrency is None or self.outstanding < self.max_concurrency
+
+    def load(self) -> float:
+        return self.outstanding / self.max_concurrency if self.max_concurrency else float(self.outstanding)
+
+    def record_success(self, latency_sec: float):
+        self.successes += 1
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+        self.latency_sec = latency_sec if self.successes == 1 else 0.8 * self.latency_sec + 0.2 * latency_sec
+
+    def record_failure(self):
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= UNHEALTHY_AFTER:
+            self.unhealthy_until = time.monotonic() + UNHEALTHY_COOLDOWN_SEC
+
+    def stats(self) -> dict:
+        return {
+            "outstanding": self.outstanding,
+            "successes": self.successes,
+            "failures": self.failures,
+            "healthy": self.healthy(time.monotonic()),
+            "latency_sec": self.latency_sec,
+        }
+
+
+def _retryable(e: Exception) -> bool:
+    # A request the server rejects (bad request, context too long, ...) fails the same way anywhere
+    if isinstance(e, APIStatusError):
+        return e.status_code >= 500 or e.status_code in (408, 409, 429)
+    return True
+
+
+class EndpointPool(object):
+    """
+    Spreads requests over several servers of the same model.
+    Each request goes to the healthy endpoint with the fewest requests in flight (preferring the ones whose
+    last request succeeded, then relative to its concurrency cap, then the lowest latency), waiting for a
+    free slot when every endpoint is at its cap.
+    A request that fails or takes longer than `timeout_sec` is retried on another endpoint, up to `retries` times.
+    Only those failures count against an endpoint's health, a request the server rejects (see _retryable) doesn't.
+    """
+    def __init__(self, endpoints: List[Endpoint], timeout_sec: Optional[float] = None, retries: int = 0):
+        assert len(endpoints) > 0
+        self._endpoints = endpoints
+        self._timeout_sec = timeout_sec
+        self._retries = retries
+
+    async def _acquire(self, tried: List[Endpoint]) -> Endpoint:
+        async with _capacity:
+            while True:
+                now = time.monotonic()
+                # With every endpoint down, try them anyway rather than failing outright
+                candidates = [e for e in self._endpoints if e.healthy(now)] or self._endpoints
+                candidates = [e for e in candidates if e not in tried] or candidates
+                free = [e for e in candidates if e.has_capacity()]
+                if free:
+                    endpoint = min(free, key=lambda e: (e.consecutive_failures > 0, e.load(), e.latency_sec))
+                    endpoint.outstanding += 1
+                    return endpoint
+                try:
+                    # Woken up when a slot frees, the timeout notices endpoints coming out of their cooldown
+                    await asyncio.wait_for(_capacity.wait(), 1.0)
+                except TimeoutError:
+                    pass
+
+    async def _release(self, endpoint: Endpoint):
+        async with _capacity:
+            endpoint.outstanding -= 1
+            _capacity.notify_all()
+
+    async def request(self, call: Callable[[AsyncOpenAI], Awaitable[Any]]) -> Tuple[Any, str, int]:
+        """
+        Awaits `call(client)` on the chosen endpoint's client.
+        Returns its result, the base URL that answered and the number of retries it took.
+        """
+        tried: List[Endpoint] = []
+        for attempt in range(self._retries + 1):
+            endpoint = await self._acquire(tried)
+            start = time.monotonic()
+            try:
+                result = await asyncio.wait_for(call(endpoint.client), self._timeout_sec)
+            except Exception as e:
+                if not _retryable(e):
+                    # The request's fault, not the server's, it says nothing about the endpoint's health
+                    raise
+                endpoint.record_failure()
+                if attempt == self._retries:
+                    raise
+                tried.append(endpoint)
+                continue
+            finally:
+                await self._release(endpoint)
+            endpoint.record_success(time.monotonic() - start)
+            return result, endpoint.base_url, attempt
+
+    def stats(self) -> Dict[str, dict]:
+        return {e.base_url: e.stats() for e in self._endpoints}
+
+
+def get_pool(endpoints: List[dict], timeout_sec: Optional[float] = None, retries: int = 0) -> EndpointPool:
+    """
+    Returns the pool of the "endpoints" of an LLM player in players.json, each being a base URL or
+    {"baseUrl", "apiKey", "maxConcurrency"}.
+    Endpoints are shared by every pool listing the same server, so its concurrency cap holds for all of
+    them (the first cap given for a server wins).
+    """
+    configs = [{"baseUrl": e} if isinstance(e, str) else e for e in endpoints]
+    key = (tuple((c["baseUrl"], c.get("apiKey", DEFAULT_API_KEY)) for c in configs), timeout_sec, retries)
+    with _loop_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool_endpoints = []
+            for c in configs:
+                endpoint_key = (c["baseUrl"], c.get("apiKey", DEFAULT_API_KEY))
+                endpoint = _endpoints.get(endpoint_key)
+                if endpoint is None:
+                    endpoint = _endpoints[endpoint_key] = Endpoint(c["baseUrl"], c.get("apiKey", DEFAULT_API_KEY), c.get("maxConcurrency"))
+                pool_endpoints.append(endpoint)
+            pool = _pools[key] = EndpointPool(pool_endpoints, timeout_sec, retries)
+        return pool
+
+
+class BatchDispatcher(object):
+    """
+    Groups the prompts for one model coming from every table of the process into multi-prompt requests to the
+    completions endpoint ("prompt" being a list), which vLLM and llama.cpp generate as one batch.
+    A batch leaves once `batch_size` prompts are waiting, usually the servers' parallel capacity, or `window_sec`
+    after its first prompt, and goes through the pool like any other request (routing, timeout, retries).
+    Each caller gets back the choice generated for its own prompt.
+    """
+    def __init__(self, pool: EndpointPool, model: str, temperature: float, max_tokens: int, batch_size: int, window_sec: float):
+        assert batch_size > 0
+        assert window_sec >= 0
+        self._pool = pool
+        self._model = model
+        self._temperature = temperature
+        self._max_tokens = max_tokens
+        self._batch_size = batch_size
+        self._window_sec = window_sec
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self.batches = 0
+        self.prompts = 0
+        self.full_batches = 0
+
+    async def complete(self, prompt: str) -> Tuple[str, str, int]:
+        """
+        Returns the text generated for `prompt`, the base URL that answered its batch and the number of retries it took.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((prompt, future))
+        if len(self._pending) >= self._batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self._window_sec, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        # Prompts cancelled while waiting (e.g. discarded speculations) aren't sent
+        batch = [(prompt, future) for prompt, future in self._pending if not future.cancelled()]
+        self._pending = []
+        if len(batch) == 0:
+            return
+        self.batches += 1
+        self.prompts += len(batch)
+        if len(batch) >= self._batch_size:
+            self.full_batches += 1
+        task = asyncio.ensure_future(self._send(batch))
+        for _, future in batch:
+            # The request is only cancelled once nobody is waiting for any of its answers
+            future.add_done_callback(lambda _, batch=batch, task=task: task.cancel() if all(f.cancelled() for _, f in batch) else None)
+
+    async def _send(self, batch: List[Tuple[str, asyncio.Future]]):
+        prompts = [prompt for prompt, _ in batch]
+        try:
+            completion, base_url, retries = await self._pool.request(lambda client: client.completions.create(
+                model=self._model,
+                prompt=prompts,
+                temperature=self._temperature,
+                max_tokens=self._max_tokens
+            ))
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        # The choices come back in any order, each with the index of its prompt
+        texts = {choice.index: choice.text for choice in completion.choices}
+        for index, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            if index in texts:
+                future.set_result((texts[index], base_url, retries))
+            else:
+                future.set_exception(RuntimeError(f"No choice for prompt {index} of a batch of {len(batch)} from {base_url}"))
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "prompts": self.prompts,
+            "full_batches": self.full_batches,
+            "mean_batch_size": self.prompts / self.batches if self.batches > 0 else 0.0,
+        }
+
+
+_dispatchers: Dict[tuple, BatchDispatcher] = {}
+
+
+def get_dispatcher(pool: EndpointPool, model: str, temperature: float, max_tokens: int, batch_size: int, window_sec: float) -> BatchDispatcher:
+    """
+    Returns the dispatcher batching the prompts for `model` on `pool`, shared by every player sampling them the
+    same way (a batch has one temperature and token limit). The first batch size and window given win.
+    """
+    key = (id(pool), model, temperature, max_tokens)
+    with _loop_lock:
+        dispatcher = _dispatchers.get(key)
+        if dispatcher is None:
+            dispatcher = _dispatchers[key] = BatchDispatcher(pool, model, temperature, max_tokens, batch_size, window_sec)
+        return dispatcher
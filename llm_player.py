@@ -1,13 +1,25 @@
+from concurrent.futures import Future
+from functools import lru_cache
 from os.path import join
-from typing import List, Union
-import random
+from typing import Dict, List, Optional, Tuple, Union
+import asyncio
+import hashlib
+import re
+import string
+import time
 import traceback
 
-from openai import OpenAI, Omit, omit
+from openai import AsyncOpenAI, Omit, omit
 from treys import Card
 
 from action import Action
+from decision_cache import DecisionCache, get_decision_cache
 from player import Player
+import llm_client
+
+END_OF_EXPLANATION = "/explanation"
+# Decision times at the end of the history's action lines (see HandEvent.render), a speculation can't know them
+_DECISION_TIME = re.compile(r" in \d+\.\d+s$", re.MULTILINE)
 
 """You are {self._name} playing a game of virtual AI Texas Hold'em.
 Based on the state of the game decide your action from the list of valid actions.
@@ -21,8 +33,7 @@ class LlmPlayer(Player):
         system_prompt = d.get("system", "")
         if len(system_prompt) == 0:
             # If the system prompt wasn't defined directly, it's probably in a file
-            with open(d["systemFile"], "r") as f:
-                system_prompt = f.read()
+            system_prompt = _read_system_file(d["systemFile"])
 
         return LlmPlayer(
             log_file_path=f"{join(log_dir, d['name'])}.txt",
@@ -30,10 +41,29 @@ class LlmPlayer(Player):
             model=d["model"],
             system_prompt=system_prompt,
             reasoning_effort=d.get("reasoningEffort", omit),
-            temperature=d.get("temperature", 0.7)
+            temperature=d.get("temperature", 0.7),
+            base_url=d.get("baseUrl", llm_client.DEFAULT_BASE_URL),
+            endpoints=d.get("endpoints"),
+            request_timeout_sec=d.get("requestTimeoutSec"),
+            retries=d.get("retries", 2),
+            batch_size=d.get("batchSize"),
+            batch_window_ms=d.get("batchWindowMs", 20),
+            batch_max_tokens=d.get("batchMaxTokens", 1024),
+            stream=d.get("stream", False),
+            stream_max_chunks=d.get("streamMaxChunks"),
+            stream_timeout_sec=d.get("streamTimeoutSec"),
+            conversation=d.get("conversation", False),
+            speculate=d.get("speculate", False),
+            decision_cache=get_decision_cache(d["decisionCache"]) if "decisionCache" in d else None,
+            show_equity=d.get("showEquity", False)
         )
 
-    def __init__(self, log_file_path: str, name: str, model: str, system_prompt: str, reasoning_effort: Union[Omit, str], temperature: float):
+    def __init__(self, log_file_path: str, name: str, model: str, system_prompt: str, reasoning_effort: Union[Omit, str], temperature: float, base_url: str = llm_client.DEFAULT_BASE_URL,
+                 endpoints: Optional[List[Union[str, dict]]] = None, request_timeout_sec: Optional[float] = None, retries: int = 2,
+                 batch_size: Optional[int] = None, batch_window_ms: float = 20, batch_max_tokens: int = 1024,
+                 stream: bool = False, stream_max_chunks: Optional[int] = None, stream_timeout_sec: Optional[float] = None,
+                 conversation: bool = False, speculate: bool = False, decision_cache: Optional[DecisionCache] = None,
+                 show_equity: bool = False):
         super().__init__(log_file_path=log_file_path, name=name)
         assert model is not None
         assert isinstance(model, str)
@@ -43,15 +73,86 @@ class LlmPlayer(Player):
         self._reasoning_effort = reasoning_effort
         self._system_prompt = system_prompt
         self._temperature = temperature
+        self._uses_history = True
+        self._show_equity = show_equity
+        # Streaming mode stops reading as soon as the action is known or the budget is spent, the budget
+        # counts the chunks received (most servers send one token per chunk)
+        self._stream = stream
+        self._stream_max_chunks = stream_max_chunks
+        self._stream_timeout_sec = stream_timeout_sec
+        # Conversation mode keeps one message list per hand and only appends the new history to it,
+        # so the server can reuse the KV cache of everything sent before
+        self._conversation = conversation
+        self._messages: List[dict] = []
+        self._history_sent = 0
+        self._hand_stats = _new_hand_stats()
+        # Speculative mode asks the model about the state it expects to face while the others decide,
+        # the request in flight is kept as (prompt without decision times, time sent, future)
+        self._speculative = speculate
+        self._speculation: Optional[Tuple[tuple, float, Future]] = None
+        # Decisions are only shared with players that would be asked the exact same thing
+        self._decision_cache = decision_cache
+        self._cache_namespace = hashlib.sha1(
+            f"{model}\n{reasoning_effort}\n{temperature}\n{system_prompt}".encode()
+        ).hexdigest()[:16]
+
+        # Requests go to the least busy server of the pool (just `base_url` unless "endpoints" lists several),
+        # whose endpoints are shared with every other player using the same servers, see llm_client.
+        # The pool retries twice by default, as the OpenAI client did on its own before
+        self._pool = llm_client.get_pool(endpoints if endpoints else [base_url], request_timeout_sec, retries)
+        # With a batch size, the prompts for this model from every table go out together as multi-prompt requests
+        # to the completions endpoint, see llm_client.BatchDispatcher
+        self._dispatcher = None
+        if batch_size is not None:
+            assert not stream, "Batched prompts can't be streamed"
+            self._dispatcher = llm_client.get_dispatcher(self._pool, model, temperature, batch_max_tokens, batch_size, batch_window_ms / 1000.0)
+
+    def reset_round(self):
+        # The stats of the hand that just ended go in the log before it's flushed
+        self._end_hand()
+        super().reset_round()
+
+    def finish_game(self):
+        # The last hand has no next one to start
+        self._end_hand()
+        if self._decision_cache is not None:
+            # Worker processes exit without running atexit hooks
+            self._decision_cache.save()
+        super().finish_game()
+
+    def _end_hand(self):
+        self._discard_speculation()
+        if self._hand_stats["turns"] > 0:
+            self._log_hand_stats()
+        self._messages = []
+        self._history_sent = 0
+        self._hand_stats = _new_hand_stats()
 
-        self._client = OpenAI(
-            base_url="http://localhost:1234/v1",
-            api_key="lm-studio"
+    def info(self) -> Dict[str, str]:
+        # Lets the metrics and results be grouped by model and system prompt
+        return dict(super().info(), model=self._model, system_prompt=hashlib.sha1(self._system_prompt.encode()).hexdigest()[:8])
+
+    def _log_hand_stats(self):
+        stats = self._hand_stats
+        savings = 1.0 - stats["new_chars"] / stats["prompt_chars"] if stats["prompt_chars"] > 0 else 0.0
+        self.log(
+            f"METRICS: turns={stats['turns']} prompt_chars={stats['prompt_chars']} new_chars={stats['new_chars']} "
+            f"prefix_savings={savings:.1%} prompt_tokens={stats['prompt_tokens']} cached_tokens={stats['cached_tokens']}\n"
         )
 
-    def take_action(self, state: dict, valid_actions: List[Action], history: str) -> Action:
-        system_prompt = self._system_prompt
-        prompt = f"""<RoundHistory>
+    def _record_usage(self, usage):
+        if usage is None:
+            return
+        self._hand_stats["prompt_tokens"] += usage.prompt_tokens or 0
+        self._count("llm_tokens", usage.prompt_tokens or 0, "prompt")
+        self._count("llm_tokens", usage.completion_tokens or 0, "completion")
+        details = getattr(usage, "prompt_tokens_details", None)
+        if details is not None and details.cached_tokens:
+            self._hand_stats["cached_tokens"] += details.cached_tokens
+            self._count("llm_tokens", details.cached_tokens, "cached")
+
+    def _prompt(self, state: dict, valid_actions: List[Action], history: str) -> str:
+        return f"""<RoundHistory>
 {history}
 </RoundHistory>
 <GameState>
@@ -59,48 +160,283 @@ class LlmPlayer(Player):
 </GameState>
 
 Reply with an explanation of your thought process ending with "/explanation" followed by a new line.
-After that, the last word of your response MUST BE one of the valid actions [{', '.join(valid_actions)}]"""
+After that, reply with your action, one of the valid actions [{', '.join(valid_actions)}]: the first of them written after "/explanation" is the action played."""
+
+    def _build_messages(self, state: dict, valid_actions: List[Action], history: str) -> Tuple[List[dict], str, int]:
+        """
+        Returns the messages to send, the new prompt and how many characters weren't sent in an earlier turn.
+        """
+        if self._conversation and len(self._messages) > 0:
+            # The earlier turns are already in the conversation, only send what happened since
+            prompt = self._prompt(state, valid_actions, history[self._history_sent:].strip("\n"))
+            messages = self._messages + [{"role": "user", "content": prompt}]
+            return messages, prompt, len(prompt)
+        prompt = self._prompt(state, valid_actions, history)
         messages = [
-            {"role": "system", "content": system_prompt},
+            {"role": "system", "content": self._system_prompt},
             {"role": "user", "content": prompt}
         ]
-        with open(self._log_file_path, "a") as f:
-            f.write(f"Game State:\n{prompt}\n")
-            # Execute the prompt
-            completion = None
-            try:
-                completion = self._client.chat.completions.create(
+        return messages, prompt, len(self._system_prompt) + len(prompt)
+
+    async def _complete(self, client: AsyncOpenAI, messages: List[dict]):
+        return await client.chat.completions.create(
+            model=self._model,
+            messages=messages,
+            reasoning_effort=self._reasoning_effort,
+            temperature=self._temperature,
+            stream=False
+        )
+
+    async def _complete_streaming(self, client: AsyncOpenAI, messages: List[dict], valid_actions: List[Action]) -> Tuple[str, Optional[Action], str]:
+        """
+        Streams the completion and closes it early once a valid action follows the end of the explanation,
+        or once the chunk/time budget runs out (the time budget includes waiting for the response to start).
+        Returns the text received, the action found in it (if any) and why the stream stopped.
+        """
+        stream = None
+        chunks = []
+        scanner = _ActionScanner(valid_actions)
+        action = None
+        stop_reason = "finished"
+        try:
+            async with asyncio.timeout(self._stream_timeout_sec):
+                stream = await client.chat.completions.create(
                     model=self._model,
                     messages=messages,
                     reasoning_effort=self._reasoning_effort,
                     temperature=self._temperature,
-                    stream=False
+                    stream=True,
+                    stream_options={"include_usage": True}
                 )
-            except Exception as _:
-                completion = None
-                f.write(f"ERROR: Failed to prompt llm {traceback.format_exc()}\n")
-
-            # If it failed just randomly select an answer and return
-            if completion is None:
-                f.write("WARNING: Failed to prompt llm, just generating a random action\n")
-                return random.choice(valid_actions)
-
-            # Parse the response
-            response_text = completion.choices[0].message.content
-            if response_text is None:
-                response_text = ""
-            response_text = response_text.strip()
-            f.write(f"{self._name}:\n{response_text}\n\n")
-            # Skip the thinking block
-            end_think_idx = response_text.find("/explanation")
-            if end_think_idx > -1:
-                response_text = response_text[end_think_idx+len("/explanation"):].strip()
-            response_text = response_text.split()[-1].strip().upper()
-            f.write(f"DEBUG: Used '{response_text}'\n")
-
-            # If it's not a valid option, just pick a random valid option
-            if response_text not in valid_actions:
-                f.write(f"WARNING: {self._name} chose '{response_text}' which is not a valid action ({valid_actions}), just generating a random one")
-                return random.choice(valid_actions)
-            assert response_text in valid_actions
-            return Action(response_text)
+                async for chunk in stream:
+                    if chunk.usage is not None:
+                        # Only sent at the end of a stream that wasn't closed early
+                        self._record_usage(chunk.usage)
+                    if not chunk.choices or not chunk.choices[0].delta.content:
+                        continue
+                    chunks.append(chunk.choices[0].delta.content)
+                    action = scanner.feed(chunks[-1])
+                    if action is not None:
+                        stop_reason = "action found"
+                        break
+                    if self._stream_max_chunks is not None and len(chunks) >= self._stream_max_chunks:
+                        stop_reason = "chunk budget"
+                        break
+        except TimeoutError:
+            stop_reason = "time budget"
+        finally:
+            if stream is not None:
+                # Closing the response cancels the generation on the server
+                await stream.close()
+            if stop_reason != "finished":
+                # The usage is never sent for a stream closed early, the chunks are the closest measure
+                self._count("llm_stream_chunks", len(chunks))
+        return "".join(chunks), action, stop_reason
+
+    async def _request(self, messages: List[dict], valid_actions: List[Action]) -> Tuple[str, Optional[Action], str, str, int]:
+        """
+        Prompts the model on one of the pool's endpoints.
+        Returns the response text, the action found while streaming (if any), why the response ended,
+        the endpoint that answered and the number of retries it took.
+        """
+        if self._stream:
+            (response_text, action, stop_reason), endpoint, retries = await self._pool.request(
+                lambda client: self._complete_streaming(client, messages, valid_actions)
+            )
+            self._count("llm_streams", label=stop_reason)
+            return response_text, action, stop_reason, endpoint, retries
+        if self._dispatcher is not None:
+            # The usage is the whole batch's, it isn't split between the players
+            response_text, endpoint, retries = await self._dispatcher.complete(_render_prompt(messages))
+            return response_text, None, "finished", endpoint, retries
+        completion, endpoint, retries = await self._pool.request(lambda client: self._complete(client, messages))
+        self._record_usage(completion.usage)
+        response_text = completion.choices[0].message.content
+        return response_text if response_text is not None else "", None, "finished", endpoint, retries
+
+    def speculate(self, state: dict, valid_actions: List[Action], history: str):
+        if self._decision_cache is not None:
+            if DecisionCache.key(self._cache_namespace, state, self.hand, self.stack, self.current_bet, valid_actions) in self._decision_cache:
+                # The cache will answer this decision, the model doesn't need asking
+                self._discard_speculation()
+                return
+        messages, _, _ = self._build_messages(state, valid_actions, history)
+        key = _speculation_key(messages)
+        if self._speculation is not None:
+            if self._speculation[0] == key:
+                # Already asked
+                return
+            self._discard_speculation()
+        self._speculation = (key, time.perf_counter(), llm_client.submit(self._request(messages, valid_actions)))
+        self._count("speculations", label="started")
+
+    def _claim_speculation(self, messages: List[dict]) -> Optional[Tuple[float, Future]]:
+        """
+        Returns when the speculative request for these messages was sent and its future, if there is one.
+        Any other speculation is discarded.
+        """
+        if self._speculation is None:
+            return None
+        key, sent, future = self._speculation
+        if key != _speculation_key(messages):
+            self._discard_speculation()
+            return None
+        self._speculation = None
+        return sent, future
+
+    def _discard_speculation(self):
+        if self._speculation is not None:
+            # Stops waiting for a free endpoint or closes the connection, the tokens already spent are counted
+            self._speculation[2].cancel()
+            self._speculation = None
+            self._count("speculations", label="discarded")
+
+    def take_action(self, state: dict, valid_actions: List[Action], history: str) -> Action:
+        cache_key = None
+        if self._decision_cache is not None:
+            cache_key = DecisionCache.key(self._cache_namespace, state, self.hand, self.stack, self.current_bet, valid_actions)
+            cached_action = self._decision_cache.get(cache_key, self._random)
+            if cached_action is not None:
+                self._count("decision_cache_hits")
+                self.log(f"DEBUG: Used cached decision '{cached_action}'\n")
+                self._discard_speculation()
+                return cached_action
+
+        messages, prompt, new_chars = self._build_messages(state, valid_actions, history)
+        self._hand_stats["turns"] += 1
+        self._hand_stats["new_chars"] += new_chars
+        self._hand_stats["prompt_chars"] += sum(len(m["content"]) for m in messages)
+        f = self._open_log()
+        f.write(f"Game State:\n{prompt}\n")
+        # Execute the prompt, or wait for the answer to the same prompt sent while the others decided
+        response_text = None
+        streamed_action = None
+        stop_reason = "finished"
+        start = time.perf_counter()
+        try:
+            result = None
+            speculation = self._claim_speculation(messages) if self._speculative else None
+            if speculation is not None:
+                f.write(f"DEBUG: Using the speculative request sent {start - speculation[0]:.3f}s ago\n")
+                try:
+                    result = speculation[1].result()
+                    self._count("speculations", label="hit")
+                except Exception as _:
+                    # Asked again below, like any request that wasn't sent ahead
+                    f.write(f"WARNING: The speculative request failed, prompting again {traceback.format_exc()}\n")
+                    self._count("speculations", label="failed")
+            if result is None:
+                result = llm_client.run(self._request(messages, valid_actions))
+            response_text, streamed_action, stop_reason, endpoint, retries = result
+            if self._stream:
+                f.write(f"DEBUG: Stream stopped ({stop_reason}) after {time.perf_counter() - start:.3f}s\n")
+            self._count("llm_requests", label=endpoint)
+            if retries > 0:
+                f.write(f"DEBUG: Answered by {endpoint} after {retries} retries\n")
+                self._count("llm_retries", retries)
+        except Exception as _:
+            response_text = None
+            f.write(f"ERROR: Failed to prompt llm {traceback.format_exc()}\n")
+        self._count("llm_seconds", time.perf_counter() - start)
+
+        # If it failed just randomly select an answer and return
+        if response_text is None:
+            f.write("WARNING: Failed to prompt llm, just generating a random action\n")
+            self._count("fallbacks", label="error")
+            return self._random.choice(valid_actions)
+
+        # Parse the response
+        response_text = response_text.strip()
+        f.write(f"{self._name}:\n{response_text}\n\n")
+        if self._conversation:
+            self._messages = messages + [{"role": "assistant", "content": response_text}]
+            self._history_sent = len(history)
+        if streamed_action is not None:
+            response_text = streamed_action
+        elif stop_reason == "finished":
+            response_text = _parse_action(response_text, valid_actions)
+        else:
+            # The budget ran out before the explanation ended, whatever was said so far isn't a decision
+            response_text = ""
+        f.write(f"DEBUG: Used '{response_text}'\n")
+
+        # If it's not a valid option, just pick a random valid option
+        if response_text not in valid_actions:
+            f.write(f"WARNING: {self._name} chose '{response_text}' which is not a valid action ({valid_actions}), just generating a random one")
+            self._count("fallbacks", label="invalid")
+            return self._random.choice(valid_actions)
+        assert response_text in valid_actions
+        if cache_key is not None:
+            self._decision_cache.put(cache_key, Action(response_text))
+        return Action(response_text)
+
+
+def _new_hand_stats() -> dict:
+    return {"turns": 0, "prompt_chars": 0, "new_chars": 0, "prompt_tokens": 0, "cached_tokens": 0}
+
+
+@lru_cache(maxsize=None)
+def _read_system_file(path: str) -> str:
+    # Seats (and every game of a simulation) sharing a prompt file only read it once
+    with open(path, "r") as f:
+        return f.read()
+
+
+def _render_prompt(messages: List[dict]) -> str:
+    # The completions endpoint takes plain text, the model's chat template isn't applied
+    return "".join(f"{m['role'].capitalize()}:\n{m['content']}\n\n" for m in messages) + "Assistant:\n"
+
+
+def _speculation_key(messages: List[dict]) -> tuple:
+    return tuple((m["role"], _DECISION_TIME.sub("", m["content"])) for m in messages)
+
+
+def _parse_action(response_text: str, valid_actions: List[Action]) -> str:
+    """
+    Returns the first valid action written after the end of the explanation, the rule the prompt gives and
+    the one streaming applies as the response comes in. Without one, returns the last word so the invalid
+    choice can be reported.
+    """
+    action = _ActionScanner(valid_actions).feed(response_text, final=True)
+    if action is not None:
+        return action
+    # Skip the thinking block
+    end_think_idx = response_text.find(END_OF_EXPLANATION)
+    if end_think_idx > -1:
+        response_text = response_text[end_think_idx+len(END_OF_EXPLANATION):].strip()
+    words = response_text.split()
+    if len(words) == 0:
+        return ""
+    return words[-1].strip().upper()
+
+
+class _ActionScanner(object):
+    """
+    Finds the first valid action after the end of the explanation in a response fed in pieces, only
+    scanning each piece once. The last word is held back until whitespace follows, it might still be growing.
+    """
+    def __init__(self, valid_actions: List[Action]):
+        self._valid_actions = valid_actions
+        self._after_explanation = False
+        # Text not scanned yet: the end that might be the start of a split "/explanation", or a partial word
+        self._tail = ""
+
+    def feed(self, text: str, final: bool = False) -> Optional[Action]:
+        text = self._tail + text
+        if not self._after_explanation:
+            end_think_idx = text.find(END_OF_EXPLANATION)
+            if end_think_idx == -1:
+                self._tail = text[-(len(END_OF_EXPLANATION) - 1):]
+                return None
+            self._after_explanation = True
+            text = text[end_think_idx+len(END_OF_EXPLANATION):]
+        words = text.split()
+        self._tail = ""
+        if len(words) > 0 and not final and not text[-1].isspace():
+            self._tail = words.pop()
+        for word in words:
+            # Markdown and punctuation around the word don't matter ("**CALL**", "RAISE.")
+            word = word.strip(string.punctuation).upper()
+            if word in self._valid_actions:
+                return Action(word)
+        return None
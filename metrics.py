@@ -0,0 +1,237 @@
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+import csv
+import json
+import math
+import os
+import threading
+import time
+
+# Upper bounds of the decision latency buckets in seconds, from scripted players to slow reasoning models
+LATENCY_BUCKETS = (0.000001, 0.00001, 0.0001, 0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, math.inf)
+
+
+class Histogram(object):
+    """
+    Counts observations per latency bucket, plus their sum and maximum.
+    """
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def merge(self, d: dict):
+        self.counts = [a + b for a, b in zip(self.counts, d["buckets"])]
+        self.count += d["count"]
+        self.sum += d["sum"]
+        self.max = max(self.max, d["max"])
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimated like Prometheus' histogram_quantile, interpolating linearly inside the bucket.
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count > 0:
+                lower = LATENCY_BUCKETS[i - 1] if i > 0 else 0.0
+                upper = min(LATENCY_BUCKETS[i], self.max)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.max
+
+
+class Metrics(object):
+    """
+    Timings and counters of a game (or of many merged games):
+        decision latency histograms per player, street and action (recorded by Round)
+        counters per player, e.g. LLM prompt/completion tokens and fallbacks to a random action (recorded by the players)
+        hands played and hands per second (recorded by Poker)
+    export() writes them to `path` as JSON, CSV or a Prometheus text file depending on its extension,
+    start_timer() also does it periodically.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self._path = path
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._hands = 0
+        # (player, street, action) -> latencies
+        self._decisions: Dict[Tuple[str, str, str], Histogram] = {}
+        # (name, player, label) -> value, the label tells apart e.g. prompt and completion tokens
+        self._counters: Dict[Tuple[str, str, str], float] = {}
+        # player -> what it is (type, model, ...)
+        self._players: Dict[str, Dict[str, str]] = {}
+        self._timer: Optional[threading.Thread] = None
+        self._stop_timer = threading.Event()
+
+    def observe_decision(self, player: str, street: str, action: str, seconds: float):
+        with self._lock:
+            histogram = self._decisions.get((player, street, action))
+            if histogram is None:
+                histogram = self._decisions[(player, street, action)] = Histogram()
+            histogram.observe(seconds)
+
+    def add(self, name: str, player: str, value: float = 1, label: str = ""):
+        with self._lock:
+            key = (name, player, label)
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_player_info(self, player: str, **info: str):
+        with self._lock:
+            self._players[player] = info
+
+    def hand_finished(self):
+        with self._lock:
+            self._hands += 1
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            elapsed = time.perf_counter() - self._start
+            return {
+                "elapsed_sec": elapsed,
+                "hands": self._hands,
+                "hands_per_sec": self._hands / elapsed if elapsed > 0 else 0.0,
+                "players": {name: dict(info) for name, info in self._players.items()},
+                "decisions": [
+                    {"player": player, "street": street, "action": action, "count": h.count, "sum": h.sum, "max": h.max, "buckets": list(h.counts)}
+                    for (player, street, action), h in self._decisions.items()
+                ],
+                "counters": [
+                    {"name": name, "player": player, "label": label, "value": value}
+                    for (name, player, label), value in self._counters.items()
+                ],
+            }
+
+    def merge(self, d: dict):
+        """
+        Adds the metrics of another game, as returned by its to_dict().
+        """
+        with self._lock:
+            self._hands += d["hands"]
+            self._players.update(d["players"])
+            for entry in d["decisions"]:
+                key = (entry["player"], entry["street"], entry["action"])
+                histogram = self._decisions.get(key)
+                if histogram is None:
+                    histogram = self._decisions[key] = Histogram()
+                histogram.merge(entry)
+            for entry in d["counters"]:
+                key = (entry["name"], entry["player"], entry["label"])
+                self._counters[key] = self._counters.get(key, 0) + entry["value"]
+
+    def export(self, path: Optional[str] = None):
+        path = path if path is not None else self._path
+        if path is None:
+            return
+        d = self.to_dict()
+        # Write to a temporary file first so readers (e.g. a Prometheus textfile collector) never see half a file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", newline="") as f:
+            if path.endswith(".json"):
+                json.dump(d, f, indent=4)
+            elif path.endswith(".csv"):
+                _write_csv(d, f)
+            else:
+                f.write(_prometheus_text(d))
+        os.replace(tmp_path, path)
+
+    def start_timer(self, interval_sec: float):
+        """
+        Exports every `interval_sec` seconds from a background thread until stop_timer().
+        """
+        assert interval_sec > 0
+        self._stop_timer.clear()
+
+        def run():
+            while not self._stop_timer.wait(interval_sec):
+                self.export()
+
+        self._timer = threading.Thread(target=run, name="metrics-timer", daemon=True)
+        self._timer.start()
+
+    def stop_timer(self):
+        if self._timer is not None:
+            self._stop_timer.set()
+            self._timer.join()
+            self._timer = None
+
+
+def _histogram(entry: dict) -> Histogram:
+    h = Histogram()
+    h.merge(entry)
+    return h
+
+
+def _write_csv(d: dict, f):
+    """
+    One row per player, street and action with its latency statistics, and one row per player
+    (street and action '*') that also carries the player's counters.
+    """
+    counter_columns = sorted({f"{c['name']}_{c['label']}" if c["label"] else c["name"] for c in d["counters"]})
+    writer = csv.writer(f)
+    writer.writerow(["player", "street", "action", "decisions", "total_sec", "mean_sec", "p50_sec", "p90_sec", "p99_sec", "max_sec"] + counter_columns)
+
+    def stats(h: Histogram) -> List:
+        mean = h.sum / h.count if h.count > 0 else 0.0
+        return [h.count, f"{h.sum:.6f}", f"{mean:.6f}", f"{h.quantile(0.5):.6f}", f"{h.quantile(0.9):.6f}", f"{h.quantile(0.99):.6f}", f"{h.max:.6f}"]
+
+    per_player: Dict[str, Histogram] = {}
+    for entry in sorted(d["decisions"], key=lambda e: (e["player"], e["street"], e["action"])):
+        writer.writerow([entry["player"], entry["street"], entry["action"]] + stats(_histogram(entry)))
+        per_player.setdefault(entry["player"], Histogram()).merge(entry)
+
+    counters: Dict[str, Dict[str, float]] = {}
+    for c in d["counters"]:
+        counters.setdefault(c["player"], {})[f"{c['name']}_{c['label']}" if c["label"] else c["name"]] = c["value"]
+    for player in sorted(set(per_player) | set(counters)):
+        h = per_player.get(player, Histogram())
+        writer.writerow([player, "*", "*"] + stats(h) + [counters.get(player, {}).get(column, 0) for column in counter_columns])
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: str) -> str:
+    # Empty labels are left out
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items() if v != "") + "}"
+
+
+def _prometheus_text(d: dict) -> str:
+    lines = [
+        "# HELP poker_decision_seconds Time a player took to decide.",
+        "# TYPE poker_decision_seconds histogram",
+    ]
+    for entry in d["decisions"]:
+        labels = {"player": entry["player"], "street": entry["street"], "action": entry["action"]}
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, entry["buckets"]):
+            cumulative += count
+            le = "+Inf" if math.isinf(bound) else repr(bound)
+            lines.append(f"poker_decision_seconds_bucket{_labels(**labels, le=le)} {cumulative}")
+        lines.append(f"poker_decision_seconds_sum{_labels(**labels)} {entry['sum']}")
+        lines.append(f"poker_decision_seconds_count{_labels(**labels)} {entry['count']}")
+
+    for name in sorted({c["name"] for c in d["counters"]}):
+        lines.append(f"# TYPE poker_{name}_total counter")
+        for c in d["counters"]:
+            if c["name"] == name:
+                lines.append(f"poker_{name}_total{_labels(player=c['player'], kind=c['label'])} {c['value']}")
+
+    lines.append("# TYPE poker_player_info gauge")
+    for player, info in d["players"].items():
+        lines.append(f"poker_player_info{_labels(player=player, **info)} 1")
+    lines.append("# TYPE poker_hands_total counter")
+    lines.append(f"poker_hands_total {d['hands']}")
+    lines.append("# TYPE poker_hands_per_second gauge")
+    lines.append(f"poker_hands_per_second {d['hands_per_sec']}")
+    return "\n".join(lines) + "\n"
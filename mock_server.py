@@ -0,0 +1,440 @@
+"""
+Local stand-in for an OpenAI compatible model server, to load test LLM players without a GPU:
+
+    POST /v1/chat/completions   streaming (server-sent events) or not
+    POST /v1/completions        one prompt or a list of them, generated together as one batch (not streamed)
+    GET  /v1/models
+    GET  /stats                 counters of the requests served so far
+
+Every answer is an explanation ending with "/explanation" and an action picked by a policy from the valid
+actions listed in the prompt (or the next answer of a script). How long an answer takes is a sampled time to
+the first token plus one token every 1 / tokens_per_sec, and a share of the requests can fail with an error
+status, drop the connection or hang until the client's timeout to exercise the retries and fallbacks.
+With `slots` only that many requests are generated at once, the others queue, and with `static_batching`
+the server only starts a new batch once the previous one is done, like a server that doesn't batch
+continuously.
+
+    python mock_server.py --port 1234 --latency lognormal:0.5,0.4 --tokens-per-sec 40 --error-rate 0.02
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+
+from action import Action
+
+# What LlmPlayer's prompt asks for: the end of the explanation, then one of the valid actions it lists
+END_OF_EXPLANATION = "/explanation"
+_VALID_ACTIONS = re.compile(r"valid actions \[([A-Z, ]*)\]")
+_WORDS = ("the", "pot", "odds", "call", "raise", "fold", "board", "flush", "draw", "stack", "position", "bet", "range", "outs", "blind")
+POLICIES = ("random", "passive", "aggressive", "tight")
+
+
+class Latency(object):
+    """
+    Distribution of the time to the first token, given as "fixed:SEC", "uniform:MIN,MAX", "normal:MEAN,STDDEV",
+    "lognormal:MEDIAN,SIGMA" or "exponential:MEAN".
+    """
+    @staticmethod
+    def from_str(spec: str):
+        kind, _, params = spec.partition(":")
+        values = [float(v) for v in params.split(",")] if params else []
+        expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exponential": 1}
+        if kind not in expected or len(values) != expected[kind]:
+            raise RuntimeError(f"Invalid latency '{spec}', expected e.g. fixed:0.2, uniform:0.1,0.5, normal:0.3,0.05, lognormal:0.3,0.5 or exponential:0.3")
+        return Latency(kind, values)
+
+    def __init__(self, kind: str, values: List[float]):
+        self.kind = kind
+        self.values = values
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            value = self.values[0]
+        elif self.kind == "uniform":
+            value = rng.uniform(*self.values)
+        elif self.kind == "normal":
+            value = rng.gauss(*self.values)
+        elif self.kind == "lognormal":
+            value = self.values[0] * math.exp(rng.gauss(0.0, self.values[1]))
+        else:
+            value = rng.expovariate(1.0 / self.values[0])
+        return max(0.0, value)
+
+    def __str__(self):
+        return f"{self.kind}:{','.join(str(v) for v in self.values)}"
+
+
+class MockServer(object):
+    """
+    The mock model server's behavior and counters, served by serve() or start().
+    """
+    def __init__(self, latency: Latency = Latency("fixed", [0.0]), tokens_per_sec: Optional[float] = None,
+                 completion_tokens: int = 40, trailing_tokens: int = 0, policy: str = "random",
+                 script: Optional[List[str]] = None, invalid_rate: float = 0.0,
+                 error_rate: float = 0.0, error_statuses: tuple = (500,), drop_rate: float = 0.0,
+                 hang_rate: float = 0.0, hang_sec: float = 600.0,
+                 slots: Optional[int] = None, static_batching: bool = False, seed: Optional[int] = None):
+        assert policy in POLICIES
+        assert slots is None or slots > 0
+        assert not static_batching or slots is not None
+        self.latency = latency
+        # None answers instantly once the first token is out
+        self.tokens_per_sec = tokens_per_sec
+        # Words of explanation before "/explanation", and after the action (which a streaming client doesn't wait for)
+        self.completion_tokens = completion_tokens
+        self.trailing_tokens = trailing_tokens
+        self.policy = policy
+        # Answers returned in turn instead of the policy's, either an action or a whole response
+        self.script = script
+        self.invalid_rate = invalid_rate
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.drop_rate = drop_rate
+        self.hang_rate = hang_rate
+        self.hang_sec = hang_sec
+        self.slots = slots
+        self.static_batching = static_batching
+        self._rng = random.Random(seed)
+        self._lock = threading.Condition()
+        # Requests waiting for a slot, in arrival order, and the ones let in the current batch
+        self._queue: List[int] = []
+        self._admitted: set = set()
+        self._tickets = 0
+        self._active = 0
+        self._script_position = 0
+        self._stats = {
+            "requests": 0, "streamed": 0, "completed": 0, "cancelled": 0, "errors": 0, "dropped": 0, "hung": 0, "invalid": 0,
+            "prompts": 0, "batches": 0, "max_active": 0, "queue_sec": 0.0, "completion_tokens": 0,
+        }
+        self._http: Optional[ThreadingHTTPServer] = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, active=self._active, queued=len(self._queue))
+
+    def _count(self, name: str, value: float = 1):
+        with self._lock:
+            self._stats[name] += value
+
+    def _draw(self) -> float:
+        with self._lock:
+            return self._rng.random()
+
+    def _acquire_slot(self):
+        start = time.perf_counter()
+        with self._lock:
+            if self.slots is None:
+                self._active += 1
+            elif not self.static_batching:
+                while self._active >= self.slots:
+                    self._lock.wait()
+                self._active += 1
+            else:
+                ticket = self._tickets
+                self._tickets += 1
+                self._queue.append(ticket)
+                self._admit_batch()
+                while ticket not in self._admitted:
+                    self._lock.wait()
+                self._admitted.remove(ticket)
+            self._stats["max_active"] = max(self._stats["max_active"], self._active)
+            self._stats["queue_sec"] += time.perf_counter() - start
+
+    def _release_slot(self):
+        with self._lock:
+            self._active -= 1
+            if self.static_batching:
+                self._admit_batch()
+            self._lock.notify_all()
+
+    def _admit_batch(self):
+        # Everything waiting when the server goes idle starts together, up to the slot count
+        if self._active > 0 or len(self._queue) == 0:
+            return
+        batch, self._queue = self._queue[:self.slots], self._queue[self.slots:]
+        self._admitted.update(batch)
+        self._active = len(batch)
+        self._stats["batches"] += 1
+        self._lock.notify_all()
+
+    def answer(self, prompt: str) -> str:
+        """
+        The full response to a prompt: explanation, "/explanation", the action and any trailing words.
+        """
+        with self._lock:
+            rng = random.Random(self._rng.random())
+            scripted = None
+            if self.script:
+                scripted = self.script[self._script_position % len(self.script)]
+                self._script_position += 1
+        if scripted is not None and " " in scripted.strip():
+            return scripted
+        match = _VALID_ACTIONS.search(prompt)
+        valid_actions = [a.strip() for a in match.group(1).split(",")] if match else [Action.FOLD]
+        if scripted is not None:
+            action = scripted
+        elif rng.random() < self.invalid_rate:
+            self._count("invalid")
+            action = "DANCE"
+        else:
+            action = _policy_action(self.policy, valid_actions, rng)
+        words = [rng.choice(_WORDS) for _ in range(self.completion_tokens)]
+        trailing = [rng.choice(_WORDS) for _ in range(self.trailing_tokens)]
+        # Whatever follows the action restates it, so the action is both the first and the last word after "/explanation"
+        return " ".join(words) + f" {END_OF_EXPLANATION}\n{action}" + (f"\n{' '.join(trailing)} {action}" if trailing else "")
+
+    def serve(self, host: str = "127.0.0.1", port: int = 1234):
+        self._http = ThreadingHTTPServer((host, port), _handler(self))
+        self._http.serve_forever()
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """
+        Serves on a background thread (on a free port by default), returns the base URL to give the players.
+        """
+        self._http = ThreadingHTTPServer((host, port), _handler(self))
+        threading.Thread(target=self._http.serve_forever, name="mock-server", daemon=True).start()
+        return f"http://{host}:{self._http.server_address[1]}/v1"
+
+    def stop(self):
+        if self._http is not None:
+            self._http.shutdown()
+            self._http.server_close()
+            self._http = None
+
+
+def _policy_action(policy: str, valid_actions: List[str], rng: random.Random) -> str:
+    if policy == "passive":
+        preferred = (Action.CHECK, Action.CALL, Action.FOLD)
+    elif policy == "aggressive":
+        preferred = (Action.RAISE, Action.CALL, Action.CHECK, Action.FOLD)
+    elif policy == "tight":
+        # Folds most hands it would have to pay for
+        preferred = (Action.CHECK, Action.FOLD) if rng.random() < 0.7 else (Action.CALL, Action.CHECK, Action.FOLD)
+    else:
+        return rng.choice(valid_actions)
+    for action in preferred:
+        if action in valid_actions:
+            return action
+    return rng.choice(valid_actions)
+
+
+def _tokens(text: str) -> List[str]:
+    # One token per word, whitespace kept with the word before it
+    return re.findall(r"\S+\s*", text)
+
+
+def _handler(server: MockServer):
+    class Handler(BaseHTTPRequestHandler):
+        # Keeps the clients' connections open between requests, and sends every write at once instead of
+        # holding the body back until the headers are acknowledged (a 40ms delayed ACK per request)
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, body: dict, status: int = 200):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _write_chunk(self, data: bytes):
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._reply(server.stats())
+            elif self.path.endswith("/models"):
+                self._reply({"object": "list", "data": [{"id": "mock", "object": "model", "created": 0, "owned_by": "mock"}]})
+            else:
+                self._reply({"error": {"message": f"Unknown path {self.path}"}}, 404)
+
+        def do_POST(self):
+            length = int(self.headers["Content-Length"])
+            data = self.rfile.read(length)
+            if len(data) < length:
+                # The client gave up while still sending the request
+                server._count("cancelled")
+                self.close_connection = True
+                return
+            body = json.loads(data)
+            if not self.path.endswith("/completions"):
+                self._reply({"error": {"message": f"Unknown path {self.path}"}}, 404)
+                return
+            if not self.path.endswith("/chat/completions") and body.get("stream", False):
+                self._reply({"error": {"message": "Streaming isn't supported on /completions"}}, 400)
+                return
+            server._count("requests")
+            draw = server._draw()
+            if draw < server.error_rate:
+                server._count("errors")
+                status = server.error_statuses[int(draw / server.error_rate * len(server.error_statuses)) % len(server.error_statuses)]
+                self._reply({"error": {"message": "Injected error", "type": "server_error", "code": status}}, status)
+                return
+            draw -= server.error_rate
+            if draw < server.drop_rate:
+                server._count("dropped")
+                self.close_connection = True
+                return
+            draw -= server.drop_rate
+            if draw < server.hang_rate:
+                # Never answers in time, the client is expected to give up
+                server._count("hung")
+                time.sleep(server.hang_sec)
+                self.close_connection = True
+                return
+
+            server._acquire_slot()
+            try:
+                if self.path.endswith("/chat/completions"):
+                    self._complete(body)
+                else:
+                    self._complete_prompts(body)
+            except (BrokenPipeError, ConnectionResetError):
+                # The client closed the stream early or gave up waiting
+                server._count("cancelled")
+                self.close_connection = True
+            finally:
+                server._release_slot()
+
+        def _complete_prompts(self, body: dict):
+            # Every prompt of the request is generated at once in the slot it took, like a server's batch
+            prompts = body.get("prompt", "")
+            prompts = [prompts] if isinstance(prompts, str) else prompts
+            answers = [_tokens(server.answer(prompt)) for prompt in prompts]
+            token_sec = 1.0 / server.tokens_per_sec if server.tokens_per_sec else 0.0
+            with server._lock:
+                first_token_sec = server.latency.sample(server._rng)
+            time.sleep(first_token_sec + token_sec * max(len(tokens) for tokens in answers))
+            prompt_tokens = sum(len(prompt) for prompt in prompts) // 4
+            completion_tokens = sum(len(tokens) for tokens in answers)
+            server._count("prompts", len(prompts))
+            server._count("completion_tokens", completion_tokens)
+            server._count("completed")
+            created = int(time.time())
+            self._reply({
+                "id": f"cmpl-mock-{created}",
+                "object": "text_completion",
+                "created": created,
+                "model": body.get("model", "mock"),
+                "choices": [{"index": i, "text": "".join(tokens), "logprobs": None, "finish_reason": "stop"} for i, tokens in enumerate(answers)],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+            })
+
+        def _complete(self, body: dict):
+            messages = body.get("messages", [])
+            prompt = messages[-1]["content"] if messages else ""
+            server._count("prompts")
+            tokens = _tokens(server.answer(prompt))
+            prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 4
+            token_sec = 1.0 / server.tokens_per_sec if server.tokens_per_sec else 0.0
+            with server._lock:
+                first_token_sec = server.latency.sample(server._rng)
+            time.sleep(first_token_sec)
+            created = int(time.time())
+            model = body.get("model", "mock")
+
+            if not body.get("stream", False):
+                time.sleep(token_sec * len(tokens))
+                server._count("completion_tokens", len(tokens))
+                server._count("completed")
+                self._reply({
+                    "id": f"chatcmpl-mock-{created}",
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens), "total_tokens": prompt_tokens + len(tokens)},
+                })
+                return
+
+            server._count("streamed")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def event(delta: Optional[dict], finish_reason: Optional[str] = None, usage: Optional[dict] = None) -> bytes:
+                chunk = {
+                    "id": f"chatcmpl-mock-{created}",
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if delta is not None else [],
+                }
+                if usage is not None:
+                    chunk["usage"] = usage
+                return f"data: {json.dumps(chunk)}\n\n".encode()
+
+            self._write_chunk(event({"role": "assistant", "content": ""}))
+            for i, token in enumerate(tokens):
+                if i > 0:
+                    time.sleep(token_sec)
+                self._write_chunk(event({"content": token}))
+                server._count("completion_tokens")
+            self._write_chunk(event({}, "stop"))
+            if (body.get("stream_options") or {}).get("include_usage"):
+                # The usage comes last, in a chunk without choices
+                self._write_chunk(event(None, usage={"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens), "total_tokens": prompt_tokens + len(tokens)}))
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+            server._count("completed")
+
+    return Handler
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock OpenAI compatible server answering poker prompts")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1234)
+    parser.add_argument("--latency", default="fixed:0.0", help="Time to the first token, e.g. fixed:0.2, uniform:0.1,0.5, normal:0.3,0.05, lognormal:0.3,0.5, exponential:0.3")
+    parser.add_argument("--tokens-per-sec", type=float, help="Generation speed of every request, instant by default")
+    parser.add_argument("--completion-tokens", type=int, default=40, help="Words of explanation before the action")
+    parser.add_argument("--trailing-tokens", type=int, default=0, help="Words after the action (restating it at the end), which streaming clients don't wait for")
+    parser.add_argument("--policy", choices=POLICIES, default="random", help="How the action is picked from the valid ones")
+    parser.add_argument("--script", help="JSON list of answers returned in turn instead, each an action or a whole response")
+    parser.add_argument("--invalid-rate", type=float, default=0.0, help="Share of the answers ending in an invalid action")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of the requests failing with an error status")
+    parser.add_argument("--error-status", default="500", help="Comma separated statuses the injected errors use in turn")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Share of the requests whose connection is closed without an answer")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="Share of the requests never answered in time")
+    parser.add_argument("--hang-sec", type=float, default=600.0, help="How long a hanging request waits before closing")
+    parser.add_argument("--slots", type=int, help="Requests generated at once, the others queue")
+    parser.add_argument("--static-batching", action="store_true", help="Only start a new batch of up to --slots requests once the previous one is done")
+    parser.add_argument("-s", "--seed", type=int, help="Seed the latencies, injected failures and answers")
+    args = parser.parse_args()
+
+    script = None
+    if args.script:
+        with open(args.script, "r") as f:
+            script = json.load(f)
+    server = MockServer(
+        latency=Latency.from_str(args.latency),
+        tokens_per_sec=args.tokens_per_sec,
+        completion_tokens=args.completion_tokens,
+        trailing_tokens=args.trailing_tokens,
+        policy=args.policy,
+        script=script,
+        invalid_rate=args.invalid_rate,
+        error_rate=args.error_rate,
+        error_statuses=tuple(int(s) for s in args.error_status.split(",")),
+        drop_rate=args.drop_rate,
+        hang_rate=args.hang_rate,
+        hang_sec=args.hang_sec,
+        slots=args.slots,
+        static_batching=args.static_batching,
+        seed=args.seed,
+    )
+    print(f"Mock model server listening on http://{args.host}:{args.port}/v1")
+    server.serve(args.host, args.port)
@@ -1,9 +1,12 @@
 from abc import ABC, abstractmethod
-from typing import List
+from typing import IO, Dict, List, Optional
+import random
 
 from treys import Card
 
 from action import Action
+from checkpoint import random_state, set_random_state
+from metrics import Metrics
 
 class Player(ABC):
     def __init__(self, log_file_path: str, name: str):
@@ -11,6 +14,7 @@ class Player(ABC):
         assert name is not None
 
         self._log_file_path = log_file_path
+        self._log_file: Optional[IO] = None
         self._name = name
 
         self.stack = 0
@@ -20,9 +24,15 @@ class Player(ABC):
         self.current_bet = 0  # Amount bet in the current round
         self.is_all_in = False
         self._is_human = False
+        self._uses_history = False
+        self._show_equity = False
+        self._speculative = False
+        # Every random choice of the player goes through its own RNG so seeded games can be replayed
+        self._random = random.Random()
+        self._metrics: Optional[Metrics] = None
 
     def _state_str(self, state: dict):
-        return f"""Round: {state['round']}
+        state_str = f"""Round: {state['round']}
 Community Cards: {Card.ints_to_pretty_str(state['community_cards'])}
 Pot Size: {state['pot']}
 Highest Bet to Match: {state['active_bet']}
@@ -32,6 +42,9 @@ Amount needed to raise: {state['min_bet'] - self.current_bet}
 Remaining Opponents: {', '.join([p._name for p in state['remaining_players'] if p._name != self._name])}
 Your Hand: {Card.ints_to_pretty_str(self.hand)}
 Your Stack: {self.stack}"""
+        if self._show_equity and "equity" in state:
+            state_str += f"\nYour Equity (estimated share of the pot): {state['equity']:.1%}"
+        return state_str
 
     def can_take_action(self) -> bool:
         return not self.is_folded and not self.is_all_in
@@ -39,15 +52,77 @@ Your Stack: {self.stack}"""
     def is_human(self) -> bool:
         return self._is_human
 
+    def uses_history(self) -> bool:
+        return self._uses_history
+
+    def speculates(self) -> bool:
+        return self._speculative
+
+    def speculate(self, state: dict, valid_actions: List[Action], history: str):
+        """
+        Called while other players decide with the state this player would face if they all check or call,
+        so a slow player can start working on that decision. Only called when speculates() is True.
+        """
+        pass
+
+    def seed(self, seed: int):
+        self._random.seed(seed)
+
+    def get_state(self) -> dict:
+        """
+        What a checkpoint needs to carry on with this player where it left off (the game saves its stack).
+        """
+        return {"random": random_state(self._random)}
+
+    def set_state(self, state: dict):
+        set_random_state(self._random, state["random"])
+
+    def info(self) -> Dict[str, str]:
+        """
+        What kind of player this is, metrics and results can be grouped by it.
+        """
+        return {"type": type(self).__name__}
+
+    def set_metrics(self, metrics: Optional[Metrics]):
+        self._metrics = metrics
+        if metrics is not None:
+            metrics.set_player_info(self._name, **self.info())
+
+    def _count(self, name: str, value: float = 1, label: str = ""):
+        if self._metrics is not None:
+            self._metrics.add(name, self._name, value, label)
+
+    def _open_log(self) -> IO:
+        # Opened once and kept open, the buffer is flushed between hands
+        if self._log_file is None:
+            self._log_file = open(self._log_file_path, "a")
+        return self._log_file
+
     def log(self, message: str):
-        with open(self._log_file_path, "a") as f:
-            f.write(message)
+        self._open_log().write(message)
+
+    def flush_log(self):
+        if self._log_file is not None:
+            self._log_file.flush()
+
+    def close_log(self):
+        # Logging again reopens it, e.g. for the next game of a simulation
+        if self._log_file is not None:
+            self._log_file.close()
+            self._log_file = None
 
     def reset_round(self):
         self.hand = []
         self.is_folded = False
         self.current_bet = 0
         self.is_all_in = False
+        self.flush_log()
+
+    def finish_game(self):
+        """
+        Called once the game is over, after the last hand.
+        """
+        self.close_log()
 
     @abstractmethod
     def take_action(self, state: dict, valid_actions: List[Action], history: str) -> Action:
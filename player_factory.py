@@ -1,10 +1,34 @@
-from typing import List
+from typing import Dict, List, Tuple
+import importlib
 import json
 
 from player import Player
-from human_player import HumanPlayer
-from llm_player import LlmPlayer
-from random_player import RandomPlayer
+
+# Module and class of every player type. A type's module is only imported once a config uses it,
+# so e.g. games without LLM players never load the OpenAI SDK
+_PLAYER_TYPES: Dict[str, Tuple[str, str]] = {
+    "llm": ("llm_player", "LlmPlayer"),
+    "human": ("human_player", "HumanPlayer"),
+    "random": ("random_player", "RandomPlayer"),
+}
+_player_classes: Dict[str, type] = {}
+
+
+def register_player_type(type_name: str, module: str, class_name: str):
+    """
+    Makes `"type": type_name` in players.json build `module.class_name` (with its from_dict(d, log_dir)).
+    """
+    _PLAYER_TYPES[type_name] = (module, class_name)
+    _player_classes.pop(type_name, None)
+
+
+def player_class(type_name: str) -> type:
+    cls = _player_classes.get(type_name)
+    if cls is None:
+        module, class_name = _PLAYER_TYPES[type_name]
+        cls = _player_classes[type_name] = getattr(importlib.import_module(module), class_name)
+    return cls
+
 
 def player_factory(json_players_file_path: str, log_directory: str):
     assert json_players_file_path is not None
@@ -14,16 +38,12 @@ def player_factory(json_players_file_path: str, log_directory: str):
         players_list = json.load(f)
     if not isinstance(players_list, list):
         raise RuntimeError(f"{json_players_file_path} must contain a list of players!")
-    
+
     players: List[Player] = []
     for p_json in players_list:
         assert isinstance(p_json, dict)
         assert "type" in p_json
         t = p_json["type"]
-        if t == "llm":
-            players.append(LlmPlayer.from_dict(p_json, log_directory))
-        elif t == "human":
-            players.append(HumanPlayer.from_dict(p_json, log_directory))
-        elif t == "random":
-            players.append(RandomPlayer.from_dict(p_json, log_directory))
+        if t in _PLAYER_TYPES:
+            players.append(player_class(t).from_dict(p_json, log_directory))
     return players
@@ -1,13 +1,21 @@
 from datetime import datetime
-from typing import List
+from typing import List, Optional
+import argparse
 import os
-import sys
 
 from treys import Card, Deck, Evaluator
 
+from checkpoint import CHECKPOINT_FILE, load_checkpoint, random_state, save_checkpoint, set_random_state
+from equity import EquityService
+from hand_eval import BatchEvaluator
+from hand_log import HandLogWriter
+from metrics import Metrics
+from preflop import DEFAULT_TABLE_PATH, PreflopTable
 from player_factory import player_factory
 from player import Player
+from results_store import ResultsWriter
 from round import Round
+from seeding import SeededDeck, derive_seed
 
 
 # --- Helper Functions ---
@@ -29,55 +37,191 @@ def format_hand_pretty(cards_ints):
 
 
 class Poker(object):
-    def __init__(self, players: List[Player], evaluator: Evaluator, deck: Deck):
+    def __init__(self, players: List[Player], evaluator: Evaluator, deck: Deck, verbose: bool = True, equity_service: Optional[EquityService] = None,
+                 hand_log_path: Optional[str] = None, seed: Optional[int] = None, metrics: Optional[Metrics] = None,
+                 checkpoint_path: Optional[str] = None, checkpoint_every: int = 1, results_path: Optional[str] = None, max_hands: int = 1000):
         assert players is not None
         assert len(players) > 0
+        assert max_hands > 0
         assert all(isinstance(p, Player) for p in players)
         self._players = players
         self._starting_stack = 2500
         self._small_blind = 25
         self._big_blind = 50
         self._dealer_position = 0
-        self._max_hands = 1000
+        self._max_hands = max_hands
         self._evaluator = evaluator
         self._deck = deck
+        self._verbose = verbose
+        self._equity_service = equity_service
+        # Every event of every hand is appended to this JSONL file when set
+        self._hand_log_path = hand_log_path
+        # With a seed every hand's deck is shuffled from a seed derived from (seed, hand number) and the
+        # players' RNGs from (seed, name), so a game can be reproduced and its cards dealt to other seatings
+        self._seed = seed
+        if seed is not None:
+            self._deck = SeededDeck()
+        # Decision latencies and the players' counters, exported at the end of the game
+        self._metrics = metrics
+        # Everything needed to resume the game is saved there every `checkpoint_every` hands
+        assert checkpoint_every > 0
+        self._checkpoint_path = checkpoint_path
+        self._checkpoint_every = checkpoint_every
+        # Per-hand and per-decision results are stored in this directory (a partition of a ResultsStore)
+        self._results_path = results_path
+        self.results: Optional[ResultsWriter] = None
 
-    def play_game(self):
-        # Initialize starting stack
+    def _save_checkpoint(self, hands: int, dealer_position: int, pots_won: dict, hand_log: Optional[HandLogWriter]):
+        save_checkpoint(self._checkpoint_path, {
+            "seed": self._seed,
+            "hands": hands,
+            "dealer_position": dealer_position,
+            "stacks": {p._name: p.stack for p in self._players},
+            "pots_won": pots_won,
+            "players": {p._name: p.get_state() for p in self._players},
+            "deck": random_state(self._deck._random),
+            # Events of hands played after this checkpoint are cut off when resuming
+            "hand_log_bytes": hand_log.tell() if hand_log is not None else None,
+            "metrics": self._metrics.to_dict() if self._metrics is not None else None,
+        })
+
+    def play_game(self, checkpoint: Optional[dict] = None) -> dict:
+        """
+        Plays hands until one player is left or the hand limit is reached, starting from `checkpoint`
+        (as loaded by load_checkpoint) when resuming a game.
+        Returns a summary of the game: hands played, final stacks, pots won and the winner(s).
+        """
         for p in self._players:
-            p.stack = self._starting_stack
-
-        dealer_position = 0
-        hands = 0
-        active_players = [p for p in self._players]
-        while len(active_players) >= 2 or hands < self._max_hands:
-            round = Round(active_players, dealer_position, self._deck, self._evaluator, self._big_blind, self._small_blind)
-            round.play_round()
+            p.set_metrics(self._metrics)
+        if checkpoint is None:
+            # Initialize starting stack
+            for p in self._players:
+                p.stack = self._starting_stack
+
+            dealer_position = 0
+            hands = 0
+            pots_won = {p._name: 0 for p in self._players}
+            if self._seed is not None:
+                for p in self._players:
+                    p.seed(derive_seed(self._seed, p._name))
+        else:
+            if sorted(checkpoint["stacks"]) != sorted(p._name for p in self._players):
+                raise RuntimeError(f"The checkpoint's players {sorted(checkpoint['stacks'])} aren't the ones of this game")
+            if checkpoint["seed"] != self._seed:
+                raise RuntimeError(f"The checkpoint is of a game with seed {checkpoint['seed']}, not {self._seed}")
+            for p in self._players:
+                p.stack = checkpoint["stacks"][p._name]
+                p.set_state(checkpoint["players"][p._name])
+            dealer_position = checkpoint["dealer_position"]
+            hands = checkpoint["hands"]
+            pots_won = dict(checkpoint["pots_won"])
+            set_random_state(self._deck._random, checkpoint["deck"])
+            if self._metrics is not None and checkpoint["metrics"] is not None:
+                self._metrics.merge(checkpoint["metrics"])
+            if self._hand_log_path is not None and checkpoint["hand_log_bytes"] is not None:
+                with open(self._hand_log_path, "a") as f:
+                    f.truncate(checkpoint["hand_log_bytes"])
+        active_players = [p for p in self._players if p.stack >= self._big_blind]
+        hand_log = HandLogWriter(self._hand_log_path) if self._hand_log_path is not None else None
+        if self._results_path is not None:
+            # Its stats() are kept up to date as the hands are played
+            self.results = ResultsWriter(self._results_path, {p._name: p.info() for p in self._players}, self._big_blind)
+            if checkpoint is not None:
+                self.results.resume(hands)
+        while len(active_players) >= 2 and hands < self._max_hands:
+            hand_seed = None
+            if self._seed is not None:
+                hand_seed = derive_seed(self._seed, hands)
+                self._deck.reseed(hand_seed)
+            round = Round(
+                active_players, dealer_position, self._deck, self._evaluator, self._big_blind, self._small_blind,
+                verbose=self._verbose,
+                equity_service=self._equity_service,
+                hand_number=hands,
+                hand_log=hand_log,
+                seed=hand_seed,
+                metrics=self._metrics,
+                results=self.results
+            )
+            for w in round.play_round():
+                pots_won[w._name] += 1
             # Remove the players that have busted out and move the dealer chip
             active_players = [p for p in self._players if p.stack >= self._big_blind]
             dealer_position = (dealer_position + 1) % len(active_players)
             hands += 1
+            if self._metrics is not None:
+                self._metrics.hand_finished()
+            if self._checkpoint_path is not None and hands % self._checkpoint_every == 0:
+                if self.results is not None:
+                    self.results.save()
+                self._save_checkpoint(hands, dealer_position, pots_won, hand_log)
+
+        if hand_log is not None:
+            hand_log.close()
+        if self.results is not None:
+            self.results.save()
+        for p in self._players:
+            p.finish_game()
+        if self._metrics is not None:
+            self._metrics.export()
+
+        best_stack = max(p.stack for p in self._players)
+        return {
+            "seed": self._seed,
+            "hands": hands,
+            "stacks": {p._name: p.stack for p in self._players},
+            "pots_won": pots_won,
+            "winners": [p._name for p in self._players if p.stack == best_stack],
+        }
 
 # --- Main Execution ---
 if __name__ == "__main__":
-    log_directory = f"Game{str(datetime.now())}"
-    os.mkdir(log_directory)
+    parser = argparse.ArgumentParser(description="Play a game of Texas Hold'em")
+    parser.add_argument("players_file", nargs="?", default="players.json")
+    parser.add_argument("--equity", action="store_true", help="Give every player a Monte Carlo estimate of their hand's equity")
+    parser.add_argument("--metrics", choices=["json", "csv", "prom"], default="json", help="Format of the metrics file written to the log directory")
+    parser.add_argument("--metrics-interval", type=float, help="Also write the metrics file every this many seconds")
+    parser.add_argument("-s", "--seed", type=int, help="Seed the deck and the players' random choices so the game can be reproduced")
+    parser.add_argument("--checkpoint-every", type=int, default=1, help="Save the game to checkpoint.json in the log directory every this many hands")
+    parser.add_argument("--resume", metavar="LOG_DIRECTORY", help="Continue the game saved in this log directory's checkpoint")
+    args = parser.parse_args()
 
-    players_file = "players.json"
-    if len(sys.argv) > 1:
-        players_file = sys.argv[1]
+    checkpoint = None
+    if args.resume is not None:
+        log_directory = args.resume
+        checkpoint = load_checkpoint(os.path.join(log_directory, CHECKPOINT_FILE))
+        if checkpoint is None:
+            raise RuntimeError(f"There is no {CHECKPOINT_FILE} in {log_directory} to resume from")
+        # The seed the game started with, the player's RNGs and the deck carry on from the checkpoint
+        args.seed = checkpoint["seed"]
+        print(f"Resuming after hand {checkpoint['hands']}")
+    else:
+        log_directory = f"Game{str(datetime.now())}"
+        os.mkdir(log_directory)
 
-    players: List[Player] = player_factory(players_file, log_directory)
+    players: List[Player] = player_factory(args.players_file, log_directory)
     assert len(players) > 0
     assert len(players) == 6
     print(players)
 
     deck = Deck()
-    evaluator = Evaluator()
+    evaluator = BatchEvaluator()
+    preflop_table = PreflopTable() if os.path.exists(DEFAULT_TABLE_PATH) else None
+    metrics = Metrics(os.path.join(log_directory, f"metrics.{args.metrics}"))
+    if args.metrics_interval is not None:
+        metrics.start_timer(args.metrics_interval)
     game = Poker(
         players,
         evaluator,
-        deck
+        deck,
+        equity_service=EquityService(evaluator, preflop_table=preflop_table) if args.equity else None,
+        hand_log_path=os.path.join(log_directory, "hands.jsonl"),
+        seed=args.seed,
+        metrics=metrics,
+        checkpoint_path=os.path.join(log_directory, CHECKPOINT_FILE),
+        checkpoint_every=args.checkpoint_every,
+        results_path=os.path.join(log_directory, "results")
     )
-    game.play_game()
+    game.play_game(checkpoint)
+    metrics.stop_timer()
 
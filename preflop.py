@@ -0,0 +1,115 @@
+from os.path import dirname, join
+from typing import List
+import argparse
+import time
+
+from treys import Card
+import numpy as np
+
+from hand_eval import BatchEvaluator
+
+DEFAULT_TABLE_PATH = join(dirname(__file__), "preflop_equity.npy")
+MIN_OPPONENTS = 1
+MAX_OPPONENTS = 8
+STARTING_HANDS = 169
+
+
+def starting_hand_index(hand: List[int]) -> int:
+    """
+    Maps two hole cards to one of the 169 strategically distinct starting hands, laid out as the usual
+    13x13 grid: pairs on the diagonal, suited hands as (high, low) and offsuit hands as (low, high).
+    """
+    high = Card.get_rank_int(hand[0])
+    low = Card.get_rank_int(hand[1])
+    if high < low:
+        high, low = low, high
+    if Card.get_suit_int(hand[0]) == Card.get_suit_int(hand[1]):
+        return high * 13 + low
+    return low * 13 + high
+
+
+def starting_hand_indexes(hands: np.ndarray) -> np.ndarray:
+    """
+    starting_hand_index of every row of an (N, 2) array of treys card ints.
+    """
+    ranks = (hands >> 8) & 0xF
+    high = ranks.max(axis=1)
+    low = ranks.min(axis=1)
+    suited = ((hands[:, 0] >> 12) & 0xF) == ((hands[:, 1] >> 12) & 0xF)
+    return np.where(suited, high * 13 + low, low * 13 + high)
+
+
+def starting_hand_name(index: int) -> str:
+    """
+    e.g. 'AA', 'AKs' or 'T9o'
+    """
+    row, col = divmod(index, 13)
+    if row == col:
+        return Card.STR_RANKS[row] * 2
+    if row > col:
+        return f"{Card.STR_RANKS[row]}{Card.STR_RANKS[col]}s"
+    return f"{Card.STR_RANKS[col]}{Card.STR_RANKS[row]}o"
+
+
+def _representative_hand(index: int) -> List[int]:
+    row, col = divmod(index, 13)
+    if row > col:
+        return [Card.new(Card.STR_RANKS[row] + "s"), Card.new(Card.STR_RANKS[col] + "s")]
+    return [Card.new(Card.STR_RANKS[row] + "s"), Card.new(Card.STR_RANKS[col] + "h")]
+
+
+class PreflopTable(object):
+    """
+    Pre-flop equity of every starting hand against 1 to 8 opponents, memory-mapped from the file
+    written by build_table so looking a hand up costs two array indexes.
+    """
+    def __init__(self, path: str = DEFAULT_TABLE_PATH):
+        # (169, 8) float32, column j is the equity against j + 1 opponents
+        self._equities = np.load(path, mmap_mode="r")
+        assert self._equities.shape == (STARTING_HANDS, MAX_OPPONENTS - MIN_OPPONENTS + 1)
+        # 1 is the strongest hand at that table size
+        self._ranks = np.empty(self._equities.shape, dtype=np.int16)
+        order = np.argsort(-self._equities, axis=0, kind="stable")
+        for col in range(self._equities.shape[1]):
+            self._ranks[order[:, col], col] = np.arange(1, STARTING_HANDS + 1)
+
+    def equity(self, hand: List[int], opponents: int) -> float:
+        return float(self._equities[starting_hand_index(hand), opponents - MIN_OPPONENTS])
+
+    def equities(self, hands: np.ndarray, opponents: np.ndarray) -> np.ndarray:
+        """
+        Vectorized equity, `hands` is (N, 2) and `opponents` (N,) between 1 and 8.
+        """
+        return self._equities[starting_hand_indexes(hands), opponents - MIN_OPPONENTS]
+
+    def rank(self, hand: List[int], opponents: int) -> int:
+        return int(self._ranks[starting_hand_index(hand), opponents - MIN_OPPONENTS])
+
+
+def build_table(path: str, max_samples: int, tolerance: float, seed: int = 0):
+    """
+    Simulates every starting hand against every opponent count and saves the (169, 8) table.
+    """
+    # Imported here since the equity service itself looks pre-flop hands up in this table
+    from equity import EquityService
+    service = EquityService(BatchEvaluator(), batch_size=2000, max_samples=max_samples, tolerance=tolerance, seed=seed)
+    equities = np.zeros((STARTING_HANDS, MAX_OPPONENTS - MIN_OPPONENTS + 1), dtype=np.float32)
+    for index in range(STARTING_HANDS):
+        hand = _representative_hand(index)
+        for opponents in range(MIN_OPPONENTS, MAX_OPPONENTS + 1):
+            equities[index, opponents - MIN_OPPONENTS] = service.equity(hand, [], opponents)
+    np.save(path, equities)
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the pre-flop equity table")
+    parser.add_argument("-o", "--output", default=DEFAULT_TABLE_PATH)
+    parser.add_argument("--samples", type=int, default=100000, help="Maximum rollouts per hand and opponent count")
+    parser.add_argument("--tolerance", type=float, default=0.002, help="Stop early once the 95%% interval is this narrow")
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    build_table(args.output, args.samples, args.tolerance, args.seed)
+    print(f"Wrote {args.output} in {time.perf_counter() - start:.1f}s")
@@ -1,6 +1,5 @@
 from os.path import join
 from typing import List
-import random
 
 from action import Action
 from player import Player
@@ -17,4 +16,4 @@ class RandomPlayer(Player):
         super().__init__(log_file_path=log_file_path, name=name)
 
     def take_action(self, state: dict, valid_actions: List[Action], history: str) -> Action:
-        return random.choice(valid_actions)
+        return self._random.choice(valid_actions)
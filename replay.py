@@ -0,0 +1,149 @@
+from collections import deque
+from typing import List, Optional, Tuple
+import argparse
+import os
+import time
+
+from treys import Deck, Evaluator
+
+from action import Action
+from hand_log import EventType, HandEvent, read_hands
+from player import Player
+from round import Round
+from seeding import SeededDeck
+
+
+class ScriptedPlayer(Player):
+    """
+    Plays back the actions a player took in a recorded hand, no model is asked anything.
+    """
+    def __init__(self, name: str, actions: List[Action]):
+        super().__init__(log_file_path=os.devnull, name=name)
+        self._actions = deque(actions)
+
+    def take_action(self, state: dict, valid_actions: List[Action], history: str) -> Action:
+        if len(self._actions) == 0:
+            raise RuntimeError(f"{self._name} has no recorded action left in the {state['round']}")
+        action = self._actions.popleft()
+        if action not in valid_actions:
+            raise RuntimeError(f"{self._name}'s recorded action '{action}' is not in the valid actions {valid_actions}")
+        return action
+
+
+class RecordedDeck(Deck):
+    """
+    Deck that deals the cards of a recorded hand in the order Round draws them, for logs of unseeded games.
+    Burn cards and cards that were never dealt are made up from the rest of the deck.
+    """
+    def __init__(self, events: List[HandEvent]):
+        seats = len(events[0].seats)
+        hole_cards = {e.player: e.cards for e in events if e.type == EventType.HOLE_CARDS}
+        known_board = list(max((e.cards for e in events if e.type == EventType.STREET), key=len, default=()))
+        # Every seat's first card is dealt before anyone's second
+        known = [hole_cards[name][0] for name in events[0].seats] + [hole_cards[name][1] for name in events[0].seats]
+        unused = [c for c in Deck.GetFullDeck() if c not in known and c not in known_board]
+        board = known_board + unused[:5 - len(known_board)]
+        burns = unused[5 - len(known_board):]
+        # Burn, flop, burn, turn, burn, river
+        self._deal_order = known + [burns[0]] + board[:3] + [burns[1], board[3], burns[2], board[4]]
+        assert len(self._deal_order) == 2 * seats + 8
+        super().__init__()
+
+    def shuffle(self) -> None:
+        # draw() pops from the end
+        self.cards = list(reversed(self._deal_order))
+
+
+class EventRecorder(object):
+    """
+    Hand log sink that keeps the events in memory.
+    """
+    def __init__(self):
+        self.events: List[HandEvent] = []
+
+    def write(self, event: HandEvent):
+        self.events.append(event)
+
+
+def replay_hand(events: List[HandEvent], evaluator: Evaluator, verbose: bool = False) -> List[HandEvent]:
+    """
+    Plays a recorded hand again with the recorded cards and actions and returns the events of the replay.
+    Hands of seeded games are dealt from their seed, the others from the recorded cards.
+    """
+    start = events[0]
+    assert start.type == EventType.HAND_START, "A hand starts with a HAND_START event"
+    actions = {name: [] for name in start.seats}
+    small_blind = big_blind = 0
+    for e in events:
+        if e.type == EventType.ACTION:
+            actions[e.player].append(Action(e.action))
+        elif e.type == EventType.BLIND:
+            if e.action == "small":
+                small_blind = e.amount
+            else:
+                big_blind = e.amount
+
+    players = [ScriptedPlayer(name, actions[name]) for name in start.seats]
+    for p, stack in zip(players, start.stacks):
+        p.stack = stack
+    if start.seed is not None:
+        deck = SeededDeck()
+        deck.reseed(start.seed)
+    else:
+        deck = RecordedDeck(events)
+
+    recorder = EventRecorder()
+    round = Round(
+        players, start.amount, deck, evaluator, big_blind, small_blind,
+        verbose=verbose,
+        hand_number=start.hand,
+        hand_log=recorder,
+        seed=start.seed
+    )
+    round.play_round()
+    return recorder.events
+
+
+def same_hand(recorded: List[HandEvent], replayed: List[HandEvent]) -> bool:
+    """
+    Whether a replay went exactly like the recorded hand, the time each decision took aside.
+    """
+    return [e._replace(seconds=0.0) for e in recorded] == [e._replace(seconds=0.0) for e in replayed]
+
+
+def replay_log(path: str, evaluator: Evaluator, hand: Optional[int] = None, verbose: bool = False) -> Tuple[int, List[int]]:
+    """
+    Replays every hand of a log (or only hand number `hand`).
+    Returns the number of hands replayed and the numbers of the hands that didn't replay identically.
+    """
+    replayed = 0
+    mismatches = []
+    for events in read_hands(path):
+        if hand is not None and events[0].hand != hand:
+            continue
+        try:
+            if not same_hand(events, replay_hand(events, evaluator, verbose)):
+                mismatches.append(events[0].hand)
+        except RuntimeError as e:
+            print(f"Hand {events[0].hand}: {e}")
+            mismatches.append(events[0].hand)
+        replayed += 1
+    return replayed, mismatches
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay the hands of a hand log without asking any model")
+    parser.add_argument("hand_log", help="JSONL hand log, e.g. Game.../hands.jsonl")
+    parser.add_argument("-n", "--hand", type=int, help="Only replay this hand number")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Print the replayed hands like a live game")
+    args = parser.parse_args()
+
+    # One showdown per hand doesn't pay for building the batch evaluator's tables
+    evaluator = Evaluator()
+    start = time.perf_counter()
+    replayed, mismatches = replay_log(args.hand_log, evaluator, args.hand, args.verbose)
+    elapsed = time.perf_counter() - start
+    print(f"Replayed {replayed} hands in {elapsed:.2f}s ({replayed / elapsed if elapsed > 0 else 0.0:,.0f} hands/s)")
+    if len(mismatches) > 0:
+        print(f"{len(mismatches)} hands went differently: {mismatches}")
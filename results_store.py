@@ -0,0 +1,346 @@
+"""
+Columnar store of game results, one partition (directory) per game:
+    partition.json      format version, big blind and the game's players with what they are (type, model,
+                        system prompt hash, ...), the rows refer to players by their index in that list
+    player_hands.bin    one row per player and hand, PLAYER_HAND_DTYPE records
+    actions.bin         one row per decision, ACTION_DTYPE records
+The .bin files are plain fixed-width records without a header, so they load with np.fromfile or
+np.memmap without parsing anything, and a query over thousands of games is a handful of numpy calls.
+
+    python results_store.py RESULTS_DIRECTORY [--by model]
+"""
+from array import array
+from typing import Dict, List, Tuple
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from action import Action
+from hand_log import EventType, HandEvent
+
+STREETS = ("Pre-Flop", "Flop", "Turn", "River")
+# Same codes as vector_sim's policies
+ACTIONS = (Action.FOLD, Action.CHECK, Action.CALL, Action.RAISE)
+_STREET_CODES = {s: i for i, s in enumerate(STREETS)}
+_ACTION_CODES = {a.upper(): i for i, a in enumerate(ACTIONS)}
+
+ACTION_DTYPE = np.dtype([
+    ("hand", np.int32),
+    ("player", np.int16),    # index in partition.json's players
+    ("street", np.int8),     # index in STREETS
+    ("action", np.int8),     # index in ACTIONS
+    ("amount", np.int32),    # chips put in
+    ("seconds", np.float32),
+])
+PLAYER_HAND_DTYPE = np.dtype([
+    ("hand", np.int32),
+    ("player", np.int16),
+    ("seat", np.int8),       # position from the dealer's left, the small blind is 0
+    ("vpip", np.bool_),      # voluntarily put chips in before the flop
+    ("pfr", np.bool_),       # raised before the flop
+    ("saw_flop", np.bool_),
+    ("showdown", np.bool_),
+    ("won", np.bool_),       # won (a share of) the pot
+    ("net", np.int32),       # chips won minus chips put in
+])
+
+# Flags of PLAYER_HAND_DTYPE counted per player
+_FLAGS = ("vpip", "pfr", "saw_flop", "showdown", "won")
+
+# Bumped whenever the record layouts change
+RESULTS_FORMAT = 1
+PARTITION_FILE = "partition.json"
+PLAYER_HANDS_FILE = "player_hands.bin"
+ACTIONS_FILE = "actions.bin"
+
+
+class ResultsWriter(object):
+    """
+    Sink of a game's hand events (next to e.g. a HandLogWriter) that turns them into the partition's rows
+    and keeps every player's running totals, readable with stats() while the game is played.
+    """
+    def __init__(self, directory: str, players_info: Dict[str, Dict[str, str]], big_blind: int = 50):
+        self._directory = directory
+        self._players_info = players_info
+        self._big_blind = big_blind
+        self._player_ids = {name: i for i, name in enumerate(players_info)}
+        # Columns are appended to compact stdlib arrays and only become numpy arrays when saved
+        self._actions = {name: array(code) for name, code in (("hand", "i"), ("player", "h"), ("street", "b"), ("action", "b"), ("amount", "i"), ("seconds", "f"))}
+        self._player_hands = {name: array(code) for name, code in (
+            ("hand", "i"), ("player", "h"), ("seat", "b"), ("vpip", "b"), ("pfr", "b"), ("saw_flop", "b"), ("showdown", "b"), ("won", "b"), ("net", "i")
+        )}
+        # Running totals per player, see _stats
+        self._totals = {name: [0] * 8 for name in players_info}
+        # The hand being played
+        self._hand = 0
+        self._street = 0
+        self._seats: Tuple[str, ...] = ()
+        self._invested: Dict[str, int] = {}
+        self._flags: Dict[str, List[bool]] = {}
+        self._folded: set = set()
+
+    def write(self, event: HandEvent):
+        t = event.type
+        if t == EventType.ACTION:
+            amount = event.amount
+            self._invested[event.player] += amount
+            if self._street == 0 and event.action != "CHECK" and event.action != "FOLD":
+                flags = self._flags[event.player]
+                flags[0] = True
+                if event.action == "RAISE":
+                    flags[1] = True
+            if event.action == "FOLD":
+                self._folded.add(event.player)
+            columns = self._actions
+            columns["hand"].append(self._hand)
+            columns["player"].append(self._player_ids[event.player])
+            columns["street"].append(self._street)
+            columns["action"].append(_ACTION_CODES[event.action])
+            columns["amount"].append(amount)
+            columns["seconds"].append(event.seconds)
+        elif t == EventType.BLIND:
+            self._invested[event.player] += event.amount
+        elif t == EventType.STREET:
+            self._street = _STREET_CODES.get(event.description, self._street)
+            if event.description == "Flop":
+                for name in self._seats:
+                    if name not in self._folded:
+                        self._flags[name][2] = True
+        elif t == EventType.SHOWDOWN:
+            self._flags[event.player][3] = True
+        elif t == EventType.HAND_START:
+            self._hand = event.hand
+            self._street = 0
+            # Seats start left of the dealer
+            dealer = event.amount
+            self._seats = event.seats[dealer + 1:] + event.seats[:dealer + 1]
+            self._invested = {name: 0 for name in self._seats}
+            self._flags = {name: [False, False, False, False] for name in self._seats}
+            self._folded = set()
+        elif t == EventType.POT_WON:
+            self._finish_hand(event.winners, event.amount)
+
+    def _finish_hand(self, winners: Tuple[str, ...], pot: int):
+        # A split pot is shared like Round does, the odd chips stay in the pot
+        share = pot // len(winners) if len(winners) > 1 else pot
+        columns = self._player_hands
+        for seat, name in enumerate(self._seats):
+            vpip, pfr, saw_flop, showdown = self._flags[name]
+            won = name in winners
+            net = (share if won else 0) - self._invested[name]
+            columns["hand"].append(self._hand)
+            columns["player"].append(self._player_ids[name])
+            columns["seat"].append(seat)
+            columns["vpip"].append(vpip)
+            columns["pfr"].append(pfr)
+            columns["saw_flop"].append(saw_flop)
+            columns["showdown"].append(showdown)
+            columns["won"].append(won)
+            columns["net"].append(net)
+            totals = self._totals[name]
+            totals[0] += 1
+            totals[1] += vpip
+            totals[2] += pfr
+            totals[3] += saw_flop
+            totals[4] += showdown
+            totals[5] += won
+            totals[6] += showdown and won
+            totals[7] += net
+
+    def stats(self) -> Dict[str, dict]:
+        """
+        Every player's statistics over the hands played so far.
+        """
+        return {name: _stats(totals, totals[-1] / self._big_blind) for name, totals in self._totals.items()}
+
+    def resume(self, hands: int):
+        """
+        Loads the partition saved by an earlier run of the game, keeping its first `hands` hands (used
+        when a game resumes from a checkpoint).
+        """
+        if not os.path.exists(os.path.join(self._directory, PARTITION_FILE)):
+            return
+        player_hands = _read(self._directory, PLAYER_HANDS_FILE, PLAYER_HAND_DTYPE)
+        player_hands = player_hands[player_hands["hand"] < hands]
+        actions = _read(self._directory, ACTIONS_FILE, ACTION_DTYPE)
+        actions = actions[actions["hand"] < hands]
+        for name, column in self._player_hands.items():
+            column.frombytes(player_hands[name].astype(column.typecode).tobytes())
+        for name, column in self._actions.items():
+            column.frombytes(actions[name].astype(column.typecode).tobytes())
+        ids = player_hands["player"]
+        for name, totals in zip(self._players_info, _totals(ids, player_hands, len(self._players_info)).tolist()):
+            self._totals[name] = totals
+
+    def save(self):
+        os.makedirs(self._directory, exist_ok=True)
+        _write(self._directory, PLAYER_HANDS_FILE, _to_records(self._player_hands, PLAYER_HAND_DTYPE))
+        _write(self._directory, ACTIONS_FILE, _to_records(self._actions, ACTION_DTYPE))
+        # Written last, a partition without it (a game that crashed before its first save) is skipped
+        partition = {
+            "format": RESULTS_FORMAT,
+            "big_blind": self._big_blind,
+            "players": [dict(info, name=name) for name, info in self._players_info.items()],
+        }
+        tmp_path = os.path.join(self._directory, f"{PARTITION_FILE}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(partition, f, indent=4)
+        os.replace(tmp_path, os.path.join(self._directory, PARTITION_FILE))
+
+
+def _to_records(columns: Dict[str, array], dtype: np.dtype) -> np.ndarray:
+    rows = np.empty(len(columns["hand"]), dtype=dtype)
+    for name, column in columns.items():
+        rows[name] = np.frombuffer(column, dtype=column.typecode) if len(column) > 0 else []
+    return rows
+
+
+def _write(directory: str, name: str, rows: np.ndarray):
+    tmp_path = os.path.join(directory, f"{name}.tmp")
+    rows.tofile(tmp_path)
+    os.replace(tmp_path, os.path.join(directory, name))
+
+
+def _read(directory: str, name: str, dtype: np.dtype, mmap: bool = False) -> np.ndarray:
+    path = os.path.join(directory, name)
+    if mmap and os.path.getsize(path) > 0:
+        return np.memmap(path, dtype=dtype, mode="r")
+    return np.fromfile(path, dtype=dtype)
+
+
+def _totals(ids: np.ndarray, player_hands: np.ndarray, groups: int) -> np.ndarray:
+    """
+    Sums the rows of every group (`ids` gives each row's group) into the (groups, 8) totals _stats reads:
+    hands, the _FLAGS counts, showdowns won and net chips.
+    """
+    # bincount only adds up floats, which hold any realistic chip count exactly
+    columns = [np.bincount(ids, minlength=groups)]
+    for name in _FLAGS:
+        columns.append(np.bincount(ids, weights=player_hands[name], minlength=groups))
+    columns.append(np.bincount(ids, weights=player_hands["showdown"] & player_hands["won"], minlength=groups))
+    columns.append(np.bincount(ids, weights=player_hands["net"], minlength=groups))
+    return np.stack(columns, axis=1).astype(np.int64)
+
+
+def _stats(totals: List[int], net_bb: float) -> dict:
+    hands, vpip, pfr, saw_flop, showdown, won, won_at_showdown, net = totals
+    per_hand = 1.0 / hands if hands > 0 else 0.0
+    return {
+        "hands": hands,
+        "vpip": vpip * per_hand,
+        "pfr": pfr * per_hand,
+        "saw_flop": saw_flop * per_hand,
+        "showdown": showdown * per_hand,
+        # Share of the showdowns reached that were won
+        "won_at_showdown": won_at_showdown / showdown if showdown > 0 else 0.0,
+        "win_rate": won * per_hand,
+        "net": net,
+        "bb_per_100": net_bb * 100.0 * per_hand,
+    }
+
+
+class ResultsStore(object):
+    """
+    Every partition under `root`, with aggregations over all of them.
+    """
+    def __init__(self, root: str):
+        self._root = root
+        # Any directory below the root holding a partition, e.g. a poker2.py log directory's "results" or
+        # the Game<seed> directories of a simulation
+        self.partitions: List[str] = sorted(directory for directory, _, files in os.walk(root) if PARTITION_FILE in files)
+        self._metadata: Dict[str, dict] = {}
+
+    def metadata(self, partition: str) -> dict:
+        metadata = self._metadata.get(partition)
+        if metadata is None:
+            with open(os.path.join(partition, PARTITION_FILE), "r") as f:
+                metadata = json.load(f)
+            if metadata["format"] != RESULTS_FORMAT:
+                raise RuntimeError(f"{partition} was written in results format {metadata['format']}, not {RESULTS_FORMAT}")
+            self._metadata[partition] = metadata
+        return metadata
+
+    def players(self, partition: str) -> List[dict]:
+        return self.metadata(partition)["players"]
+
+    def player_hands(self, partition: str, mmap: bool = False) -> np.ndarray:
+        return _read(partition, PLAYER_HANDS_FILE, PLAYER_HAND_DTYPE, mmap)
+
+    def actions(self, partition: str, mmap: bool = False) -> np.ndarray:
+        return _read(partition, ACTIONS_FILE, ACTION_DTYPE, mmap)
+
+    def _concatenate(self, rows_of, by: str) -> Tuple[np.ndarray, np.ndarray, List[np.ndarray], Dict[str, int]]:
+        """
+        The rows of every partition in one array, with each row's group id (the players' `by` info mapped
+        to one id per distinct value) and each partition's big blind per row.
+        """
+        group_ids: Dict[str, int] = {}
+        all_rows, all_ids, big_blinds = [], [], []
+        for partition in self.partitions:
+            rows = rows_of(partition)
+            lookup = np.array([group_ids.setdefault(str(p.get(by, "")), len(group_ids)) for p in self.players(partition)], dtype=np.int64)
+            all_rows.append(rows)
+            all_ids.append(lookup[rows["player"]])
+            big_blinds.append(np.full(len(rows), self.metadata(partition)["big_blind"], dtype=np.float64))
+        if len(all_rows) == 0:
+            return np.empty(0, dtype=PLAYER_HAND_DTYPE), np.empty(0, dtype=np.int64), [np.empty(0)], group_ids
+        return np.concatenate(all_rows), np.concatenate(all_ids), big_blinds, group_ids
+
+    def player_stats(self, by: str = "name") -> Dict[str, dict]:
+        """
+        VPIP, PFR, how often the flop and the showdown were reached, win rate and chips won (also in big
+        blinds per 100 hands) of every player, or of every group of players sharing the same `by` info
+        (e.g. "model" or "system_prompt").
+        """
+        rows, ids, big_blinds, group_ids = self._concatenate(self.player_hands, by)
+        totals = _totals(ids, rows, len(group_ids)).tolist()
+        net_bb = np.bincount(ids, weights=rows["net"] / np.concatenate(big_blinds), minlength=len(group_ids))
+        return {group: _stats(totals[i], float(net_bb[i])) for group, i in group_ids.items()}
+
+    def action_stats(self, by: str = "name") -> Dict[str, dict]:
+        """
+        Per player (or group) and street, how often each action was chosen and the mean decision time.
+        """
+        rows, ids, _, group_ids = self._concatenate(self.actions, by)
+        # One code per (group, street, action) so a single bincount counts them all
+        codes = (ids * len(STREETS) + rows["street"]) * len(ACTIONS) + rows["action"]
+        size = len(group_ids) * len(STREETS) * len(ACTIONS)
+        counts = np.bincount(codes, minlength=size).reshape(len(group_ids), len(STREETS), len(ACTIONS))
+        seconds = np.bincount(codes, weights=rows["seconds"], minlength=size).reshape(counts.shape)
+        result: Dict[str, dict] = {}
+        for group, i in group_ids.items():
+            for street, name in enumerate(STREETS):
+                decisions = int(counts[i, street].sum())
+                if decisions == 0:
+                    continue
+                entry = {"decisions": decisions, "mean_sec": float(seconds[i, street].sum()) / decisions}
+                for action, count in zip(ACTIONS, counts[i, street].tolist()):
+                    entry[action.upper()] = count
+                result.setdefault(group, {})[name] = entry
+        return result
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aggregate the results stored by poker2.py/simulate.py --results")
+    parser.add_argument("results_directory")
+    parser.add_argument("--by", default="name", help="Player info to group by: name, type, model, system_prompt, ...")
+    parser.add_argument("--actions", action="store_true", help="Also show the action frequencies per street")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    store = ResultsStore(args.results_directory)
+    stats = store.player_stats(args.by)
+    elapsed = time.perf_counter() - start
+    print(f"{'':<24} {'hands':>9} {'vpip':>6} {'pfr':>6} {'flop':>6} {'sd':>6} {'w$sd':>6} {'win':>6} {'bb/100':>8}")
+    for group, s in sorted(stats.items(), key=lambda item: -item[1]["bb_per_100"]):
+        print(
+            f"{group[:24]:<24} {s['hands']:>9} {s['vpip']:>6.1%} {s['pfr']:>6.1%} {s['saw_flop']:>6.1%} {s['showdown']:>6.1%} "
+            f"{s['won_at_showdown']:>6.1%} {s['win_rate']:>6.1%} {s['bb_per_100']:>8.1f}"
+        )
+    print(f"{sum(s['hands'] for s in stats.values())} player hands in {len(store.partitions)} games aggregated in {elapsed:.3f}s")
+    if args.actions:
+        print(json.dumps(store.action_stats(args.by), indent=4))
@@ -1,11 +1,17 @@
-from typing import List
+from typing import List, Optional
 import sys
 import time
 
 from treys import Card, Deck, Evaluator
 
 from action import Action
+from equity import EquityService
+from hand_eval import BatchEvaluator
+from hand_log import EventType, HandEvent, HandHistory, HandLogWriter
+from metrics import Metrics
 from player import Player
+from results_store import ResultsWriter
+from table_state import TableState, TableView
 
 
 class Round(object):
@@ -16,85 +22,124 @@ class Round(object):
             deck: Deck,
             evalutor: Evaluator,
             big_blind: int,
-            small_blind: int
+            small_blind: int,
+            verbose: bool = True,
+            equity_service: Optional[EquityService] = None,
+            hand_number: int = 0,
+            hand_log: Optional[HandLogWriter] = None,
+            seed: Optional[int] = None,
+            metrics: Optional[Metrics] = None,
+            results: Optional[ResultsWriter] = None
     ):
         self._active_players = active_players
         self._big_blind_idx = (dealer_position + 2) % len(active_players)
         self._big_blind = big_blind
-        self._community_cards = []
         self._dealer_position = dealer_position
         self._deck = deck
         self._evaluator = evalutor
-        self._history = ""
-        self._min_bet = big_blind
-        self._pot = 0
-        self._round = "Pre-Flop"
+        self._history = HandHistory(hand_number, [sink for sink in (hand_log, results) if sink is not None])
+        # Seed the deck was created with, recorded so the hand can be replayed
+        self._seed = seed
         self._small_blind = small_blind
         self._small_blind_idx = (dealer_position + 1) % len(active_players)
+        self._verbose = verbose
+        self._equity_service = equity_service
+        self._metrics = metrics
+        self._winners: List[Player] = []
+        # Chips, bets and flags of every seat, the players only get a read-only view of it.
+        # Built when the hand starts, once the players' round state has been reset
+        self._state: Optional[TableState] = None
+        self._view: Optional[TableView] = None
 
         self._any_human_players = any(p.is_human() for p in self._active_players)
+        # Only record the hand's events when they are logged or someone at the table reads the history
+        self._keep_history = hand_log is not None or results is not None or any(p.uses_history() for p in self._active_players)
+        # Seats that start on their next decision while the others decide
+        self._speculates = [p.speculates() for p in self._active_players]
+        self._any_speculates = any(self._speculates)
+
+    def _print(self, message: str):
+        if self._verbose:
+            print(message)
+
+    def _record(self, event_type: EventType, **fields):
+        if self._keep_history:
+            self._history.add(event_type, **fields)
+
+    def _announce_street(self, name: str, show_board: bool = True):
+        if self._verbose:
+            print(f"---- {name} ----")
+            if show_board:
+                print(Card.ints_to_pretty_str(self._state.community_cards))
+        self._record(EventType.STREET, description=name, cards=tuple(self._state.community_cards) if show_board else ())
 
     def _betting_round(self, starting_idx: int, starting_bet: int):
         assert starting_idx < len(self._active_players)
+        state = self._state
+        stacks = state.stacks
+        bets = state.bets
         actions_taken = 0
-        active_bet = starting_bet
-        min_bet = active_bet * 2 if active_bet > 0 else self._big_blind
+        state.active_bet = active_bet = starting_bet
+        state.min_bet = min_bet = active_bet * 2 if active_bet > 0 else self._big_blind
         idx = starting_idx
         while actions_taken < len(self._active_players):
-            p = self._active_players[idx]
-            if not p.can_take_action():
+            if not state.can_take_action(idx):
                 actions_taken += 1
                 idx = (idx + 1) % len(self._active_players)
                 continue
+            p = self._active_players[idx]
 
             # Determine the valid actions
-            to_call = active_bet - p.current_bet
-            valid_actions = [Action.FOLD]
-            if to_call == 0:
-                valid_actions.append(Action.CHECK)
-            elif to_call > 0:
-                valid_actions.append(Action.CALL)
-
-            if p.current_bet + p.stack >= min_bet:
-                valid_actions.append(Action.RAISE)
+            to_call = active_bet - bets[idx]
+            valid_actions = _valid_actions(to_call, bets[idx] + stacks[idx], min_bet)
+            if self._any_speculates:
+                self._speculate(idx, actions_taken, active_bet, min_bet)
 
             # Have the user take an action
             before_action = time.perf_counter()
-            action = p.take_action(self._table_state_dict(active_bet, min_bet), valid_actions, self._history)
+            # The text history is only rendered for the players that read it
+            history = self._history.render() if state.uses_history[idx] else ""
+            # The player reads its own stack and bet from its attributes
+            state.sync_chips(idx)
+            state.acting = idx
+            if self._equity_service is not None:
+                # Share of the pot the acting player's hand is expected to win against the others still in
+                state.equity = self._equity_service.equity(p.hand, state.community_cards, state.active_count - 1)
+            action = p.take_action(self._view, valid_actions, history)
             after_action = time.perf_counter()
             if action not in valid_actions:
                 raise RuntimeError(f"Unexpected action '{action}' not in valid actions {valid_actions}")
             action_time_sec = float((after_action - before_action) * 1000) / 1000.0
-            self._history += f">>> {p._name} chooses to: {action.upper()} in {action_time_sec:.3f}s\n"
+            if self._keep_history:
+                amount = to_call if action == Action.CALL else min_bet - bets[idx] if action == Action.RAISE else 0
+                self._record(EventType.ACTION, player=p._name, action=action.upper(), amount=amount, seconds=action_time_sec)
+            if self._metrics is not None:
+                self._metrics.observe_decision(p._name, state.round, action.upper(), action_time_sec)
             # If there are any human players, censor the cards from the output
-            if self._any_human_players:
-                print(f">>> {p._name} chooses to: {action.upper()} in {action_time_sec:.3f}s")
-            else:
-                print(f">>> {p._name} ({Card.ints_to_pretty_str(p.hand)}) chooses to: {action.upper()} in {action_time_sec:.3f}s")
+            if self._verbose:
+                if self._any_human_players:
+                    print(f">>> {p._name} chooses to: {action.upper()} in {action_time_sec:.3f}s")
+                else:
+                    print(f">>> {p._name} ({Card.ints_to_pretty_str(p.hand)}) chooses to: {action.upper()} in {action_time_sec:.3f}s")
 
             # Handle action
             if action == Action.FOLD:
-                p.is_folded = True
+                state.fold(idx)
                 actions_taken += 1
                 # If there is only 1 non-folded player left, break out of the loop
-                if sum(1 for p in self._active_players if not p.is_folded) == 1:
+                if state.active_count == 1:
                     break
             elif action == Action.CHECK:
                 actions_taken += 1 
             elif action == Action.RAISE:
                 # Move the chips from the player's hand into the pot
-                to_raise = min_bet - p.current_bet
-                p.stack -= to_raise
-                self._pot += to_raise
-                p.current_bet = min_bet
+                state.bet(idx, min_bet - bets[idx])
                 # Update the state, reset actions taken
-                active_bet = min_bet
-                min_bet = active_bet * 2
+                state.active_bet = active_bet = min_bet
+                state.min_bet = min_bet = active_bet * 2
                 actions_taken = 1
             elif action == Action.CALL:
-                p.stack -= to_call
-                self._pot += to_call
-                p.current_bet += to_call
+                state.bet(idx, to_call)
                 actions_taken += 1
             else:
                 raise RuntimeError("Non-existant action taken")
@@ -103,15 +148,59 @@ class Round(object):
             idx = (idx + 1) % len(self._active_players)
 
         # Reset players' current bet
-        for p in self._active_players:
-            p.current_bet = 0
+        state.reset_bets()
+
+    def _speculate(self, idx: int, actions_taken: int, active_bet: int, min_bet: int):
+        """
+        Assumes the player at `idx` and everyone after them check or call, the most common way for a street
+        to go on, and hands every speculating player on the way the state they would then decide in.
+        """
+        state = self._state
+        bets = list(state.bets)
+        pot = state.pot
+        acting_idx = idx
+        passive_actions: List[HandEvent] = []
+        while actions_taken < len(self._active_players):
+            if state.can_take_action(idx):
+                p = self._active_players[idx]
+                to_call = active_bet - bets[idx]
+                if idx != acting_idx and self._speculates[idx]:
+                    predicted = {
+                        "round": state.round,
+                        "community_cards": tuple(state.community_cards),
+                        "pot": pot,
+                        "active_bet": active_bet,
+                        "min_bet": min_bet,
+                        "big_blind": state.big_blind,
+                        "position": (idx - state.dealer) % len(self._active_players),
+                        "remaining_players": state.remaining_players,
+                    }
+                    if self._equity_service is not None:
+                        predicted["equity"] = self._equity_service.equity(p.hand, state.community_cards, state.active_count - 1)
+                    history = ""
+                    if state.uses_history[idx]:
+                        # The decision times of the predicted actions are unknown, they render as 0
+                        history = self._history.render() + "".join(e.render() for e in passive_actions)
+                    # Nobody else's check or call changes this seat's own chips
+                    state.sync_chips(idx)
+                    p.speculate(predicted, _valid_actions(to_call, bets[idx] + state.stacks[idx], min_bet), history)
+                action = Action.CHECK if to_call == 0 else Action.CALL
+                bets[idx] += to_call
+                pot += to_call
+                passive_actions.append(HandEvent(EventType.ACTION, self._history.hand, player=p._name, action=action.upper(), amount=to_call))
+            actions_taken += 1
+            idx = (idx + 1) % len(self._active_players)
 
     def _check_win_by_fold(self):
-        active = [p for p in self._active_players if not p.is_folded]
-        if len(active) == 1:
-            winner = active[0]
-            winner.stack += self._pot
-            print(f"\nResult: Everyone else folded. {winner._name} wins {self._pot} chips!")
+        state = self._state
+        if state.active_count == 1:
+            idx = state.folded.index(False)
+            winner = self._active_players[idx]
+            state.win(idx, state.pot)
+            state.sync_players()
+            self._winners = [winner]
+            self._record(EventType.POT_WON, winners=(winner._name,), amount=state.pot)
+            self._print(f"\nResult: Everyone else folded. {winner._name} wins {state.pot} chips!")
             return True
         return False
 
@@ -119,118 +208,126 @@ class Round(object):
         # Lowest score wins
         best_score = sys.maxsize
         winners = []
-        for p in self._active_players:
-            if p.is_folded:
-                continue
-            score = self._evaluator.evaluate(self._community_cards, p.hand)
-
-            # Convert score to readable class (e.g. "Full House")
-            rank_class = self._evaluator.get_rank_class(score)
-            desc = self._evaluator.class_to_string(rank_class)
+        state = self._state
+        contenders = [idx for idx in range(len(self._active_players)) if not state.folded[idx]]
+        hands = [self._active_players[idx].hand for idx in contenders]
+        if isinstance(self._evaluator, BatchEvaluator):
+            scores = self._evaluator.evaluate_hands(state.community_cards, hands)
+        else:
+            scores = [self._evaluator.evaluate(state.community_cards, hand) for hand in hands]
+        for idx, score in zip(contenders, scores):
+            p = self._active_players[idx]
 
-            print(f"{p._name} ({Card.ints_to_pretty_str(p.hand)}): {desc} (Score: {score})")
-            self._history += f"{p._name} ({Card.ints_to_pretty_str(p.hand)}): {desc} (Score: {score})\n"
+            if self._verbose or self._keep_history:
+                # Convert score to readable class (e.g. "Full House")
+                rank_class = self._evaluator.get_rank_class(score)
+                desc = self._evaluator.class_to_string(rank_class)
+                self._print(f"{p._name} ({Card.ints_to_pretty_str(p.hand)}): {desc} (Score: {score})")
+                self._record(EventType.SHOWDOWN, player=p._name, cards=tuple(p.hand), amount=score, description=desc)
 
             if score < best_score:
                 best_score = score
-                winners = [p]
+                winners = [idx]
             elif score == best_score:
-                winners.append(p)
+                winners.append(idx)
 
         # Award Pot
+        self._winners = [self._active_players[idx] for idx in winners]
+        self._record(EventType.POT_WON, winners=tuple(w._name for w in self._winners), amount=state.pot)
         if len(winners) == 1:
-            w = winners[0]
-            w.stack += self._pot
-            print(f"\n>>> {w._name} wins the pot of {self._pot}!")
-            self._history += f"\n>>> {w._name} wins the pot of {self._pot}!\n"
+            state.win(winners[0], state.pot)
+            self._print(f"\n>>> {self._winners[0]._name} wins the pot of {state.pot}!")
         else:
-            print(f"\n>>> Split Pot! ({len(winners)} ways)")
-            self._history += f"\n>>> Split Pot! ({len(winners)} ways)\n"
-            split = self._pot // len(winners)
-            for w in winners:
-                w.stack += split
-                print(f"    {w._name} takes {split}")
-
-    def _table_state_dict(self, active_bet: int, min_bet: int) -> dict:
-        return {
-            "active_bet": active_bet,
-            "community_cards": self._community_cards,
-            "min_bet": min_bet,
-            "pot": self._pot,
-            "remaining_players": [p for p in self._active_players if not p.is_folded],
-            "round": self._round
-        }
-
-    def play_round(self):
-        print("---------- STARTING NEW ROUND ----------")
+            self._print(f"\n>>> Split Pot! ({len(winners)} ways)")
+            split = state.pot // len(winners)
+            for idx in winners:
+                state.win(idx, split)
+                self._print(f"    {self._active_players[idx]._name} takes {split}")
+        state.sync_players()
+
+    def play_round(self) -> List[Player]:
+        """Plays a single hand and returns the player(s) that won the pot."""
+        self._print("---------- STARTING NEW ROUND ----------")
         # Reset each player's round state and shuffle the deck
         for p in self._active_players:
             p.reset_round()
+        self._state = TableState(self._active_players, self._big_blind, self._dealer_position)
+        self._view = TableView(self._state)
         self._deck.shuffle()
-        print("Stacks:")
-        for p in self._active_players:
-            print(f"  {p._name} {p.stack}")
+        if self._verbose:
+            print("Stacks:")
+            for p in self._active_players:
+                print(f"  {p._name} {p.stack}")
+        self._record(
+            EventType.HAND_START,
+            amount=self._dealer_position,
+            seats=tuple(p._name for p in self._active_players),
+            stacks=tuple(p.stack for p in self._active_players),
+            seed=self._seed
+        )
 
         # Post blinds
-        self._pot += self._small_blind + self._big_blind
         bb_player = self._active_players[self._big_blind_idx]
         sb_player = self._active_players[self._small_blind_idx]
-        bb_player.current_bet += self._big_blind
-        bb_player.stack -= self._big_blind
-        sb_player.current_bet += self._small_blind
-        sb_player.stack += self._small_blind
-        self._history += f">>> {sb_player._name} posts small blind of {self._small_blind}\n"
-        self._history += f">>> {bb_player._name} posts big blind of {self._big_blind}\n"
-        print(f">>> {sb_player._name} posts small blind of {self._small_blind}")
-        print(f">>> {bb_player._name} posts small blind of {self._big_blind}")
+        self._state.bet(self._big_blind_idx, self._big_blind)
+        self._state.bet(self._small_blind_idx, self._small_blind)
+        self._record(EventType.BLIND, player=sb_player._name, action="small", amount=self._small_blind)
+        self._record(EventType.BLIND, player=bb_player._name, action="big", amount=self._big_blind)
+        self._print(f">>> {sb_player._name} posts small blind of {self._small_blind}")
+        self._print(f">>> {bb_player._name} posts big blind of {self._big_blind}")
 
         # Deal hole cards
         for _ in range(0, 2):
             for p in self._active_players:
                 p.hand = p.hand + self._deck.draw(1)
+        for p in self._active_players:
+            self._record(EventType.HOLE_CARDS, player=p._name, cards=tuple(p.hand))
 
         # Pre-flop
-        print("---- Pre-Flop ----")
-        self._history += "---- Pre-Flop ----\n"
-        self._round = "Pre-Flop"
+        self._announce_street("Pre-Flop", show_board=False)
+        self._state.round = "Pre-Flop"
         self._betting_round((self._big_blind_idx + 1) % len(self._active_players), self._big_blind)
-        if self._check_win_by_fold(): return
+        if self._check_win_by_fold(): return self._winners
 
         # Flop
         self._deck.draw(1)
-        self._community_cards = self._deck.draw(3)
-        print("---- Flop ----")
-        print(Card.ints_to_pretty_str(self._community_cards))
-        self._history += "---- Flop ----\n"
-        self._history += f"{Card.ints_to_pretty_str(self._community_cards)}\n"
-        self._round = "Flop"
+        self._state.community_cards = self._deck.draw(3)
+        self._announce_street("Flop")
+        self._state.round = "Flop"
         self._betting_round((self._dealer_position + 1) % len(self._active_players), 0)
-        if self._check_win_by_fold(): return
+        if self._check_win_by_fold(): return self._winners
 
         # Turn
         self._deck.draw(1)
-        self._community_cards += self._deck.draw(1)
-        print("---- Turn ----")
-        print(Card.ints_to_pretty_str(self._community_cards))
-        self._history += "---- Turn ----\n"
-        self._history += f"{Card.ints_to_pretty_str(self._community_cards)}\n"
-        self._round = "Turn"
+        self._state.community_cards += self._deck.draw(1)
+        self._announce_street("Turn")
+        self._state.round = "Turn"
         self._betting_round((self._dealer_position + 1) % len(self._active_players), 0)
-        if self._check_win_by_fold(): return
+        if self._check_win_by_fold(): return self._winners
 
         # River
         self._deck.draw(1)
-        self._community_cards += self._deck.draw(1)
-        print("---- River ----")
-        print(Card.ints_to_pretty_str(self._community_cards))
-        self._history += "---- River ----\n"
-        self._history += f"{Card.ints_to_pretty_str(self._community_cards)}\n"
-        self._round = "River"
+        self._state.community_cards += self._deck.draw(1)
+        self._announce_street("River")
+        self._state.round = "River"
         self._betting_round((self._dealer_position + 1) % len(self._active_players), 0)
-        if self._check_win_by_fold(): return
+        if self._check_win_by_fold(): return self._winners
 
-        print("---- SHOWDOWN ----")
-        print(Card.ints_to_pretty_str(self._community_cards))
-        self._history += "---- SHOWDOWN ----\n"
-        self._history += f"{Card.ints_to_pretty_str(self._community_cards)}\n"
+        self._announce_street("SHOWDOWN")
         self._showdown()
+        return self._winners
+
+
+def _valid_actions(to_call: int, chips: int, min_bet: int) -> List[Action]:
+    """
+    Actions open to a seat that has to put `to_call` more in to stay and has `chips` (stack + bet) in all.
+    """
+    valid_actions = [Action.FOLD]
+    if to_call == 0:
+        valid_actions.append(Action.CHECK)
+    elif to_call > 0:
+        valid_actions.append(Action.CALL)
+
+    if chips >= min_bet:
+        valid_actions.append(Action.RAISE)
+    return valid_actions
@@ -0,0 +1,21 @@
+import hashlib
+
+from treys import Deck
+
+
+def derive_seed(seed: int, *keys) -> int:
+    """
+    Derives an independent 63 bit seed from a parent seed and any keys (hand number, player name, ...),
+    so every hand and every player gets its own stream that doesn't depend on what was drawn before.
+    """
+    digest = hashlib.blake2b(repr((seed,) + keys).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") >> 1
+
+
+class SeededDeck(Deck):
+    """
+    treys Deck whose next shuffle can be pinned to a seed, so hand i of a seeded game is always dealt
+    the same cards no matter how the hands before it were played.
+    """
+    def reseed(self, seed: int):
+        self._random.seed(seed)
@@ -0,0 +1,205 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from os.path import join
+from typing import List, Optional, Tuple
+import argparse
+import json
+import os
+import time
+
+from treys import Deck, Evaluator
+
+from hand_eval import BatchEvaluator
+from metrics import Metrics
+from player_factory import player_factory
+from player import Player
+from poker2 import Poker
+
+
+def play_headless_games(players: List[Player], games: int, evaluator: Evaluator, deck: Deck, hand_log_path: Optional[str] = None,
+                        seed: Optional[int] = None, metrics: Optional[Metrics] = None, results_directory: Optional[str] = None) -> List[dict]:
+    """
+    Plays `games` independent games with the same set of players without printing anything.
+    Returns the result dict of every game (see Poker.play_game).
+    When `hand_log_path` is set the events of every hand are appended to that JSONL file.
+    When `seed` is set game i is seeded with `seed + i` and deals from its own SeededDeck instead of `deck`.
+    When `metrics` is set every game records its timings and counters into it.
+    When `results_directory` is set game i stores its per-hand results in the partition
+    <results_directory>/Game<seed + i> (Game<i> without a seed), see results_store.
+    """
+    if any(p.is_human() for p in players):
+        raise RuntimeError("Human players can't take part in a headless simulation!")
+
+    results = []
+    for i in range(games):
+        game_seed = seed + i if seed is not None else None
+        results_path = join(results_directory, f"Game{game_seed if game_seed is not None else i}") if results_directory is not None else None
+        game = Poker(players, evaluator, deck, verbose=False, hand_log_path=hand_log_path, seed=game_seed, metrics=metrics, results_path=results_path)
+        results.append(game.play_game())
+    return results
+
+
+# Per-process state, built once by _init_worker so each process has its own players, evaluator and decks
+_worker_players_file: str = None
+_worker_log_directory: str = None
+_worker_hand_logs = False
+_worker_metrics = False
+_worker_results = False
+_worker_players: List[Player] = []
+_worker_evaluator: Evaluator = None
+
+
+def _init_worker(players_file: str, log_directory: str, hand_logs: bool = False, metrics: bool = False, store_results: bool = False):
+    global _worker_players_file, _worker_log_directory, _worker_hand_logs, _worker_metrics, _worker_results, _worker_players, _worker_evaluator
+    _worker_players_file = players_file
+    _worker_log_directory = log_directory
+    _worker_hand_logs = hand_logs
+    _worker_metrics = metrics
+    _worker_results = store_results
+    _worker_players = player_factory(players_file, log_directory)
+    _worker_evaluator = BatchEvaluator()
+
+
+def _hand_log_path(seed: int, rotation: int) -> Optional[str]:
+    if not _worker_hand_logs:
+        return None
+    return join(_worker_log_directory, f"Game{seed}.jsonl" if rotation == 0 else f"Game{seed}-{rotation}.jsonl")
+
+
+def _results_directory(rotation: int) -> Optional[str]:
+    if not _worker_results:
+        return None
+    # Every rotation seats the players differently, so each gets its own Game<seed> partitions
+    return join(_worker_log_directory, "results") if rotation == 0 else join(_worker_log_directory, "results", f"Rotation{rotation}")
+
+
+def _play_game(players: List[Player], seed: int, rotation: int) -> dict:
+    metrics = Metrics() if _worker_metrics else None
+    result = play_headless_games(players, 1, _worker_evaluator, Deck(), _hand_log_path(seed, rotation), seed, metrics, _results_directory(rotation))[0]
+    if metrics is not None:
+        # Sent back with the result and merged by run_games' caller
+        result["metrics"] = metrics.to_dict()
+    return result
+
+
+def _rotate(players: List[Player], rotation: int) -> List[Player]:
+    # Rotating the seats with the same seed deals every player the cards another seat got
+    return players[rotation:] + players[:rotation]
+
+
+def _play_table(game: Tuple[int, int]) -> dict:
+    seed, rotation = game
+    # Concurrent tables can't share player objects, so every table gets its own players and log directory
+    table_log_directory = join(_worker_log_directory, f"Table{seed}-{rotation}")
+    os.makedirs(table_log_directory, exist_ok=True)
+    players = _rotate(player_factory(_worker_players_file, table_log_directory), rotation)
+    return _play_game(players, seed, rotation)
+
+
+def _play_seeded_games(games: List[Tuple[int, int]], tables: int = 1) -> List[dict]:
+    if tables > 1:
+        # LLM decisions are submitted to the shared llm_client loop, so while one table waits on the
+        # model the other tables' requests are already in flight
+        with ThreadPoolExecutor(max_workers=tables) as pool:
+            return list(pool.map(_play_table, games))
+
+    results = []
+    for seed, rotation in games:
+        results.append(_play_game(_rotate(_worker_players, rotation), seed, rotation))
+    return results
+
+
+def run_games(players_file: str, log_directory: str, games: int, workers: int = 1, seed: int = 0, tables: int = 1, hand_logs: bool = False,
+              duplicate: bool = False, metrics: bool = False, store_results: bool = False) -> List[dict]:
+    """
+    Plays `games` games, game i being seeded with `seed + i`, spread over `workers` processes each
+    interleaving up to `tables` games at once.
+    With `duplicate` every seed is played once per seat rotation, so each player is dealt the cards
+    of every seat and the luck of the deal cancels out of the totals.
+    With `hand_logs` every game writes its hand events to <log_directory>/Game<seed>[-<rotation>].jsonl.
+    With `metrics` every result carries the game's Metrics.to_dict() under "metrics".
+    With `store_results` every game stores its per-hand results under <log_directory>/results (see results_store).
+    The results come back in game order, so with scripted players the same seed gives the same report
+    for any worker or table count.
+    """
+    with open(players_file, "r") as f:
+        rotations = len(json.load(f)) if duplicate else 1
+    work = [(seed + i, rotation) for i in range(games) for rotation in range(rotations)]
+    if workers <= 1:
+        _init_worker(players_file, log_directory, hand_logs, metrics, store_results)
+        return _play_seeded_games(work, tables)
+
+    # Hand out several chunks per worker so a slow chunk doesn't leave the other cores idle
+    chunk_size = max(1, len(work) // (workers * 4))
+    chunks = [work[i:i + chunk_size] for i in range(0, len(work), chunk_size)]
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(players_file, log_directory, hand_logs, metrics, store_results)) as pool:
+        for chunk_results in pool.map(partial(_play_seeded_games, tables=tables), chunks):
+            results += chunk_results
+    return results
+
+
+def summarize(results: List[dict]) -> dict:
+    """
+    Merges the per-game results into one report keyed by player name.
+    """
+    players = {}
+    total_hands = 0
+    for r in results:
+        total_hands += r["hands"]
+        for name, stack in r["stacks"].items():
+            stats = players.setdefault(name, {"games_won": 0, "pots_won": 0, "total_stack": 0})
+            stats["total_stack"] += stack
+            stats["pots_won"] += r["pots_won"][name]
+        for name in r["winners"]:
+            players[name]["games_won"] += 1
+
+    for stats in players.values():
+        stats["average_stack"] = stats["total_stack"] / len(results) if results else 0
+    return {
+        "games": len(results),
+        "hands": total_hands,
+        "players": players,
+    }
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play many poker games without any console output")
+    parser.add_argument("players_file", nargs="?", default="players.json")
+    parser.add_argument("-n", "--games", type=int, default=100, help="Number of games to play")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="Number of worker processes, 0 to use every core")
+    parser.add_argument("-t", "--tables", type=int, default=1, help="Number of games each worker plays concurrently, useful with LLM players")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="Seed of the first game, game i uses seed + i")
+    parser.add_argument("-d", "--duplicate", action="store_true", help="Replay every seed once per seat rotation to cancel out the luck of the deal")
+    parser.add_argument("--hand-logs", action="store_true", help="Write every game's hand events to a JSONL file")
+    parser.add_argument("--metrics", help="Write the decision timings and player counters of all games to this .json, .csv or .prom file")
+    parser.add_argument("--results", action="store_true", help="Store every game's per-hand results under <log directory>/results for results_store.py")
+    parser.add_argument("-o", "--output", help="Write the summary to this JSON file instead of stdout")
+    args = parser.parse_args()
+
+    log_directory = f"Sim{str(datetime.now())}"
+    os.mkdir(log_directory)
+
+    workers = args.workers if args.workers > 0 else os.cpu_count()
+    metrics = Metrics(args.metrics) if args.metrics else None
+    start = time.perf_counter()
+    results = run_games(args.players_file, log_directory, args.games, workers, args.seed, args.tables, args.hand_logs, args.duplicate, metrics is not None, args.results)
+    elapsed = time.perf_counter() - start
+    if metrics is not None:
+        for r in results:
+            metrics.merge(r.pop("metrics"))
+        metrics.export()
+
+    summary = summarize(results)
+    summary["workers"] = workers
+    summary["tables"] = args.tables
+    summary["duplicate"] = args.duplicate
+    summary["elapsed_sec"] = elapsed
+    summary["hands_per_sec"] = summary["hands"] / elapsed if elapsed > 0 else 0.0
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=4)
+    else:
+        print(json.dumps(summary, indent=4))
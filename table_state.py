@@ -0,0 +1,119 @@
+from typing import List, Optional, Tuple
+
+from player import Player
+
+
+class TableState(object):
+    """
+    State of the hand being played, kept by Round in parallel per-seat lists (stacks, bets, flags) with
+    a running count of the players that haven't folded.
+    Only Round writes to it, the players get a TableView of it.
+    The Player objects' stack/current_bet/is_folded are only brought up to date when they need to be read.
+    """
+    __slots__ = (
+        "players", "stacks", "bets", "folded", "all_in", "uses_history", "active_count",
+        "round", "community_cards", "pot", "active_bet", "min_bet", "big_blind", "dealer", "acting", "equity",
+        "_remaining"
+    )
+
+    def __init__(self, players: List[Player], big_blind: int, dealer: int = 0):
+        # Built at the start of a hand, so nobody has bet or folded yet
+        self.players = players
+        self.stacks = [p.stack for p in players]
+        self.bets = [0] * len(players)
+        self.folded = [False] * len(players)
+        self.all_in = [False] * len(players)
+        self.uses_history = [p.uses_history() for p in players]
+        self.active_count = len(players)
+        self.round = "Pre-Flop"
+        self.community_cards: List[int] = []
+        self.pot = 0
+        self.active_bet = 0
+        self.min_bet = big_blind
+        self.big_blind = big_blind
+        # Seats of the dealer and of the player deciding
+        self.dealer = dealer
+        self.acting = dealer
+        # Estimated share of the pot of the player deciding, only set with an equity service
+        self.equity: Optional[float] = None
+        self._remaining: Optional[Tuple[Player, ...]] = None
+
+    @property
+    def remaining_players(self) -> Tuple[Player, ...]:
+        # Only rebuilt after a fold, and only if someone reads it
+        if self._remaining is None:
+            self._remaining = tuple([p for p, folded in zip(self.players, self.folded) if not folded])
+        return self._remaining
+
+    @property
+    def position(self) -> int:
+        # Seats the deciding player sits after the dealer, the dealer being last to act after the flop
+        return (self.acting - self.dealer) % len(self.players)
+
+    def can_take_action(self, idx: int) -> bool:
+        return not self.folded[idx] and not self.all_in[idx]
+
+    def fold(self, idx: int):
+        self.folded[idx] = True
+        self.active_count -= 1
+        self._remaining = None
+
+    def bet(self, idx: int, amount: int):
+        """
+        Moves `amount` chips from the seat's stack into the pot.
+        """
+        self.stacks[idx] -= amount
+        self.bets[idx] += amount
+        self.pot += amount
+
+    def win(self, idx: int, amount: int):
+        self.stacks[idx] += amount
+
+    def reset_bets(self):
+        self.bets = [0] * len(self.players)
+
+    def sync_chips(self, idx: int):
+        """
+        Copies one seat's chips to its Player, e.g. before it decides (a player that can act hasn't
+        folded nor gone all in, so its flags are already right).
+        """
+        p = self.players[idx]
+        p.stack = self.stacks[idx]
+        p.current_bet = self.bets[idx]
+
+    def sync_players(self):
+        for p, stack, bet, folded, all_in in zip(self.players, self.stacks, self.bets, self.folded, self.all_in):
+            p.stack = stack
+            p.current_bet = bet
+            p.is_folded = folded
+            p.is_all_in = all_in
+
+
+class TableView(object):
+    """
+    What a player sees of a TableState, read like the dict it replaces (state["pot"], state.get("equity"),
+    "equity" in state). It has nothing to write with, and the board and remaining players come as tuples.
+    Round hands the same view to every decision of the hand, so it always reads the current state.
+    """
+    __slots__ = ("_state",)
+
+    # The keys players can read
+    _KEYS = frozenset((
+        "active_bet", "big_blind", "community_cards", "equity", "min_bet", "position", "pot", "remaining_players", "round"
+    ))
+
+    def __init__(self, state: TableState):
+        self._state = state
+
+    def __getitem__(self, key: str):
+        if key not in TableView._KEYS or (key == "equity" and self._state.equity is None):
+            raise KeyError(key)
+        if key == "community_cards":
+            return tuple(self._state.community_cards)
+        return getattr(self._state, key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in TableView._KEYS and (key != "equity" or self._state.equity is not None)
+
+    def get(self, key: str, default=None):
+        return self[key] if key in self else default
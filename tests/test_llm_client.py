@@ -0,0 +1,157 @@
+"""
+EndpointPool routing, concurrency caps, failover and health against local mock model servers.
+"""
+from typing import List
+import time
+
+from openai import APIStatusError
+import pytest
+
+from mock_server import Latency, MockServer
+import llm_client
+
+_MESSAGES = [{"role": "user", "content": "Pick one of the valid actions [FOLD, CALL]"}]
+
+
+@pytest.fixture
+def servers():
+    started: List[MockServer] = []
+
+    def start(**kwargs) -> MockServer:
+        server = MockServer(**kwargs)
+        server.url = server.start()
+        started.append(server)
+        return server
+
+    yield start
+    for server in started:
+        server.stop()
+
+
+def _complete(client):
+    return client.chat.completions.create(model="mock", messages=_MESSAGES)
+
+
+def _request(pool: llm_client.EndpointPool):
+    return llm_client.run(pool.request(_complete))
+
+
+def _requests_at_once(pool: llm_client.EndpointPool, count: int) -> list:
+    futures = [llm_client.submit(pool.request(_complete)) for _ in range(count)]
+    return [f.result() for f in futures]
+
+
+def test_least_outstanding_routing(servers):
+    first = servers(latency=Latency("fixed", [0.2]))
+    second = servers(latency=Latency("fixed", [0.2]))
+    pool = llm_client.get_pool([first.url, second.url])
+    results = _requests_at_once(pool, 4)
+    # Every request goes to the endpoint with the fewest in flight, so they split evenly
+    assert sorted(endpoint for _, endpoint, _ in results) == sorted([first.url, first.url, second.url, second.url])
+    assert first.stats()["max_active"] == 2
+    assert second.stats()["max_active"] == 2
+
+
+def test_concurrency_cap(servers):
+    capped = servers(latency=Latency("fixed", [0.1]))
+    pool = llm_client.get_pool([{"baseUrl": capped.url, "maxConcurrency": 1}])
+    start = time.monotonic()
+    results = _requests_at_once(pool, 3)
+    assert len(results) == 3
+    assert capped.stats()["max_active"] == 1
+    assert capped.stats()["completed"] == 3
+    # One after the other
+    assert time.monotonic() - start >= 0.3
+
+
+def test_timeout_is_retried_on_another_endpoint(servers):
+    hanging = servers(hang_rate=1.0, hang_sec=2.0)
+    healthy = servers()
+    pool = llm_client.get_pool([hanging.url, healthy.url], timeout_sec=0.3, retries=1)
+    completion, endpoint, retries = _request(pool)
+    assert completion.choices[0].message.content.endswith(("FOLD", "CALL"))
+    assert endpoint == healthy.url
+    assert retries == 1
+    assert hanging.stats()["hung"] == 1
+
+
+def test_errors_without_retries_raise(servers):
+    failing = servers(error_rate=1.0, error_statuses=(500,))
+    pool = llm_client.get_pool([failing.url])
+    with pytest.raises(APIStatusError):
+        _request(pool)
+    # The OpenAI client doesn't retry behind the pool's back
+    assert failing.stats()["requests"] == 1
+
+
+def test_unhealthy_cooldown(servers, monkeypatch):
+    monkeypatch.setattr(llm_client, "UNHEALTHY_COOLDOWN_SEC", 0.5)
+    failing = servers(error_rate=1.0, error_statuses=(500,))
+    healthy = servers()
+    alone = llm_client.get_pool([failing.url])
+    for _ in range(llm_client.UNHEALTHY_AFTER):
+        with pytest.raises(APIStatusError):
+            _request(alone)
+    assert not alone.stats()[failing.url]["healthy"]
+
+    # Pools sharing the endpoint skip it while it cools down
+    pool = llm_client.get_pool([failing.url, healthy.url])
+    for _ in range(3):
+        assert _request(pool)[1] == healthy.url
+    assert failing.stats()["requests"] == llm_client.UNHEALTHY_AFTER
+
+    # With every endpoint of a pool down it's tried anyway rather than failing outright
+    with pytest.raises(APIStatusError):
+        _request(alone)
+    assert failing.stats()["requests"] == llm_client.UNHEALTHY_AFTER + 1
+
+    time.sleep(0.6)
+    assert alone.stats()[failing.url]["healthy"]
+
+
+def test_rejected_requests_leave_the_endpoint_healthy(servers):
+    # A bad request (e.g. a prompt longer than the context) fails the same way on any server
+    rejecting = servers(error_rate=1.0, error_statuses=(400,))
+    pool = llm_client.get_pool([rejecting.url], retries=2)
+    for _ in range(llm_client.UNHEALTHY_AFTER):
+        with pytest.raises(APIStatusError):
+            _request(pool)
+    assert rejecting.stats()["requests"] == llm_client.UNHEALTHY_AFTER
+    assert pool.stats()[rejecting.url]["failures"] == 0
+    assert pool.stats()[rejecting.url]["healthy"]
+
+
+def _batch(dispatcher: llm_client.BatchDispatcher, actions: List[str]) -> List[str]:
+    # Each prompt only allows one action, so every answer shows whose prompt it was generated for
+    futures = [llm_client.submit(dispatcher.complete(f"Pick one of the valid actions [{a}]")) for a in actions]
+    return [f.result()[0].split()[-1] for f in futures]
+
+
+def test_full_batch_is_one_request(servers):
+    server = servers(latency=Latency("fixed", [0.1]))
+    dispatcher = llm_client.BatchDispatcher(llm_client.get_pool([server.url]), "mock", 0.7, 64, batch_size=3, window_sec=5.0)
+    start = time.monotonic()
+    assert _batch(dispatcher, ["FOLD", "CALL", "RAISE"]) == ["FOLD", "CALL", "RAISE"]
+    # Sent as soon as it was full, not after the window
+    assert time.monotonic() - start < 1.0
+    assert server.stats()["requests"] == 1
+    assert server.stats()["prompts"] == 3
+    assert dispatcher.stats()["full_batches"] == 1
+
+
+def test_batch_leaves_after_the_window(servers):
+    server = servers()
+    dispatcher = llm_client.BatchDispatcher(llm_client.get_pool([server.url]), "mock", 0.7, 64, batch_size=8, window_sec=0.1)
+    assert _batch(dispatcher, ["CHECK", "FOLD"]) == ["CHECK", "FOLD"]
+    assert server.stats()["requests"] == 1
+    assert dispatcher.stats() == {"batches": 1, "prompts": 2, "full_batches": 0, "mean_batch_size": 2.0}
+
+
+def test_failed_batch_fails_every_prompt(servers):
+    failing = servers(error_rate=1.0, error_statuses=(500,))
+    dispatcher = llm_client.BatchDispatcher(llm_client.get_pool([failing.url]), "mock", 0.7, 64, batch_size=2, window_sec=5.0)
+    futures = [llm_client.submit(dispatcher.complete("Pick one of the valid actions [FOLD]")) for _ in range(2)]
+    for future in futures:
+        with pytest.raises(APIStatusError):
+            future.result()
+    assert failing.stats()["requests"] == 1
@@ -0,0 +1,31 @@
+"""
+The vectorized simulator has to play every hand exactly like Round does.
+"""
+import pytest
+
+from hand_eval import BatchEvaluator
+from preflop import PreflopTable
+from vector_sim import RandomPolicy, ThresholdPolicy, check_conformance
+
+
+@pytest.fixture(scope="module")
+def evaluator() -> BatchEvaluator:
+    return BatchEvaluator()
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_random_policy_matches_round(evaluator: BatchEvaluator, seed: int):
+    policies = [RandomPolicy() for _ in range(6)]
+    assert check_conformance(policies, 300, evaluator, seed) == []
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_threshold_policy_matches_round(evaluator: BatchEvaluator, seed: int):
+    policies = [ThresholdPolicy(evaluator, PreflopTable()) for _ in range(6)]
+    assert check_conformance(policies, 300, evaluator, seed) == []
+
+
+def test_mixed_policies_match_round(evaluator: BatchEvaluator):
+    preflop_table = PreflopTable()
+    policies = [RandomPolicy() if seat % 2 == 0 else ThresholdPolicy(evaluator, preflop_table) for seat in range(6)]
+    assert check_conformance(policies, 300, evaluator, seed=3) == []
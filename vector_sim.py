@@ -0,0 +1,438 @@
+from typing import Callable, List, NamedTuple, Optional
+import argparse
+import json
+import os
+import time
+
+from treys import Deck
+from treys.lookup import LookupTable
+import numpy as np
+
+from action import Action
+from hand_eval import BatchEvaluator
+from player import Player
+from preflop import MAX_OPPONENTS, MIN_OPPONENTS, PreflopTable
+from round import Round
+
+# Action codes of the vectorized policies
+FOLD = 0
+CHECK = 1
+CALL = 2
+RAISE = 3
+_ACTIONS = [Action.FOLD, Action.CHECK, Action.CALL, Action.RAISE]
+
+_FULL_DECK = np.array(Deck.GetFullDeck(), dtype=np.int64)
+# Community cards showing on each street
+_BOARD_SIZES = np.array([0, 3, 4, 5], dtype=np.int64)
+
+
+class Decisions(NamedTuple):
+    """
+    One row per table where a player has to act, what that player can see.
+    `board` always holds 5 cards, only the first `board_size` of them are showing.
+    """
+    hands: np.ndarray        # (M, 2) hole cards
+    board: np.ndarray        # (M, 5)
+    board_size: np.ndarray   # (M,) 0, 3, 4 or 5
+    pot: np.ndarray          # (M,)
+    to_call: np.ndarray      # (M,)
+    min_bet: np.ndarray      # (M,) what the player's bet becomes if it raises
+    stack: np.ndarray        # (M,)
+    opponents: np.ndarray    # (M,) players left in the hand besides this one
+    can_check: np.ndarray    # (M,) bool, CHECK is valid, otherwise CALL is
+    can_raise: np.ndarray    # (M,) bool
+
+
+class RandomPolicy(object):
+    """
+    Picks uniformly among the valid actions, like RandomPlayer.
+    """
+    def act(self, decisions: Decisions, uniforms: np.ndarray) -> np.ndarray:
+        # Valid actions are ordered like Round lists them: FOLD, CHECK or CALL, then RAISE if allowed
+        choice = (uniforms * (2 + decisions.can_raise)).astype(np.int64)
+        passive = np.where(decisions.can_check, CHECK, CALL)
+        return np.select([choice == 0, choice == 1], [FOLD, passive], RAISE)
+
+
+class ThresholdPolicy(object):
+    """
+    Raises with a strong hand, checks or calls with a playable one and folds the rest (checking when it's free).
+    Strength is the pre-flop equity against the players left before the flop, and how the made hand ranks
+    among all 7462 hand classes after it.
+    """
+    def __init__(self, evaluator: BatchEvaluator, preflop_table: PreflopTable, raise_at: float = 0.6, call_at: float = 0.3):
+        self._evaluator = evaluator
+        self._preflop_table = preflop_table
+        self._raise_at = raise_at
+        self._call_at = call_at
+
+    def strength(self, decisions: Decisions) -> np.ndarray:
+        strength = np.zeros(len(decisions.hands), dtype=np.float64)
+        preflop = decisions.board_size == 0
+        if preflop.any():
+            opponents = np.clip(decisions.opponents[preflop], MIN_OPPONENTS, MAX_OPPONENTS)
+            strength[preflop] = self._preflop_table.equities(decisions.hands[preflop], opponents)
+        for board_size in (3, 4, 5):
+            rows = decisions.board_size == board_size
+            if rows.any():
+                ranks = self._evaluator.evaluate_batch(decisions.board[rows, :board_size], decisions.hands[rows])
+                strength[rows] = 1.0 - (ranks - 1) / LookupTable.MAX_HIGH_CARD
+        return strength
+
+    def act(self, decisions: Decisions, uniforms: np.ndarray) -> np.ndarray:
+        strength = self.strength(decisions)
+        passive = np.where(decisions.can_check, CHECK, CALL)
+        return np.select(
+            [(strength >= self._raise_at) & decisions.can_raise, (strength >= self._call_at) | decisions.can_check],
+            [RAISE, passive],
+            FOLD
+        )
+
+
+class HandResults(NamedTuple):
+    stacks: np.ndarray   # (T, S) stacks after the hand
+    winners: np.ndarray  # (T, S) bool, the seats that won (a share of) the pot
+
+
+def play_hands(
+        stacks: np.ndarray,
+        in_game: np.ndarray,
+        dealers: np.ndarray,
+        decks: np.ndarray,
+        policies: List,
+        big_blind: int,
+        small_blind: int,
+        evaluator: BatchEvaluator,
+        uniforms: Optional[np.ndarray] = None,
+        rng: Optional[np.random.Generator] = None
+) -> HandResults:
+    """
+    Plays one hand at each of T tables in lockstep, by the same rules as Round.
+    `stacks` and `in_game` are (T, S) per seat, the players still in the game sit in seat order like
+    Round's active_players and `dealers` (T,) indexes them the same way.
+    `decks` (T, 52) are dealt from the front in the order Round draws.
+    `policies` has one policy per seat. Decision k of table t gets `uniforms[t, k]` when given,
+    otherwise a fresh draw from `rng`.
+    """
+    tables, seats = stacks.shape
+    rows_all = np.arange(tables)
+    positions = np.arange(seats)
+    # Pack the players still in the game into the first n positions, keeping their seat order
+    order = np.argsort(~in_game, axis=1, kind="stable")
+    n = in_game.sum(axis=1)
+    real = positions[None, :] < n[:, None]
+    stack = np.take_along_axis(stacks, order, axis=1).astype(np.int64)
+    bet = np.zeros((tables, seats), dtype=np.int64)
+    folded = ~real
+
+    # Deal like Round: one card to everyone, then the second, burn, flop, burn, turn, burn, river
+    first = np.take_along_axis(decks, np.minimum(positions[None, :], 51), axis=1)
+    second = np.take_along_axis(decks, np.minimum(n[:, None] + positions[None, :], 51), axis=1)
+    hole = np.stack([first, second], axis=2)
+    board = np.take_along_axis(decks, 2 * n[:, None] + np.array([1, 2, 3, 5, 7])[None, :], axis=1)
+
+    # Blinds
+    small_idx = (dealers + 1) % n
+    big_idx = (dealers + 2) % n
+    bet[rows_all, big_idx] += big_blind
+    stack[rows_all, big_idx] -= big_blind
+    bet[rows_all, small_idx] += small_blind
+    stack[rows_all, small_idx] -= small_blind
+    pot = np.full(tables, big_blind + small_blind, dtype=np.int64)
+
+    street = np.zeros(tables, dtype=np.int64)
+    idx = (big_idx + 1) % n
+    active_bet = np.full(tables, big_blind, dtype=np.int64)
+    min_bet = np.full(tables, 2 * big_blind, dtype=np.int64)
+    actions_taken = np.zeros(tables, dtype=np.int64)
+    active_count = n.copy()
+    done = np.zeros(tables, dtype=bool)
+    showdown = np.zeros(tables, dtype=bool)
+    won_by_fold = np.zeros(tables, dtype=bool)
+    decision_count = np.zeros(tables, dtype=np.int64)
+
+    while not done.all():
+        while True:
+            # Players that folded pass their turn, which still counts as an action
+            while True:
+                skip = ~done & (actions_taken < n) & folded[rows_all, idx]
+                if not skip.any():
+                    break
+                actions_taken[skip] += 1
+                idx[skip] = (idx[skip] + 1) % n[skip]
+
+            ended = ~done & (actions_taken >= n)
+            if not ended.any():
+                break
+            by_fold = ended & (active_count == 1)
+            won_by_fold |= by_fold
+            done |= by_fold
+            next_street = ended & ~by_fold
+            bet[next_street] = 0
+            street[next_street] += 1
+            reached_showdown = next_street & (street == 4)
+            showdown |= reached_showdown
+            done |= reached_showdown
+            betting = next_street & ~reached_showdown
+            idx[betting] = (dealers[betting] + 1) % n[betting]
+            active_bet[betting] = 0
+            min_bet[betting] = big_blind
+            actions_taken[betting] = 0
+
+        rows = np.flatnonzero(~done)
+        if len(rows) == 0:
+            break
+        pos = idx[rows]
+        to_call = active_bet[rows] - bet[rows, pos]
+        decisions = Decisions(
+            hands=hole[rows, pos],
+            board=board[rows],
+            board_size=_BOARD_SIZES[street[rows]],
+            pot=pot[rows],
+            to_call=to_call,
+            min_bet=min_bet[rows],
+            stack=stack[rows, pos],
+            opponents=active_count[rows] - 1,
+            can_check=to_call == 0,
+            can_raise=bet[rows, pos] + stack[rows, pos] >= min_bet[rows]
+        )
+        if uniforms is not None:
+            if decision_count[rows].max() >= uniforms.shape[1]:
+                raise RuntimeError(f"A hand needed more than the {uniforms.shape[1]} decisions uniforms were given for")
+            u = uniforms[rows, decision_count[rows]]
+        else:
+            u = rng.random(len(rows))
+
+        # Ask every seat's policy about the tables where that seat is to act
+        seat = order[rows, pos]
+        actions = np.empty(len(rows), dtype=np.int64)
+        for policy in set(policies):
+            mine = np.isin(seat, [s for s, p in enumerate(policies) if p is policy])
+            if mine.any():
+                actions[mine] = policy.act(Decisions(*(a[mine] for a in decisions)), u[mine])
+        valid = (actions == FOLD) | ((actions == CHECK) & decisions.can_check) | ((actions == CALL) & (to_call > 0)) | ((actions == RAISE) & decisions.can_raise)
+        if not valid.all():
+            raise RuntimeError(f"Unexpected action {_ACTIONS[actions[~valid][0]]} from seat {seat[~valid][0]}")
+        decision_count[rows] += 1
+
+        fold = rows[actions == FOLD]
+        folded[fold, idx[fold]] = True
+        active_count[fold] -= 1
+        actions_taken[fold] += 1
+        # The last player standing ends the betting round at once
+        actions_taken[fold[active_count[fold] == 1]] = n[fold[active_count[fold] == 1]]
+
+        check = rows[actions == CHECK]
+        actions_taken[check] += 1
+
+        call = rows[actions == CALL]
+        to_call_call = active_bet[call] - bet[call, idx[call]]
+        stack[call, idx[call]] -= to_call_call
+        bet[call, idx[call]] += to_call_call
+        pot[call] += to_call_call
+        actions_taken[call] += 1
+
+        raise_ = rows[actions == RAISE]
+        to_raise = min_bet[raise_] - bet[raise_, idx[raise_]]
+        stack[raise_, idx[raise_]] -= to_raise
+        pot[raise_] += to_raise
+        bet[raise_, idx[raise_]] = min_bet[raise_]
+        active_bet[raise_] = min_bet[raise_]
+        min_bet[raise_] *= 2
+        actions_taken[raise_] = 1
+
+        idx[rows] = (idx[rows] + 1) % n[rows]
+
+    winners = np.zeros((tables, seats), dtype=bool)
+    fold_rows = np.flatnonzero(won_by_fold)
+    winners[fold_rows, np.argmin(folded[fold_rows], axis=1)] = True
+
+    # Rank every contender of every table that went to showdown in one call
+    contenders = showdown[:, None] & ~folded
+    t, p = np.nonzero(contenders)
+    ranks = np.full((tables, seats), np.iinfo(np.int32).max, dtype=np.int64)
+    if len(t) > 0:
+        ranks[t, p] = evaluator.evaluate_batch(board[t], hole[t, p])
+    best = ranks.min(axis=1)
+    winners |= contenders & (ranks == best[:, None])
+
+    # A split pot is shared evenly, like Round the odd chips are lost
+    shares = winners.sum(axis=1)
+    stack += np.where(winners, (pot // np.maximum(shares, 1))[:, None], 0)
+
+    # Back to seat order
+    stacks_out = stacks.copy()
+    winners_out = np.zeros((tables, seats), dtype=bool)
+    np.put_along_axis(stacks_out, order, np.where(real, stack, np.take_along_axis(stacks, order, axis=1)), axis=1)
+    np.put_along_axis(winners_out, order, winners, axis=1)
+    return HandResults(stacks_out, winners_out)
+
+
+def play_games(
+        policies: List,
+        names: List[str],
+        games: int,
+        evaluator: BatchEvaluator,
+        seed: int = 0,
+        starting_stack: int = 2500,
+        big_blind: int = 50,
+        small_blind: int = 25,
+        max_hands: int = 1000
+) -> List[dict]:
+    """
+    Plays `games` games at once, one per table, hand by hand in lockstep until every game is over.
+    Follows Poker.play_game (players below the big blind leave, the dealer chip moves one place) and
+    returns the same result dicts, so simulate.summarize can merge them.
+    """
+    assert len(policies) == len(names) >= 2
+    rng = np.random.default_rng(seed)
+    seats = len(policies)
+    stacks = np.full((games, seats), starting_stack, dtype=np.int64)
+    in_game = np.ones((games, seats), dtype=bool)
+    dealers = np.zeros(games, dtype=np.int64)
+    hands = np.zeros(games, dtype=np.int64)
+    pots_won = np.zeros((games, seats), dtype=np.int64)
+    live = np.ones(games, dtype=bool)
+
+    while live.any():
+        rows = np.flatnonzero(live)
+        decks = _FULL_DECK[rng.random((len(rows), len(_FULL_DECK))).argsort(axis=1)]
+        results = play_hands(stacks[rows], in_game[rows], dealers[rows], decks, policies, big_blind, small_blind, evaluator, rng=rng)
+        stacks[rows] = results.stacks
+        pots_won[rows] += results.winners
+        hands[rows] += 1
+        in_game[rows] = stacks[rows] >= big_blind
+        players_left = in_game[rows].sum(axis=1)
+        dealers[rows] = (dealers[rows] + 1) % np.maximum(players_left, 1)
+        live[rows] = (players_left >= 2) & (hands[rows] < max_hands)
+
+    results = []
+    for g in range(games):
+        best_stack = stacks[g].max()
+        results.append({
+            "seed": seed,
+            "hands": int(hands[g]),
+            "stacks": {name: int(s) for name, s in zip(names, stacks[g])},
+            "pots_won": {name: int(w) for name, w in zip(names, pots_won[g])},
+            "winners": [name for name, s in zip(names, stacks[g]) if s == best_stack],
+        })
+    return results
+
+
+class PolicyPlayer(Player):
+    """
+    Lets a vectorized policy sit at a Round, deciding on a single row.
+    `uniform` supplies the policy's random numbers, by default from the player's own RNG.
+    """
+    def __init__(self, name: str, policy, uniform: Optional[Callable[[], float]] = None):
+        super().__init__(log_file_path=os.devnull, name=name)
+        self._policy = policy
+        self._uniform = uniform if uniform is not None else self._random.random
+
+    def take_action(self, state: dict, valid_actions: List[Action], history: str) -> Action:
+        board = list(state["community_cards"])
+        to_call = state["active_bet"] - self.current_bet
+        decisions = Decisions(
+            hands=np.array([self.hand], dtype=np.int64),
+            board=np.array([board + [0] * (5 - len(board))], dtype=np.int64),
+            board_size=np.array([len(board)]),
+            pot=np.array([state["pot"]]),
+            to_call=np.array([to_call]),
+            min_bet=np.array([state["min_bet"]]),
+            stack=np.array([self.stack]),
+            opponents=np.array([len(state["remaining_players"]) - 1]),
+            can_check=np.array([Action.CHECK in valid_actions]),
+            can_raise=np.array([Action.RAISE in valid_actions])
+        )
+        return _ACTIONS[int(self._policy.act(decisions, np.array([self._uniform()]))[0])]
+
+
+class _FixedDeck(Deck):
+    """
+    Deals the cards of a given order, front first.
+    """
+    def __init__(self, cards: List[int]):
+        self._order = cards
+        super().__init__()
+
+    def shuffle(self) -> None:
+        # draw() pops from the end
+        self.cards = list(reversed(self._order))
+
+
+def check_conformance(policies: List, hands: int, evaluator: BatchEvaluator, seed: int = 0, big_blind: int = 50, small_blind: int = 25) -> List[int]:
+    """
+    Plays `hands` random situations (2 to len(policies) players, random stacks and dealer) both with
+    play_hands and one Round per hand, sharing the decks and the policies' random numbers.
+    Returns the numbers of the hands whose stacks or winners differ, printing how.
+    """
+    rng = np.random.default_rng(seed)
+    seats = len(policies)
+    in_game = rng.random((hands, seats)) < 0.8
+    # At least two players at every table
+    in_game[:, :2] |= in_game.sum(axis=1, keepdims=True) < 2
+    stacks = np.where(in_game, rng.integers(big_blind // 25, 200, (hands, seats)) * 25, 0)
+    dealers = (rng.random(hands) * in_game.sum(axis=1)).astype(np.int64)
+    decks = _FULL_DECK[rng.random((hands, len(_FULL_DECK))).argsort(axis=1)]
+    uniforms = rng.random((hands, 256))
+
+    results = play_hands(stacks, in_game, dealers, decks, policies, big_blind, small_blind, evaluator, uniforms=uniforms)
+
+    mismatches = []
+    for t in range(hands):
+        next_uniform = iter(uniforms[t].tolist()).__next__
+        players = [PolicyPlayer(f"Seat_{s}", policies[s], next_uniform) for s in range(seats)]
+        for p, stack in zip(players, stacks[t]):
+            p.stack = int(stack)
+        active = [p for p, playing in zip(players, in_game[t]) if playing]
+        round = Round(active, int(dealers[t]), _FixedDeck(decks[t].tolist()), evaluator, big_blind, small_blind, verbose=False)
+        winners = {w._name for w in round.play_round()}
+
+        expected_stacks = [p.stack for p in players]
+        expected_winners = {p._name for p, won in zip(players, results.winners[t]) if won}
+        if results.stacks[t].tolist() != expected_stacks or winners != expected_winners:
+            print(
+                f"Hand {t} differs from Round: stacks {results.stacks[t].tolist()} instead of {expected_stacks}, "
+                f"winners {sorted(expected_winners)} instead of {sorted(winners)}"
+            )
+            mismatches.append(t)
+    return mismatches
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play many games at once with vectorized scripted policies")
+    parser.add_argument("policies", nargs="?", default="random,random,random,random,random,random", help="Comma separated policy per seat: random or threshold")
+    parser.add_argument("-n", "--games", type=int, default=1000, help="Number of games (tables) played in lockstep")
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    parser.add_argument("--check", type=int, default=0, help="First check this many hands against Round")
+    parser.add_argument("-o", "--output", help="Write the summary to this JSON file instead of stdout")
+    args = parser.parse_args()
+
+    evaluator = BatchEvaluator()
+    preflop_table = PreflopTable()
+    kinds = args.policies.split(",")
+    policies = [RandomPolicy() if kind == "random" else ThresholdPolicy(evaluator, preflop_table) for kind in kinds]
+    names = [f"{kind.capitalize()}_{i + 1}" for i, kind in enumerate(kinds)]
+
+    if args.check > 0:
+        start = time.perf_counter()
+        mismatches = check_conformance(policies, args.check, evaluator, args.seed)
+        if len(mismatches) > 0:
+            raise RuntimeError(f"{len(mismatches)} of {args.check} hands differ from Round: {mismatches}")
+        print(f"{args.check} hands match Round ({time.perf_counter() - start:.1f}s)")
+
+    # Imported here, simulate pulls in every player type
+    from simulate import summarize
+    start = time.perf_counter()
+    results = play_games(policies, names, args.games, evaluator, args.seed)
+    elapsed = time.perf_counter() - start
+
+    summary = summarize(results)
+    summary["elapsed_sec"] = elapsed
+    summary["hands_per_sec"] = summary["hands"] / elapsed if elapsed > 0 else 0.0
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=4)
+    else:
+        print(json.dumps(summary, indent=4))